@@ -0,0 +1,89 @@
+"""
+Benchmark de throughput concurrente: pymongo bloqueante vs cliente asíncrono.
+
+Simula N "requests" concurrentes dentro del mismo event loop, cada una haciendo
+varias consultas a MongoDB, igual que un controller `async def`.
+
+- sync:  llamadas bloqueantes de MongoClient dentro de una corrutina (antes)
+- async: llamadas con AsyncMongoClient (después)
+
+Además mide el lag del event loop (cuánto tarda en despertar un tick de 10 ms),
+que es lo que sufren las demás requests mientras una consulta bloquea.
+
+Uso:
+    python -m benchmarks.async_throughput --requests 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from utils.mongodb import get_collection, get_async_collection
+
+
+async def _loop_lag_probe(samples: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        samples.append((time.perf_counter() - start - 0.01) * 1000)
+
+
+async def _sync_request(collection: str, queries: int):
+    coll = get_collection(collection)
+    for _ in range(queries):
+        coll.find_one({})
+
+
+async def _async_request(collection: str, queries: int):
+    coll = get_async_collection(collection)
+    for _ in range(queries):
+        await coll.find_one({})
+
+
+async def run(mode: str, requests: int, concurrency: int, collection: str, queries: int) -> dict:
+    handler = _sync_request if mode == "sync" else _async_request
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await handler(collection, queries)
+
+    # Calentar conexiones para no medir el handshake TLS
+    await handler(collection, 1)
+
+    lag_samples = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_loop_lag_probe(lag_samples, stop))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await probe
+
+    return {
+        "mode": mode,
+        "requests": requests,
+        "elapsed_s": round(elapsed, 3),
+        "req_per_s": round(requests / elapsed, 1),
+        "loop_lag_p50_ms": round(statistics.median(lag_samples), 2) if lag_samples else None,
+        "loop_lag_max_ms": round(max(lag_samples), 2) if lag_samples else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=3, help="Consultas por request")
+    parser.add_argument("--collection", default="catalogs")
+    args = parser.parse_args()
+
+    for mode in ("sync", "async"):
+        result = asyncio.run(run(mode, args.requests, args.concurrency, args.collection, args.queries))
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark del costo de autenticación por request.
+
+- before: lo que hacía cada decorador/dependencia antes, jwt.decode HS256
+          completo más dos datetime.utcnow() en cada request
+- after:  verify_token con el caché de tokens verificados (sha256 + LRU)
+
+Mide la verificación sola y una request ASGI completa a una ruta protegida
+(FastAPI en memoria, sin red ni MongoDB): decorador anterior vs
+AuthMiddleware + validateuser.
+
+Uso:
+    python -m benchmarks.auth_benchmark --iterations 20000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from datetime import datetime
+from functools import wraps
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-of-at-least-32-bytes")
+
+import jwt
+from fastapi import FastAPI, HTTPException, Request
+from jwt import PyJWTError
+
+from utils.security import SECRET_KEY, AuthMiddleware, create_jwt_token, resolve_authorization, validateuser
+
+
+def legacy_validate(authorization: str) -> dict:
+    """Copia de la verificación que hacía validateuser antes del caché"""
+    schema, token = authorization.split()
+    if schema.lower() != "bearer":
+        raise HTTPException(status_code=400, detail="Invalid auth schema")
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+        if payload.get("email") is None:
+            raise HTTPException(status_code=401, detail="Token Invalid")
+        if datetime.utcfromtimestamp(payload.get("exp")) < datetime.utcnow():
+            raise HTTPException(status_code=401, detail="Expired token")
+        if not payload.get("active"):
+            raise HTTPException(status_code=401, detail="Inactive user")
+        return payload
+    except PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid token or expired token")
+
+
+def cached_validate(authorization: str) -> dict:
+    payload, error = resolve_authorization(authorization)
+    if error:
+        raise error
+    return payload
+
+
+def legacy_validateuser(func):
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        request = kwargs.get("request")
+        payload = legacy_validate(request.headers.get("Authorization"))
+        request.state.id = payload.get("id")
+        return await func(*args, **kwargs)
+    return wrapper
+
+
+def build_app(middleware: bool) -> FastAPI:
+    app = FastAPI()
+    decorator = validateuser if middleware else legacy_validateuser
+    if middleware:
+        app.add_middleware(AuthMiddleware)
+
+    @app.get("/me")
+    @decorator
+    async def me(request: Request):
+        return {"id": request.state.id}
+
+    return app
+
+
+async def asgi_request(app, authorization: str):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/me", "raw_path": b"/me", "query_string": b"", "root_path": "",
+        "headers": [(b"authorization", authorization.encode())], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    status = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    assert status == [200], status
+
+
+def time_per_call(fn, iterations: int, repeats: int) -> float:
+    """Mediana de µs por llamada"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        samples.append((time.perf_counter() - start) / iterations * 1e6)
+    return statistics.median(samples)
+
+
+async def time_per_request(app, authorization: str, iterations: int, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await asgi_request(app, authorization)
+        samples.append((time.perf_counter() - start) / iterations * 1e6)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    token = create_jwt_token("Bench", "User", "bench@example.com", True, False, "64e8a07d1234567890abcdef")
+    authorization = f"Bearer {token}"
+
+    before = time_per_call(lambda: legacy_validate(authorization), args.iterations, args.repeats)
+    after = time_per_call(lambda: cached_validate(authorization), args.iterations, args.repeats)
+    print(f"verify  before: {before:8.2f} µs/request   after: {after:8.2f} µs/request   ({before / after:.1f}x)")
+
+    request_iterations = max(1, args.iterations // 10)
+    before = asyncio.run(time_per_request(build_app(middleware=False), authorization, request_iterations, args.repeats))
+    after = asyncio.run(time_per_request(build_app(middleware=True), authorization, request_iterations, args.repeats))
+    print(f"request before: {before:8.2f} µs/request   after: {after:8.2f} µs/request   (-{before - after:.2f} µs)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Tiempo de import de la app (arranque en frío de cada worker).
+
+Ejecuta `python -X importtime -c "import main"` en un proceso nuevo y
+muestra el tiempo acumulado del import y sus imports directos más lentos.
+Termina con código 1 si el total supera el presupuesto, así se puede usar en
+CI para que nadie vuelva a cargar Firebase, httpx o una conexión a Mongo al
+importar.
+
+Las variables de entorno que faltan (MONGODB_URI, MONGO_DB_NAME, SECRET_KEY)
+se completan con valores de prueba: importar main no debe conectarse a nada.
+
+Uso:
+    python -m benchmarks.import_time --budget-ms 800 --top 15
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "800"))
+
+# "import time:       self [us] |  cumulative | imported package"
+LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)$")
+
+
+def measure(module: str) -> tuple[int, list[tuple[str, int, int]]]:
+    """µs acumulados de `import module` y (nombre, µs propios, µs acumulados) de sus imports directos"""
+    env = dict(os.environ)
+    env.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+    env.setdefault("MONGO_DB_NAME", "benchmark")
+    env.setdefault("SECRET_KEY", "benchmark-secret-key-of-at-least-32-bytes")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    # importtime lista los hijos antes que el padre, con dos espacios más de sangría
+    children = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        depth = (len(match.group(3)) - 1) // 2
+        row = (match.group(4), int(match.group(1)), int(match.group(2)))
+        if depth == 1:
+            children.append(row)
+        elif depth == 0:
+            if row[0] == module:
+                return row[2], children
+            children = []
+    raise RuntimeError(f"import {module} not found in -X importtime output")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_TIME_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    runs = sorted((measure(args.module) for _ in range(args.repeats)), key=lambda run: run[0])
+    cumulative_us, children = runs[len(runs) // 2]
+    total = cumulative_us / 1000
+    slowest = sorted(children, key=lambda item: item[2], reverse=True)
+
+    print(f"{'module':<40} {'self ms':>10} {'cumulative ms':>14}")
+    for name, own, cumulative in slowest[:args.top]:
+        print(f"{name:<40} {own / 1000:>10.1f} {cumulative / 1000:>14.1f}")
+    print(f"\nimport {args.module}: {total:.1f} ms (median of {args.repeats}), budget {args.budget_ms:.0f} ms")
+
+    if total > args.budget_ms:
+        print("over budget", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark del orden de etapas en el listado de órdenes.
+
+Siembra una base de datos aparte (por defecto "bench_pipelines") con N
+órdenes y sus usuarios y compara get_all_orders_pipeline:
+
+- join-first:  $lookup/$project sobre todas las órdenes y después $sort/$skip/$limit (antes)
+- page-first:  $sort/$skip/$limit primero y $lookup solo sobre la página (después)
+
+Uso:
+    python -m benchmarks.orders_pipeline_benchmark --orders 100000 --users 5000
+    python -m benchmarks.orders_pipeline_benchmark --skip-seed --runs 10
+    python -m benchmarks.orders_pipeline_benchmark --drop
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from pipelines.order_pipelines import get_all_orders_pipeline
+from utils.mongodb import get_async_mongo_client
+
+PAGINATION_STAGES = ("$sort", "$skip", "$limit")
+
+
+def join_first(pipeline: list) -> list:
+    """La misma pipeline con $sort/$skip/$limit movidos al final, como estaba antes"""
+    paging = [stage for stage in pipeline if next(iter(stage)) in PAGINATION_STAGES]
+    rest = [stage for stage in pipeline if next(iter(stage)) not in PAGINATION_STAGES]
+    return rest + paging
+
+
+async def seed(db, orders: int, users: int, batch_size: int = 5000):
+    await db.users.drop()
+    await db.orders.drop()
+
+    user_ids = [ObjectId() for _ in range(users)]
+    await db.users.insert_many([{"_id": uid, "name": f"user {i}", "email": f"user{i}@bench.local"} for i, uid in enumerate(user_ids)])
+
+    start = datetime(2024, 1, 1)
+    for offset in range(0, orders, batch_size):
+        await db.orders.insert_many([
+            {
+                "id_user": random.choice(user_ids),
+                "date": start + timedelta(minutes=offset + i),
+                "payment_method": "card",
+                "delivery_type": "shipping",
+                "subtotal": 100.0,
+                "taxes": 15.0,
+                "discount": 0.0,
+                "total": 115.0,
+                "current_status": "ordered"
+            }
+            for i in range(min(batch_size, orders - offset))
+        ])
+
+    # Los mismos índices que declara utils/indexes.py
+    await db.orders.create_indexes([
+        IndexModel([("id_user", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], name="id_user_date_id"),
+        IndexModel([("date", DESCENDING), ("_id", DESCENDING)], name="date_id"),
+    ])
+
+
+async def measure(db, pipeline: list, runs: int) -> dict:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        cursor = await db.orders.aggregate(pipeline, allowDiskUse=True)
+        await cursor.to_list()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "p50_ms": round(statistics.median(timings), 1),
+        "max_ms": round(max(timings), 1),
+    }
+
+
+async def run(args):
+    db = get_async_mongo_client()[args.database]
+
+    if args.drop:
+        await get_async_mongo_client().drop_database(args.database)
+        print(f"Dropped {args.database}")
+        return
+
+    if not args.skip_seed:
+        print(f"Seeding {args.orders} orders / {args.users} users into {args.database}...")
+        await seed(db, args.orders, args.users)
+
+    print(f"{'skip':>8} {'join-first p50':>16} {'page-first p50':>16} {'speedup':>8}")
+    for skip in args.skips:
+        pipeline = get_all_orders_pipeline(skip, args.limit)
+        before = await measure(db, join_first(pipeline), args.runs)
+        after = await measure(db, pipeline, args.runs)
+        speedup = before["p50_ms"] / after["p50_ms"] if after["p50_ms"] else float("inf")
+        print(f"{skip:>8} {before['p50_ms']:>14}ms {after['p50_ms']:>14}ms {speedup:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default="bench_pipelines")
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--skips", type=int, nargs="+", default=[0, 1_000, 10_000])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--skip-seed", action="store_true", help="Usar los datos ya sembrados")
+    parser.add_argument("--drop", action="store_true", help="Borrar la base de datos del benchmark y salir")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Throughput de la API según la cantidad de workers (serve.py).
+
+Para cada valor de 1..N workers levanta `python serve.py --workers W` contra
+un MongoDB local, espera a que /health responda y genera carga con varios
+procesos cliente (httpx asíncrono, conexiones keep-alive) durante --duration
+segundos. Reporta requests/s, latencia p50/p99 y errores; después apaga el
+servidor con SIGTERM (drenando requests como en un deploy).
+
+El generador de carga corre en la misma máquina: con muchos workers puede
+ser él el cuello de botella, por eso se reparte en --load-processes.
+
+Uso:
+    python -m benchmarks.worker_sweep --max-workers 4 --path /catalogs --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(workers: int, port: int, mongo_uri: str, db_name: str) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({"MONGODB_URI": mongo_uri, "MONGO_DB_NAME": db_name})
+    if "localhost" in mongo_uri or "127.0.0.1" in mongo_uri:
+        env["MONGO_TLS"] = "false"
+    env.setdefault("SECRET_KEY", "benchmark-secret-key-of-at-least-32-bytes")
+    return subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env
+    )
+
+
+def wait_until_ready(base_url: str, server: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"serve.py exited with code {server.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def stop_server(server: subprocess.Popen):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=40)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+async def _load(url: str, concurrency: int, duration: float) -> tuple[list, int]:
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+
+    async def user(client: httpx.AsyncClient):
+        nonlocal errors
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await client.get(url)
+                if response.status_code >= 400:
+                    errors += 1
+                    continue
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        await asyncio.gather(*(user(client) for _ in range(concurrency)))
+    return latencies, errors
+
+
+def load_process(args: tuple) -> tuple[list, int]:
+    url, concurrency, duration = args
+    return asyncio.run(_load(url, concurrency, duration))
+
+
+def run_load(url: str, concurrency: int, duration: float, processes: int) -> dict:
+    per_process = max(1, concurrency // processes)
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(load_process, [(url, per_process, duration)] * processes)
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    errors = sum(result[1] for result in results)
+    if not latencies:
+        return {"rps": 0.0, "p50": 0.0, "p99": 0.0, "errors": errors}
+    return {
+        "rps": len(latencies) / duration,
+        "p50": statistics.median(latencies),
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "errors": errors
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--path", default="/catalogs")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--load-processes", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--mongo-uri", default=os.getenv("BENCHMARK_MONGODB_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default=os.getenv("BENCHMARK_DB_NAME", "tienda_benchmark"))
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    url = f"{base_url}{args.path}"
+    rows = []
+    for workers in range(1, args.max_workers + 1):
+        server = start_server(workers, args.port, args.mongo_uri, args.db)
+        try:
+            wait_until_ready(base_url, server)
+            run_load(url, args.concurrency, args.warmup, args.load_processes)
+            result = run_load(url, args.concurrency, args.duration, args.load_processes)
+        finally:
+            stop_server(server)
+        rows.append((workers, result))
+        print(f"{workers} workers: {result['rps']:9.1f} req/s   p50 {result['p50']:7.2f} ms   "
+              f"p99 {result['p99']:7.2f} ms   errors {result['errors']}", flush=True)
+
+    baseline = rows[0][1]["rps"] or 1
+    print(f"\nGET {args.path}, {args.concurrency} concurrent clients, {args.duration:.0f}s per run")
+    print(f"{'workers':>7} {'req/s':>10} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for workers, result in rows:
+        print(f"{workers:>7} {result['rps']:>10.1f} {result['rps'] / baseline:>7.2f}x "
+              f"{result['p50']:>8.2f} {result['p99']:>8.2f} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import pytest
+from pymongo import monitoring
+
+from utils.mongodb import register_event_listener
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Nombres de los comandos de MongoDB enviados, en orden"""
+
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        self.commands.append(event.command_name)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+# Se registra al cargar conftest, antes de que cualquier prueba cree el cliente asíncrono compartido
+_shared_counter = CommandCounter()
+try:
+    register_event_listener(_shared_counter)
+except RuntimeError:
+    _shared_counter = None
+
+
+@pytest.fixture
+def shared_command_counter():
+    """Comandos del cliente compartido de utils.mongodb (vacío al empezar la prueba)"""
+    if _shared_counter is None:
+        pytest.skip("El cliente asíncrono se creó antes de registrar el listener")
+    _shared_counter.commands.clear()
+    return _shared_counter
+
+
+@pytest.fixture
+def command_counter():
+    """Contador nuevo para pasar en event_listeners de un cliente propio de la prueba"""
+    return CommandCounter()
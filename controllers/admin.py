@@ -0,0 +1,15 @@
+from fastapi import HTTPException
+from utils.slow_queries import top_offenders, SLOW_AGGREGATION_MS
+
+async def get_slow_aggregations(limit: int = 20, hours: float = 24) -> dict:
+    """Builders de pipelines con más tiempo en aggregations lentas, con su último explain"""
+    try:
+        offenders = await top_offenders(limit=limit, hours=hours)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching slow aggregations: {str(e)}")
+
+    return {
+        "threshold_ms": SLOW_AGGREGATION_MS,
+        "hours": hours,
+        "offenders": offenders
+    }
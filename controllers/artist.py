@@ -1,14 +1,18 @@
 from fastapi import HTTPException
 from bson import ObjectId
-from utils.mongodb import get_collection
+from datetime import datetime
+from utils.mongodb import get_async_collection, aggregate_list
+from utils.conditional import Validators, probe_validators
+from pipelines.version_pipelines import get_version_probe_pipeline
 from models.artist import Artist
 
-coll = get_collection("artists")
+coll = get_async_collection("artists")
 
 async def create_artist(artist: Artist) -> Artist:
     try:
         artist_dict = artist.model_dump(exclude={"id"})
-        result = coll.insert_one(artist_dict)
+        artist_dict["date_updated"] = datetime.utcnow()
+        result = await coll.insert_one(artist_dict)
         artist.id = str(result.inserted_id)
         return artist
     except Exception as e:
@@ -17,7 +21,7 @@ async def create_artist(artist: Artist) -> Artist:
 async def get_artists() -> list[Artist]:
     try:
         artists = []
-        for doc in coll.find({"active": True}):
+        async for doc in coll.find({"active": True}):
             doc["id"] = str(doc["_id"])
             del doc["_id"]
             artists.append(Artist(**doc))
@@ -25,11 +29,16 @@ async def get_artists() -> list[Artist]:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error obteniendo artistas: {str(e)}")
 
+async def get_artists_validators() -> Validators | None:
+    # Sin filtrar por active: desactivar un artista también cambia date_updated
+    result = await aggregate_list(coll, get_version_probe_pipeline())
+    return probe_validators(result, "artists")
+
 async def get_artist_by_id(artist_id: str) -> Artist:
     try:
         if not ObjectId.is_valid(artist_id):
             raise HTTPException(status_code=400, detail="ID de artista inválido")
-        doc = coll.find_one({"_id": ObjectId(artist_id), "active": True})
+        doc = await coll.find_one({"_id": ObjectId(artist_id), "active": True})
         if not doc:
             raise HTTPException(status_code=404, detail="Artista no encontrado")
         doc["id"] = str(doc["_id"])
@@ -43,7 +52,8 @@ async def update_artist(artist_id: str, artist: Artist) -> Artist:
         if not ObjectId.is_valid(artist_id):
             raise HTTPException(status_code=400, detail="ID de artista inválido")
         update_data = artist.model_dump(exclude={"id"})
-        result = coll.update_one({"_id": ObjectId(artist_id)}, {"$set": update_data})
+        update_data["date_updated"] = datetime.utcnow()
+        result = await coll.update_one({"_id": ObjectId(artist_id)}, {"$set": update_data})
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Artista no encontrado")
         return await get_artist_by_id(artist_id)
@@ -54,7 +64,10 @@ async def delete_artist(artist_id: str) -> Artist:
     try:
         if not ObjectId.is_valid(artist_id):
             raise HTTPException(status_code=400, detail="ID de artista inválido")
-        result = coll.update_one({"_id": ObjectId(artist_id)}, {"$set": {"active": False}})
+        result = await coll.update_one(
+            {"_id": ObjectId(artist_id), "active": {"$ne": False}},
+            {"$set": {"active": False, "date_updated": datetime.utcnow()}}
+        )
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Artista no encontrado")
         return await get_artist_by_id(artist_id)
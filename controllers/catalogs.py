@@ -1,38 +1,118 @@
 from models.catalogs import Catalog
 from models.catalogtypes import CatalogType
-from utils.mongodb import get_collection
+from utils.mongodb import get_async_collection, aggregate_list
+from utils.schema import SCHEMA_VERSION
 from fastapi import HTTPException
 from bson import ObjectId
+from datetime import datetime
+from pipelines.facet_pipelines import get_page_with_total_pipeline, unpack_page_with_total
+from utils.counts import estimated_count
 from pipelines.catalog_pipelines import (
-    validate_catalog_type_pipeline,
     get_catalog_with_type_pipeline,
     get_catalogs_by_type_pipeline,
     get_all_catalogs_with_types_pipeline
 )
+from utils.reference_cache import catalog_types
+from utils.cache import ResponseCache, cache_stats
+from utils.singleflight import SingleFlight
+from utils.conditional import Validators, make_etag, probe_validators
+from pipelines.version_pipelines import get_latest_version_pipeline
 
-coll = get_collection("catalogs")
-catalog_types_coll = get_collection("catalogtypes")
+coll = get_async_collection("catalogs")
+
+# Respuestas de GET /catalogs y GET /catalogs/{id}; se invalida en cada escritura.
+# Con version (ETag del probe) la clave incluye la versión y una entrada vieja
+# de otro worker nunca se sirve con el ETag nuevo.
+catalogs_cache = ResponseCache("catalogs")
+# Probes de versión concurrentes de la misma lista o catálogo comparten la consulta
+catalog_probes = SingleFlight("catalogs")
+
+async def invalidate_catalogs(*catalog_ids):
+    """Descarta del caché los catálogos indicados y todas las listas"""
+    for catalog_id in catalog_ids:
+        await catalogs_cache.invalidate("id", str(catalog_id))
+        await catalogs_cache.invalidate_prefix("id", str(catalog_id))
+    await catalogs_cache.invalidate_prefix("list")
+    catalog_probes.forget_prefix()
+
+async def get_catalogs_validators(skip: int = 0, limit: int = 1000, total_mode: str = "exact") -> Validators | None:
+    """Versión de GET /catalogs sin ejecutar la agregación de la página"""
+    return await catalog_probes.do(("list", skip, limit, total_mode), lambda: probe_catalogs(skip, limit, total_mode))
+
+async def probe_catalogs(skip: int, limit: int, total_mode: str) -> Validators | None:
+    # Dos lecturas de índice con limit 1 y un conteo cacheado: no recorre catalogs en cada GET.
+    # Las escrituras de la API siempre mueven date_updated; el conteo solo detecta borrados externos.
+    catalog_type_ids = [doc["_id"] for doc in await catalog_types.all(active_only=True)]
+    match = {"id_catalog_type": {"$in": catalog_type_ids}}
+    result = await aggregate_list(coll, get_latest_version_pipeline(coll.name, match))
+    return probe_validators(
+        result, "catalogs", skip, limit, total_mode, catalog_types.digest,
+        also_modified=(catalog_types.last_modified,),
+        count=await estimated_count(coll, match)
+    )
+
+async def get_catalog_validators(catalog_id: str) -> Validators | None:
+    """Versión de GET /catalogs/{id} a partir de date_updated del catálogo y su tipo"""
+    if not ObjectId.is_valid(catalog_id):
+        return None
+    return await catalog_probes.do(("id", catalog_id), lambda: probe_catalog(catalog_id))
+
+async def probe_catalog(catalog_id: str) -> Validators | None:
+    doc = await coll.find_one({"_id": ObjectId(catalog_id)}, {"date_updated": 1, "id_catalog_type": 1})
+    if not doc or not doc.get("date_updated"):
+        return None
+    catalog_type = await catalog_types.get(doc.get("id_catalog_type"))
+    if not catalog_type:
+        return None
+    dates = [date for date in (doc["date_updated"], catalog_type.get("date_updated")) if date]
+    return Validators(
+        make_etag("catalog", catalog_id, doc["date_updated"], catalog_type.get("description")),
+        max(dates)
+    )
+
+async def attach_catalog_type_descriptions(catalogs: list) -> list:
+    """Agrega catalog_type_description desde el caché de referencia (reemplaza el $lookup a catalogtypes)"""
+    descriptions = await catalog_types.descriptions()
+    for catalog in catalogs:
+        type_id = catalog.get("id_catalog_type")
+        catalog["catalog_type_description"] = descriptions.get(ObjectId(type_id)) if type_id and ObjectId.is_valid(type_id) else None
+    return catalogs
+
+async def get_catalogs_page(builder, catalog_type_ids: list, skip: int, limit: int, total_mode: str, count_filter: dict) -> tuple[list, int | None]:
+    """Página de catálogos y su total según total_mode (ver utils/counts.py)"""
+    if total_mode == "exact":
+        # Página y total en una sola agregación
+        result = await aggregate_list(coll, get_page_with_total_pipeline(builder(catalog_type_ids, skip, limit)))
+        return unpack_page_with_total(result)
+
+    catalogs = await aggregate_list(coll, builder(catalog_type_ids, skip, limit))
+    if total_mode == "estimated":
+        return catalogs, await estimated_count(coll, count_filter)
+    return catalogs, None
 
 async def create_catalog(catalog: Catalog) -> Catalog:
     try:
 
-        # Validar que el catalog_type existe y está activo usando pipeline
-        catalog_type_pipeline = validate_catalog_type_pipeline(catalog.id_catalog_type)
-        catalog_type_result = list(catalog_types_coll.aggregate(catalog_type_pipeline))
+        # Validar que el catalog_type existe y está activo (caché de referencia)
+        catalog_type = await catalog_types.get(catalog.id_catalog_type)
 
-        if not catalog_type_result:
+        if not catalog_type or catalog_type.get("active") is not True:
             raise HTTPException(status_code=400, detail="Catalog type not found or inactive")
 
         catalog.name = catalog.name.strip()
         catalog.description = catalog.description.strip()
 
         # Verificar si ya existe un catálogo con el mismo nombre
-        existing_catalog = coll.find_one({"name": {"$regex": f"^{catalog.name}$", "$options": "i"}})
+        existing_catalog = await coll.find_one({"name": {"$regex": f"^{catalog.name}$", "$options": "i"}})
         if existing_catalog:
             raise HTTPException(status_code=400, detail="Catalog with this name already exists")
 
         catalog_dict = catalog.model_dump(exclude={"id"})
-        inserted = coll.insert_one(catalog_dict)
+        catalog_dict["id_catalog_type"] = ObjectId(catalog.id_catalog_type)
+        catalog_dict["schema_version"] = SCHEMA_VERSION
+        catalog_dict["date_updated"] = datetime.utcnow()
+        inserted = await coll.insert_one(catalog_dict)
+        await catalogs_cache.invalidate_prefix("list")
         catalog.id = str(inserted.inserted_id)
         return catalog
     except HTTPException:
@@ -40,27 +120,20 @@ async def create_catalog(catalog: Catalog) -> Catalog:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating catalog: {str(e)}")
 
-async def get_catalogs() -> list[Catalog]:
-    try:
-        catalogs = []
-        for doc in coll.find():
-            # Mapear _id a id para el modelo Pydantic
-            doc['id'] = str(doc['_id'])
-            del doc['_id']
-            catalog = Catalog(**doc)
-            catalogs.append(catalog)
-        return catalogs
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching catalogs: {str(e)}")
+async def get_catalogs(skip: int = 0, limit: int = 1000, total_mode: str = "exact", version: str | None = None) -> dict:
+    key = ("list", skip, limit, total_mode) + ((version,) if version else ())
+    return await catalogs_cache.get_or_load(key, lambda: load_catalogs(skip, limit, total_mode))
 
-async def get_catalogs(skip: int = 0, limit: int = 1000) -> dict:
+async def load_catalogs(skip: int, limit: int, total_mode: str) -> dict:
     try:
-        # Usar pipeline optimizada para obtener catálogos con información del tipo
-        pipeline = get_all_catalogs_with_types_pipeline(skip, limit)
-        catalogs = list(coll.aggregate(pipeline))
-
-        # Contar total de documentos para paginación
-        total_count = coll.count_documents({"active": True})
+        # Tipos activos desde el caché de referencia: se pagina catalogs sin join
+        catalog_type_ids = [doc["_id"] for doc in await catalog_types.all(active_only=True)]
+        catalogs, total_count = await get_catalogs_page(
+            get_all_catalogs_with_types_pipeline,
+            catalog_type_ids, skip, limit, total_mode,
+            count_filter={"id_catalog_type": {"$in": catalog_type_ids}}
+        )
+        await attach_catalog_type_descriptions(catalogs)
 
         return {
             "catalogs": catalogs,
@@ -71,13 +144,20 @@ async def get_catalogs(skip: int = 0, limit: int = 1000) -> dict:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching catalogs: {str(e)}")
 
-async def get_catalog_by_id(catalog_id: str) -> dict:
+async def get_catalog_by_id(catalog_id: str, version: str | None = None) -> dict:
+    key = ("id", catalog_id) + ((version,) if version else ())
+    return await catalogs_cache.get_or_load(key, lambda: load_catalog_by_id(catalog_id))
+
+async def load_catalog_by_id(catalog_id: str) -> dict:
     try:
         # Usar pipeline para obtener catálogo con información del tipo
         pipeline = get_catalog_with_type_pipeline(catalog_id)
-        catalog_result = list(coll.aggregate(pipeline))
-        
-        if not catalog_result:
+        catalog_result = await aggregate_list(coll, pipeline)
+        if catalog_result:
+            await attach_catalog_type_descriptions(catalog_result)
+
+        # Un catálogo cuyo tipo no existe se trata como no encontrado (igual que el join anterior)
+        if not catalog_result or catalog_result[0]["catalog_type_description"] is None:
             raise HTTPException(status_code=404, detail="Catalog not found")
             
         return catalog_result[0]
@@ -86,32 +166,20 @@ async def get_catalog_by_id(catalog_id: str) -> dict:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching catalog: {str(e)}")
 
-async def get_catalogs_by_type(catalog_type_description: str, skip: int = 0, limit: int = 10) -> dict:
+async def get_catalogs_by_type(catalog_type_description: str, skip: int = 0, limit: int = 10, total_mode: str = "exact") -> dict:
     try:
-        # Usar pipeline optimizada para obtener catálogos por tipo
-        pipeline = get_catalogs_by_type_pipeline(catalog_type_description, skip, limit)
-        catalogs = list(coll.aggregate(pipeline))
-        
-        # Contar total para paginación
-        count_pipeline = [
-            {"$addFields": {"id_catalog_type_obj": {"$toObjectId": "$id_catalog_type"}}},
-            {"$lookup": {
-                "from": "catalogtypes",
-                "localField": "id_catalog_type_obj", 
-                "foreignField": "_id",
-                "as": "catalog_type"
-            }},
-            {"$unwind": "$catalog_type"},
-            {"$match": {
-                "catalog_type.description": {"$regex": f"^{catalog_type_description}$", "$options": "i"},
-                "active": True
-            }},
-            {"$count": "total"}
-        ]
-        
-        count_result = list(coll.aggregate(count_pipeline))
-        total_count = count_result[0]["total"] if count_result else 0
-        
+        # Resolver el id del tipo en el caché de referencia para filtrar y contar sobre catalogs sin join
+        catalog_type = await catalog_types.find(catalog_type_description)
+        if not catalog_type:
+            raise HTTPException(status_code=404, detail="Catalog type not found")
+        catalog_type_ids = [catalog_type["_id"]]
+        catalogs, total_count = await get_catalogs_page(
+            get_catalogs_by_type_pipeline,
+            catalog_type_ids, skip, limit, total_mode,
+            count_filter={"id_catalog_type": {"$in": catalog_type_ids}, "active": True}
+        )
+        await attach_catalog_type_descriptions(catalogs)
+
         return {
             "catalogs": catalogs,
             "total": total_count,
@@ -119,24 +187,6 @@ async def get_catalogs_by_type(catalog_type_description: str, skip: int = 0, lim
             "limit": limit,
             "catalog_type": catalog_type_description
         }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching catalogs by type: {str(e)}")
-
-async def get_catalogs_by_type(catalog_type_id: str) -> list[Catalog]:
-    try:
-        # Validar que el catalog_type existe
-        catalog_type = catalog_types_coll.find_one({"_id": ObjectId(catalog_type_id)})
-        if not catalog_type:
-            raise HTTPException(status_code=404, detail="Catalog type not found")
-
-        catalogs = []
-        for doc in coll.find({"id_catalog_type": catalog_type_id}):
-            # Mapear _id a id para el modelo Pydantic
-            doc['id'] = str(doc['_id'])
-            del doc['_id']
-            catalog = Catalog(**doc)
-            catalogs.append(catalog)
-        return catalogs
     except HTTPException:
         raise
     except Exception as e:
@@ -145,7 +195,7 @@ async def get_catalogs_by_type(catalog_type_id: str) -> list[Catalog]:
 async def update_catalog(catalog_id: str, catalog: Catalog) -> Catalog:
     try:
         # Validar que el catalog_type existe
-        catalog_type = catalog_types_coll.find_one({"_id": ObjectId(catalog.id_catalog_type)})
+        catalog_type = await catalog_types.get(catalog.id_catalog_type)
         if not catalog_type:
             raise HTTPException(status_code=400, detail="Catalog type not found")
 
@@ -153,20 +203,26 @@ async def update_catalog(catalog_id: str, catalog: Catalog) -> Catalog:
         catalog.description = catalog.description.strip()
 
         # Verificar si ya existe otro catálogo con el mismo nombre
-        existing_catalog = coll.find_one({
+        existing_catalog = await coll.find_one({
             "name": {"$regex": f"^{catalog.name}$", "$options": "i"},
             "_id": {"$ne": ObjectId(catalog_id)}
         })
         if existing_catalog:
             raise HTTPException(status_code=400, detail="Catalog with this name already exists")
 
-        result = coll.update_one(
+        catalog_dict = catalog.model_dump(exclude={"id"})
+        catalog_dict["id_catalog_type"] = ObjectId(catalog.id_catalog_type)
+        catalog_dict["schema_version"] = SCHEMA_VERSION
+        catalog_dict["date_updated"] = datetime.utcnow()
+
+        result = await coll.update_one(
             {"_id": ObjectId(catalog_id)},
-            {"$set": catalog.model_dump(exclude={"id"})}
+            {"$set": catalog_dict}
         )
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Catalog not found")
 
+        await invalidate_catalogs(catalog_id)
         return await get_catalog_by_id(catalog_id)
     except HTTPException:
         raise
@@ -175,15 +231,26 @@ async def update_catalog(catalog_id: str, catalog: Catalog) -> Catalog:
 
 async def deactivate_catalog(catalog_id: str) -> Catalog:
     try:
-        result = coll.update_one(
-            {"_id": ObjectId(catalog_id)},
-            {"$set": {"active": False}}
+        # Un catálogo ya inactivo no se modifica (y responde 404 como antes)
+        result = await coll.update_one(
+            {"_id": ObjectId(catalog_id), "active": {"$ne": False}},
+            {"$set": {"active": False, "date_updated": datetime.utcnow()}}
         )
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Catalog not found")
 
+        await invalidate_catalogs(catalog_id)
         return await get_catalog_by_id(catalog_id)
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error deactivating catalog: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error deactivating catalog: {str(e)}")
+
+async def get_catalogs_cache_stats() -> dict:
+    return {
+        **await cache_stats(),
+        "singleflight": {
+            "loads": catalogs_cache.flight_stats(),
+            "probes": catalog_probes.stats()
+        }
+    }
@@ -1,25 +1,30 @@
 from models.catalogtypes import CatalogType
-from utils.mongodb import get_collection
+from utils.mongodb import get_async_collection, aggregate_list
 from fastapi import HTTPException
 from bson import ObjectId
+from datetime import datetime
+from utils.reference_cache import catalog_types
+from controllers.catalogs import catalogs_cache, catalog_probes, invalidate_catalogs
 
 from pipelines.catalog_type_pipelines import (
     get_catalog_type_pipeline
     , validate_type_is_assigned_pipeline
 )
 
-coll = get_collection("catalogtypes")
+coll = get_async_collection("catalogtypes")
 
 async def create_catalog_type(catalog_type: CatalogType) -> CatalogType:
     try:
         catalog_type.description = catalog_type.description.strip().lower()
 
-        existing_type = coll.find_one({"description": catalog_type.description})
+        existing_type = await coll.find_one({"description": catalog_type.description})
         if existing_type:
             raise HTTPException(status_code=400, detail="Catalog type already exists")
 
         catalog_type_dict = catalog_type.model_dump(exclude={"id"})
-        inserted = coll.insert_one(catalog_type_dict)
+        catalog_type_dict["date_updated"] = datetime.utcnow()
+        inserted = await coll.insert_one(catalog_type_dict)
+        await catalog_types.refresh()
         catalog_type.id = str(inserted.inserted_id)
         return catalog_type
     except Exception as e:
@@ -28,14 +33,14 @@ async def create_catalog_type(catalog_type: CatalogType) -> CatalogType:
 async def get_catalog_types() -> list:
     try:
         pipeline = get_catalog_type_pipeline()
-        catalog_types = list(coll.aggregate(pipeline))
+        catalog_types = await aggregate_list(coll, pipeline)
         return catalog_types
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching catalog types: {str(e)}")
 
 async def get_catalog_type_by_id(catalog_type_id: str) -> CatalogType:
     try:
-        doc = coll.find_one({"_id": ObjectId(catalog_type_id)})
+        doc = await coll.find_one({"_id": ObjectId(catalog_type_id)})
         if not doc:
             raise HTTPException(status_code=404, detail="Catalog type not found")
 
@@ -51,17 +56,20 @@ async def update_catalog_type(catalog_type_id: str, catalog_type: CatalogType) -
     try:
         catalog_type.description = catalog_type.description.strip().lower()
 
-        existing_type = coll.find_one({"description": catalog_type.description, "_id": {"$ne": ObjectId(catalog_type_id)}})
+        existing_type = await coll.find_one({"description": catalog_type.description, "_id": {"$ne": ObjectId(catalog_type_id)}})
         if existing_type:
             raise HTTPException(status_code=400, detail="Catalog type already exists")
 
-        result = coll.update_one(
+        result = await coll.update_one(
             {"_id": ObjectId(catalog_type_id)},
-            {"$set": catalog_type.model_dump(exclude={"id"})}
+            {"$set": {**catalog_type.model_dump(exclude={"id"}), "date_updated": datetime.utcnow()}}
         )
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Catalog type not found")
 
+        await catalog_types.refresh()
+        await catalogs_cache.invalidate_prefix()
+        catalog_probes.forget_prefix()
         return await get_catalog_type_by_id(catalog_type_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating catalog type: {str(e)}")
@@ -70,19 +78,22 @@ async def update_catalog_type(catalog_type_id: str, catalog_type: CatalogType) -
 async def deactivate_catalog_type(catalog_type_id: str) -> dict:
     try:
         pipeline = validate_type_is_assigned_pipeline(catalog_type_id)
-        assigned = list(coll.aggregate(pipeline))
+        assigned = await aggregate_list(coll, pipeline)
 
         if assigned is None:
             raise HTTPException(status_code=404, detail="Catalog type not found")
 
         if assigned[0]["number_of_products"] > 0:
-            coll.update_one(
+            await coll.update_one(
                 {"_id": ObjectId(catalog_type_id)},
-                {"$set": {"active": False}}
+                {"$set": {"active": False, "date_updated": datetime.utcnow()}}
             )
+            await catalog_types.refresh()
+            await invalidate_catalogs()
             return {"message": "Catalog type is assigned to products and has been deactivated"}
         else:
-            coll.delete_one({"_id": ObjectId(catalog_type_id)})
+            await coll.delete_one({"_id": ObjectId(catalog_type_id)})
+            await catalog_types.refresh()
             return {"message": "Catalog type deleted successfully"}
 
     except Exception as e:
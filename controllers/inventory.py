@@ -1,7 +1,8 @@
 from fastapi import HTTPException
 from bson import ObjectId
 from datetime import datetime
-from utils.mongodb import get_collection
+from utils.mongodb import get_async_collection, aggregate_list
+from utils.schema import SCHEMA_VERSION
 from models.inventory import InventoryItem, CreateInventory, UpdateInventory
 from pipelines.inventory_pipelines import (
     get_all_inventory_pipeline,
@@ -9,10 +10,9 @@ from pipelines.inventory_pipelines import (
     validate_catalog_pipeline,
     get_inventory_pipeline
 )
-from anyio.to_thread import run_sync  # importante para ejecutar código bloqueante sin bloquear el event loop
 
-coll = get_collection("inventory")
-catalog_coll = get_collection("catalogs")  # colección de catálogos
+coll = get_async_collection("inventory")
+catalog_coll = get_async_collection("catalogs")  # colección de catálogos
 
 
 async def create_inventory_controller(item: CreateInventory) -> dict:
@@ -22,9 +22,13 @@ async def create_inventory_controller(item: CreateInventory) -> dict:
         # Conversión obligatoria: date → datetime
         item_dict["entry_date"] = datetime.combine(item_dict["entry_date"], datetime.min.time())
 
+        item_dict["id_catalog"] = ObjectId(item.id_catalog)
         item_dict["active"] = True
-        result = coll.insert_one(item_dict)
+        item_dict["reserved_quantity"] = 0
+        item_dict["schema_version"] = SCHEMA_VERSION
+        result = await coll.insert_one(item_dict)
         item_dict["id"] = str(result.inserted_id)
+        item_dict["id_catalog"] = item.id_catalog
         return item_dict
 
     except Exception as e:
@@ -35,7 +39,7 @@ async def create_inventory_controller(item: CreateInventory) -> dict:
 async def get_inventory_controller(skip: int = 0, limit: int = 0, available_only: bool = False) -> list[InventoryItem]:
     try:
         pipeline = get_inventory_pipeline(skip=skip, limit=limit, available_only=available_only)
-        results = await run_sync(lambda: list(coll.aggregate(pipeline)))
+        results = await aggregate_list(coll, pipeline)
         return results
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error obteniendo inventario: {str(e)}")
@@ -47,7 +51,7 @@ async def get_inventory_by_id_controller(item_id: str) -> InventoryItem:
             raise HTTPException(status_code=400, detail="ID inválido")
 
         pipeline = get_inventory_by_id_pipeline(item_id)
-        results = await run_sync(lambda: list(coll.aggregate(pipeline)))
+        results = await aggregate_list(coll, pipeline)
         if not results:
             raise HTTPException(status_code=404, detail="Inventario no encontrado")
 
@@ -64,11 +68,9 @@ async def update_inventory_controller(item_id: str, item: UpdateInventory) -> In
 
         update_data = item.model_dump(exclude_unset=True)
 
-        result = await run_sync(
-            lambda: coll.update_one(
-                {"_id": ObjectId(item_id), "active": True},
-                {"$set": update_data}
-            )
+        result = await coll.update_one(
+            {"_id": ObjectId(item_id), "active": True},
+            {"$set": update_data}
         )
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Inventario no encontrado")
@@ -1,53 +1,96 @@
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
 from models.order_details import CreateOrderDetail, UpdateOrderDetail
-from pipelines.order_detail_pipelines import get_order_details_pipeline
-from utils.mongodb import get_collection
+from pipelines.order_detail_pipelines import (
+    get_order_details_pipeline,
+    get_order_totals_delta_update,
+    get_order_line_snapshot_pipeline
+)
+from utils.mongodb import get_async_collection, aggregate_list, run_transaction_if_supported
+from utils.schema import SCHEMA_VERSION
+from utils.stock import reserve, reserves_stock
 
 # Conexión a las colecciones
-order_details_collection = get_collection("order_details")
-orders_collection = get_collection("orders")
-inventory_collection = get_collection("inventory")  
+order_details_collection = get_async_collection("order_details")
+orders_collection = get_async_collection("orders")
+inventory_collection = get_async_collection("inventory")  
 
-# Función para recalcular totales de la orden
+TAX_RATE = 0.15
+
+TOTALS_PROJECTION = {"subtotal": 1, "taxes": 1, "discount": 1, "total": 1, "current_status": 1}
+
+
+def format_order_totals(order: dict) -> dict:
+    return {
+        "success": True,
+        "subtotal": order.get("subtotal", 0.0),
+        "taxes": order.get("taxes", 0.0),
+        "discount": order.get("discount", 0.0),
+        "total": order.get("total", 0.0)
+    }
+
+
+# Ajustar los totales de la orden con el delta de la línea que cambió.
+# Devuelve la orden (totales y current_status) tal como quedó en esta escritura:
+# dentro de la transacción, un cambio de estado concurrente (checkout) choca con
+# esta escritura en vez de pasar desapercibido.
+async def apply_totals_delta(order_id: ObjectId, subtotal_delta: float, item_delta: int = 0, session=None) -> dict:
+    return await orders_collection.find_one_and_update(
+        {"_id": order_id},
+        get_order_totals_delta_update(subtotal_delta, TAX_RATE, item_delta),
+        projection=TOTALS_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+
+
+async def get_unit_price(detail: dict) -> float:
+    """Precio guardado en la línea; las líneas anteriores a la foto de precio usan el sale_price actual"""
+    if detail.get("unit_price") is not None:
+        return detail["unit_price"]
+    product = await inventory_collection.find_one({"_id": detail["id_inventory"]}, {"sale_price": 1})
+    return (product or {}).get("sale_price", 0)
+
+
+# Recalcular todos los totales de la orden desde sus líneas (reparación, no se usa en cada cambio)
 async def recalculate_order_totals(order_id: str) -> dict:
     try:
         pipeline = [
-            {"$match": {"id_order": order_id, "active": True}},
+            {"$match": {"id_order": ObjectId(order_id), "active": True}},
             {
                 "$lookup": {
                     "from": "inventory",
-                    "let": {"inventory_id": {"$toObjectId": "$id_inventory"}},
-                    "pipeline": [{"$match": {"$expr": {"$eq": ["$_id", "$$inventory_id"]}}}],
+                    "localField": "id_inventory",
+                    "foreignField": "_id",
                     "as": "product_info"
                 }
             },
             {"$addFields": {
-                "product_price": {"$arrayElemAt": ["$product_info.cost", 0]},
-                "line_subtotal": {
-                    "$cond": {
-                        "if": {"$gt": [{"$size": "$product_info"}, 0]},
-                        "then": {"$multiply": ["$quantity", {"$arrayElemAt": ["$product_info.cost", 0]}]},
-                        "else": 0
-                    }
-                }
+                # Precio guardado en la línea; el sale_price actual solo para líneas antiguas
+                "product_price": {"$ifNull": ["$unit_price", {"$arrayElemAt": ["$product_info.sale_price", 0]}]}
+            }},
+            {"$addFields": {
+                "line_subtotal": {"$multiply": ["$quantity", {"$ifNull": ["$product_price", 0]}]}
             }},
             {"$group": {
                 "_id": None,
                 "subtotal": {"$sum": "$line_subtotal"},
-                "total_items": {"$sum": "$quantity"}
+                "total_items": {"$sum": "$quantity"},
+                "item_count": {"$sum": 1}
             }}
         ]
-        result = list(order_details_collection.aggregate(pipeline))
+        result = await aggregate_list(order_details_collection, pipeline)
+
+        item_count = result[0]["item_count"] if result else 0
 
         if result and result[0]["subtotal"] > 0:
             subtotal = result[0]["subtotal"]
-            tax_rate = 0.15
-            taxes = subtotal * tax_rate
+            taxes = subtotal * TAX_RATE
             discount = 0.0
             total = subtotal + taxes - discount
 
-            update_result = orders_collection.update_one(
+            await orders_collection.update_one(
                 {"_id": ObjectId(order_id)},
                 {
                     "$set": {
@@ -55,22 +98,22 @@ async def recalculate_order_totals(order_id: str) -> dict:
                         "taxes": round(taxes, 2),
                         "discount": discount,
                         "total": round(total, 2),
+                        "item_count": item_count,
                         "date_updated": datetime.utcnow()
                     }
                 }
             )
 
-            if update_result.modified_count > 0:
-                return {
-                    "success": True,
-                    "subtotal": round(subtotal, 2),
-                    "taxes": round(taxes, 2),
-                    "discount": discount,
-                    "total": round(total, 2)
-                }
+            return {
+                "success": True,
+                "subtotal": round(subtotal, 2),
+                "taxes": round(taxes, 2),
+                "discount": discount,
+                "total": round(total, 2)
+            }
         else:
             # No hay detalles activos, reiniciar totales
-            orders_collection.update_one(
+            await orders_collection.update_one(
                 {"_id": ObjectId(order_id)},
                 {
                     "$set": {
@@ -78,6 +121,7 @@ async def recalculate_order_totals(order_id: str) -> dict:
                         "taxes": 0.0,
                         "discount": 0.0,
                         "total": 0.0,
+                        "item_count": item_count,
                         "date_updated": datetime.utcnow()
                     }
                 }
@@ -93,38 +137,58 @@ async def create_order_detail(order_id: str, detail_data: CreateOrderDetail, req
         if not ObjectId.is_valid(order_id):
             return {"success": False, "message": "ID de orden inválido", "data": None}
 
-        order_info = orders_collection.find_one({"_id": ObjectId(order_id)})
+        order_info = await orders_collection.find_one({"_id": ObjectId(order_id)})
         if not order_info:
             return {"success": False, "message": "Orden no encontrada", "data": None}
 
         if not is_admin and requesting_user_id:
-            if order_info["id_user"] != requesting_user_id:
+            if str(order_info["id_user"]) != requesting_user_id:
                 return {"success": False, "message": "No tienes permiso para modificar esta orden", "data": None}
 
-        # Validar existencia del inventario/producto
-        product_exists = inventory_collection.find_one({"_id": ObjectId(detail_data.id_inventory)})
+        # Validar existencia del inventario/producto y tomar su precio, nombre y catálogo
+        if not ObjectId.is_valid(detail_data.id_inventory):
+            return {"success": False, "message": "ID de producto inválido", "data": None}
+        snapshot = await aggregate_list(inventory_collection, get_order_line_snapshot_pipeline(detail_data.id_inventory))
+        product_exists = snapshot[0] if snapshot else None
         if not product_exists:
             return {"success": False, "message": "Producto no encontrado en inventario", "data": None}
 
         # Verificar si ya existe el detalle activo para ese inventario en la orden
-        existing_detail = order_details_collection.find_one({
-            "id_order": order_id,
-            "id_inventory": detail_data.id_inventory,
+        existing_detail = await order_details_collection.find_one({
+            "id_order": ObjectId(order_id),
+            "id_inventory": ObjectId(detail_data.id_inventory),
             "active": True
         })
         if existing_detail:
             return {"success": False, "message": "Este producto ya está en la orden", "data": None}
 
         detail_dict = detail_data.dict()
-        detail_dict["id_order"] = order_id
+        detail_dict["id_order"] = ObjectId(order_id)
+        detail_dict["id_inventory"] = ObjectId(detail_data.id_inventory)
+        # Precio y nombre que vio el cliente al agregar el producto
+        detail_dict["id_catalog"] = product_exists.get("id_catalog")
+        detail_dict["unit_price"] = product_exists.get("unit_price", 0)
+        detail_dict["product_name"] = product_exists.get("product_name")
         detail_dict["date_created"] = datetime.utcnow()
         detail_dict["date_updated"] = datetime.utcnow()
         detail_dict["active"] = True
+        detail_dict["schema_version"] = SCHEMA_VERSION
+
+        unit_price = detail_dict["unit_price"]
 
-        result = order_details_collection.insert_one(detail_dict)
+        # La línea, la reserva y los totales de la orden se escriben juntos (en un mongod
+        # standalone, sin transacción: ver run_transaction_if_supported). La reserva
+        # depende del estado de la orden leído en la misma transacción, no del de antes
+        async def add_line(session):
+            result = await order_details_collection.insert_one(detail_dict, session=session)
+            order = await apply_totals_delta(ObjectId(order_id), detail_dict["quantity"] * unit_price, item_delta=1, session=session)
+            if reserves_stock(order.get("current_status")):
+                await reserve(detail_dict["id_inventory"], detail_dict["quantity"], session=session)
+            return result, format_order_totals(order)
+
+        result, totals_result = await run_transaction_if_supported(add_line)
 
         if result.inserted_id:
-            totals_result = await recalculate_order_totals(order_id)
             response_data = {"id": str(result.inserted_id)}
             if totals_result["success"]:
                 response_data["order_totals"] = {
@@ -146,16 +210,16 @@ async def get_order_details(order_id: str, requesting_user_id: str = None, is_ad
         if not ObjectId.is_valid(order_id):
             return {"success": False, "message": "ID de orden inválido", "data": None}
 
-        order_info = orders_collection.find_one({"_id": ObjectId(order_id)})
+        order_info = await orders_collection.find_one({"_id": ObjectId(order_id)})
         if not order_info:
             return {"success": False, "message": "Orden no encontrada", "data": None}
 
         if not is_admin and requesting_user_id:
-            if order_info["id_user"] != requesting_user_id:
+            if str(order_info["id_user"]) != requesting_user_id:
                 return {"success": False, "message": "No tienes permiso para ver esta orden", "data": None}
 
         pipeline = get_order_details_pipeline(order_id)
-        details = list(order_details_collection.aggregate(pipeline))
+        details = await aggregate_list(order_details_collection, pipeline)
 
         return {"success": True, "message": "Detalles obtenidos exitosamente", "data": {"order_id": order_id, "details": details}}
 
@@ -168,30 +232,44 @@ async def update_order_detail(order_id: str, detail_id: str, update_data: Update
         if not ObjectId.is_valid(order_id) or not ObjectId.is_valid(detail_id):
             return {"success": False, "message": "ID inválido", "data": None}
 
-        detail_info = order_details_collection.find_one({
+        detail_info = await order_details_collection.find_one({
             "_id": ObjectId(detail_id),
-            "id_order": order_id,
+            "id_order": ObjectId(order_id),
             "active": True
         })
 
         if not detail_info:
             return {"success": False, "message": "Detalle no encontrado o no pertenece a esta orden", "data": None}
 
+        order_info = await orders_collection.find_one({"_id": ObjectId(order_id)})
         if not is_admin and requesting_user_id:
-            order_info = orders_collection.find_one({"_id": ObjectId(order_id)})
-            if order_info["id_user"] != requesting_user_id:
+            if str(order_info["id_user"]) != requesting_user_id:
                 return {"success": False, "message": "No tienes permiso para modificar este detalle", "data": None}
 
         update_dict = update_data.dict()
         update_dict["date_updated"] = datetime.utcnow()
+        unit_price = await get_unit_price(detail_info)
+
+        # El delta sale de la cantidad que tenía la línea justo antes de esta escritura
+        async def change_line(session):
+            previous = await order_details_collection.find_one_and_update(
+                {"_id": ObjectId(detail_id), "active": True},
+                {"$set": update_dict},
+                projection={"quantity": 1},
+                return_document=ReturnDocument.BEFORE,
+                session=session
+            )
+            if not previous:
+                return None
+            quantity_delta = update_data.quantity - previous.get("quantity", 0)
+            order = await apply_totals_delta(ObjectId(order_id), quantity_delta * unit_price, session=session)
+            if reserves_stock(order.get("current_status")):
+                await reserve(detail_info["id_inventory"], quantity_delta, session=session)
+            return format_order_totals(order)
 
-        result = order_details_collection.update_one(
-            {"_id": ObjectId(detail_id)},
-            {"$set": update_dict}
-        )
+        totals_result = await run_transaction_if_supported(change_line)
 
-        if result.modified_count > 0:
-            totals_result = await recalculate_order_totals(order_id)
+        if totals_result:
             return {"success": True, "message": "Detalle actualizado exitosamente", "data": totals_result}
 
         return {"success": False, "message": "No se pudo actualizar el detalle", "data": None}
@@ -205,30 +283,59 @@ async def delete_order_detail(order_id: str, detail_id: str, requesting_user_id:
         if not ObjectId.is_valid(order_id) or not ObjectId.is_valid(detail_id):
             return {"success": False, "message": "ID inválido", "data": None}
 
-        detail_info = order_details_collection.find_one({
+        detail_info = await order_details_collection.find_one({
             "_id": ObjectId(detail_id),
-            "id_order": order_id,
+            "id_order": ObjectId(order_id),
             "active": True
         })
 
         if not detail_info:
             return {"success": False, "message": "Detalle no encontrado o no pertenece a esta orden", "data": None}
 
+        order_info = await orders_collection.find_one({"_id": ObjectId(order_id)})
         if not is_admin and requesting_user_id:
-            order_info = orders_collection.find_one({"_id": ObjectId(order_id)})
-            if order_info["id_user"] != requesting_user_id:
+            if str(order_info["id_user"]) != requesting_user_id:
                 return {"success": False, "message": "No tienes permiso para eliminar este detalle", "data": None}
 
-        result = order_details_collection.update_one(
-            {"_id": ObjectId(detail_id)},
-            {"$set": {"active": False, "date_updated": datetime.utcnow()}}
-        )
+        unit_price = await get_unit_price(detail_info)
+
+        async def remove_line(session):
+            previous = await order_details_collection.find_one_and_update(
+                {"_id": ObjectId(detail_id), "active": True},
+                {"$set": {"active": False, "date_updated": datetime.utcnow()}},
+                projection={"quantity": 1},
+                return_document=ReturnDocument.BEFORE,
+                session=session
+            )
+            if not previous:
+                return None
+            quantity = previous.get("quantity", 0)
+            order = await apply_totals_delta(ObjectId(order_id), -quantity * unit_price, item_delta=-1, session=session)
+            if reserves_stock(order.get("current_status")):
+                await reserve(detail_info["id_inventory"], -quantity, session=session)
+            return format_order_totals(order)
+
+        totals_result = await run_transaction_if_supported(remove_line)
 
-        if result.modified_count > 0:
-            totals_result = await recalculate_order_totals(order_id)
+        if totals_result:
             return {"success": True, "message": "Detalle eliminado exitosamente", "data": totals_result}
 
         return {"success": False, "message": "No se pudo eliminar el detalle", "data": None}
 
     except Exception as e:
         return {"success": False, "message": str(e), "data": None}
+
+# Recalcular totales de una orden (solo admin)
+async def repair_order_totals(order_id: str) -> dict:
+    if not ObjectId.is_valid(order_id):
+        return {"success": False, "message": "ID de orden inválido", "data": None}
+
+    order_info = await orders_collection.find_one({"_id": ObjectId(order_id)}, {"_id": 1})
+    if not order_info:
+        return {"success": False, "message": "Orden no encontrada", "data": None}
+
+    totals_result = await recalculate_order_totals(order_id)
+    if not totals_result["success"]:
+        return {"success": False, "message": totals_result["message"], "data": None}
+
+    return {"success": True, "message": "Totales recalculados exitosamente", "data": totals_result}
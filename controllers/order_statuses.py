@@ -1,14 +1,19 @@
 from models.order_statuses import OrderStatus
-from utils.mongodb import get_collection
+from utils.mongodb import get_async_collection, aggregate_list
 from fastapi import HTTPException
 from bson import ObjectId
+from datetime import datetime
+from utils.reference_cache import order_statuses
+from utils.conditional import Validators, probe_validators
+from pipelines.version_pipelines import get_version_probe_pipeline
+from utils.order_states import get_order_state_machine
 from pipelines.order_status_pipelines import (
     check_duplicate_order_status_description_pipeline, 
     get_order_status_by_id_pipeline
     )
 
 
-coll = get_collection("order_statuses")
+coll = get_async_collection("order_statuses")
 
 async def create_order_status(order_status: OrderStatus) -> dict:
     """Crear un nuevo order status"""
@@ -18,13 +23,14 @@ async def create_order_status(order_status: OrderStatus) -> dict:
 
         # Verificar si ya existe un order status con la misma descripción (usando pipeline)
         pipeline = check_duplicate_order_status_description_pipeline(order_status.description)
-        result = list(coll.aggregate(pipeline))
+        result = await aggregate_list(coll, pipeline)
         if result:
             raise HTTPException(status_code=400, detail="Order status with this description already exists")
 
         # Crear el order status
         order_status_dict = order_status.model_dump(exclude={"id"})
-        inserted = coll.insert_one(order_status_dict)
+        inserted = await coll.insert_one({**order_status_dict, "date_updated": datetime.utcnow()})
+        await order_statuses.refresh()
 
         # Retornar el order status creado con su ID
         order_status_dict["id"] = str(inserted.inserted_id)
@@ -39,28 +45,41 @@ async def get_order_statuses() -> dict:
     """Obtener todos los order statuses"""
     try:
         # Obtener todos los order statuses directamente
-        order_statuses_cursor = coll.find({})
-        order_statuses = []
+        statuses = []
         
-        for status in order_statuses_cursor:
+        async for status in coll.find({}):
             status["id"] = str(status["_id"])
             del status["_id"]
-            order_statuses.append(status)
+            statuses.append(status)
         
         return {
-            "order_statuses": order_statuses,
-            "total": len(order_statuses)
+            "order_statuses": statuses,
+            "total": len(statuses)
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching order statuses: {str(e)}")
 
+async def get_order_statuses_validators() -> Validators | None:
+    """Versión de GET /order-statuses; sin Last-Modified porque los estados se borran físicamente"""
+    result = await aggregate_list(coll, get_version_probe_pipeline())
+    validators = probe_validators(result, "order_statuses")
+    return validators and Validators(validators.etag)
+
+async def get_order_status_transitions() -> dict:
+    """Grafo de transiciones compilado (estados, destinos permitidos y efectos)"""
+    try:
+        state_machine = await get_order_state_machine()
+        return state_machine.graph()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching order status transitions: {str(e)}")
+
 async def get_order_status_by_id(order_status_id: str) -> dict:
     if not ObjectId.is_valid(order_status_id):
         raise HTTPException(status_code=400, detail="Invalid order status ID")
 
     pipeline = get_order_status_by_id_pipeline(order_status_id)
-    result = list(coll.aggregate(pipeline))
+    result = await aggregate_list(coll, pipeline)
     if not result:
         raise HTTPException(status_code=404, detail="Order status not found")
 
@@ -74,7 +93,7 @@ async def update_order_status(order_status_id: str, order_status: OrderStatus) -
             raise HTTPException(status_code=400, detail="Invalid order status ID")
 
         # Verificar que el order status existe
-        existing = coll.find_one({"_id": ObjectId(order_status_id)})
+        existing = await coll.find_one({"_id": ObjectId(order_status_id)})
 
         if not existing:
             raise HTTPException(status_code=404, detail="Order status not found")
@@ -83,7 +102,7 @@ async def update_order_status(order_status_id: str, order_status: OrderStatus) -
         order_status.description = order_status.description.strip().lower()
 
         # Verificar si ya existe otro order status con la misma descripción
-        duplicate = coll.find_one({
+        duplicate = await coll.find_one({
             "description": order_status.description,
             "_id": {"$ne": ObjectId(order_status_id)}
         })
@@ -93,14 +112,16 @@ async def update_order_status(order_status_id: str, order_status: OrderStatus) -
 
         # Actualizar el order status
         order_status_dict = order_status.model_dump(exclude={"id"})
-        result = coll.update_one(
+        result = await coll.update_one(
             {"_id": ObjectId(order_status_id)},
-            {"$set": order_status_dict}
+            {"$set": {**order_status_dict, "date_updated": datetime.utcnow()}}
         )
 
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Order status not found")
 
+        await order_statuses.refresh()
+
         # Retornar el order status actualizado
         order_status_dict["id"] = order_status_id
         return order_status_dict
@@ -118,17 +139,19 @@ async def delete_order_status(order_status_id: str) -> dict:
             raise HTTPException(status_code=400, detail="Invalid order status ID")
 
         # Obtener el order status antes de eliminarlo
-        order_status = coll.find_one({"_id": ObjectId(order_status_id)})
+        order_status = await coll.find_one({"_id": ObjectId(order_status_id)})
 
         if not order_status:
             raise HTTPException(status_code=404, detail="Order status not found")
 
         # Eliminar el order status
-        result = coll.delete_one({"_id": ObjectId(order_status_id)})
+        result = await coll.delete_one({"_id": ObjectId(order_status_id)})
 
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Order status not found")
 
+        await order_statuses.refresh()
+
         # Convertir ObjectId a string para la respuesta
         order_status["id"] = str(order_status["_id"])
         del order_status["_id"]
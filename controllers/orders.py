@@ -3,43 +3,78 @@ from models.order_status_records import OrderStatusRecord, CreateOrderStatusReco
 from pipelines.order_pipelines import (
     get_all_orders_pipeline,
     get_orders_by_user_pipeline,
+    get_orders_keyset_pipeline,
     get_order_by_id_pipeline,
     get_order_owner_pipeline,
-    get_existing_inprogress_order_pipeline
+    get_inprogress_order_filter
+)
+from utils.mongodb import get_async_collection, aggregate_list, run_transaction
+from pipelines.facet_pipelines import get_page_with_total_pipeline, unpack_page_with_total
+from utils.counts import estimated_count
+from utils.pagination import InvalidCursorError, keyset_filter, next_cursor
+from controllers.catalogs import invalidate_catalogs
+from utils.order_states import get_order_state_machine
+from utils.reference_cache import order_statuses
+from utils.conditional import Validators, make_etag
+from utils.schema import SCHEMA_VERSION
+from utils.stock import (
+    InsufficientStockError,
+    apply_status_change,
+    checkout_order_stock,
+    find_insufficient_stock
 )
-from utils.mongodb import get_collection
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime
 
+class StaleOrderStatusError(Exception):
+    """El estado de la orden cambió entre la lectura y la escritura condicional"""
+
+
 # Conexión a las colecciones  
-orders_collection = get_collection("orders")
-users_collection = get_collection("users")
-order_status_records_collection = get_collection("order_status_record")  # Historial de cambios de estado
-order_statuses_collection = get_collection("order_statuses")  # Catálogo de estados disponibles
-order_details_collection = get_collection("order_details")
-inventory_collection = get_collection("inventory")
-catalogs_collection = get_collection("catalogs")
+orders_collection = get_async_collection("orders")
+users_collection = get_async_collection("users")
+order_status_records_collection = get_async_collection("order_status_record")  # Historial de cambios de estado
+order_details_collection = get_async_collection("order_details")
+inventory_collection = get_async_collection("inventory")
+catalogs_collection = get_async_collection("catalogs")
 
 
 # ============================================================================
 # ORDERS - FUNCIONES DE CREACIÓN
 # ============================================================================
 
+def format_inprogress_order(order: dict) -> dict:
+    """Formato de respuesta para la orden en progreso del usuario"""
+    return {
+        "_id": str(order["_id"]),
+        "id_user": str(order["id_user"]),
+        "date": order.get("date"),
+        "subtotal": order.get("subtotal", 0.0),
+        "taxes": order.get("taxes", 0.0),
+        "discount": order.get("discount", 0.0),
+        "total": order.get("total", 0.0),
+        "status": order.get("current_status"),
+        "payment_method": order.get("payment_method") or "",
+        "delivery_type": order.get("delivery_type") or ""
+    }
+
+
 async def create_order(order_data: CreateOrder, user_id: str) -> dict:
     """Crear una nueva orden o retornar la existente en 'inprogress'"""
     try:
         # Validar que el usuario existe
-        user_exists = users_collection.find_one({"_id": ObjectId(user_id)})
+        user_exists = await users_collection.find_one({"_id": ObjectId(user_id)})
         if not user_exists:
             return {"success": False, "message": "Usuario no encontrado", "data": None}
 
-        # Verificar si ya existe una orden en "inprogress"
-        existing_order = list(orders_collection.aggregate(get_existing_inprogress_order_pipeline(user_id)))
+        # Verificar si ya existe una orden en "inprogress" (estado guardado en la orden)
+        existing_order = await orders_collection.find_one(get_inprogress_order_filter(user_id))
         if existing_order:
             return {
                 "success": True,
                 "message": "Ya tienes una orden en progreso",
-                "data": existing_order[0]
+                "data": format_inprogress_order(existing_order)
             }
 
         # Validar valores de payment_method y delivery_type
@@ -49,35 +84,48 @@ async def create_order(order_data: CreateOrder, user_id: str) -> dict:
         if order_data.delivery_type and order_data.delivery_type not in ["pickup", "shipping"]:
             return {"success": False, "message": "Tipo de entrega inválido", "data": None}
 
+        # Estado inicial "InProgress" (caché de referencia)
+        initial_status = await order_statuses.find("inprogress")
+
         # Crear nueva orden vacía
         order_dict = {
-            "id_user": user_id,
+            "id_user": ObjectId(user_id),
             "date": datetime.utcnow(),
             "payment_method": order_data.payment_method,
             "delivery_type": order_data.delivery_type,
             "subtotal": 0.0,
             "taxes": 0.0,
             "discount": 0.0,
-            "total": 0.0
+            "total": 0.0,
+            "item_count": 0,
+            "schema_version": SCHEMA_VERSION
         }
-
-        result = orders_collection.insert_one(order_dict)
+        if initial_status:
+            order_dict["current_status_id"] = initial_status["_id"]
+            order_dict["current_status"] = "inprogress"
+
+        try:
+            result = await orders_collection.insert_one(order_dict)
+        except DuplicateKeyError:
+            # Otra petición concurrente creó la orden en progreso (índice único parcial)
+            existing_order = await orders_collection.find_one(get_inprogress_order_filter(user_id))
+            if existing_order:
+                return {
+                    "success": True,
+                    "message": "Ya tienes una orden en progreso",
+                    "data": format_inprogress_order(existing_order)
+                }
+            raise
 
         if result.inserted_id:
-            # Crear estado inicial "InProgress"
-            initial_status = list(order_statuses_collection.aggregate([
-                {"$match": {"description": "inprogress"}},
-                {"$project": {"_id": 1}},
-                {"$limit": 1}
-            ]))
-
             if initial_status:
                 status_data = {
-                    "id_order": str(result.inserted_id),
-                    "id_status": str(initial_status[0]["_id"]),
-                    "date": datetime.utcnow()
+                    "id_order": result.inserted_id,
+                    "id_status": initial_status["_id"],
+                    "date": datetime.utcnow(),
+                    "schema_version": SCHEMA_VERSION
                 }
-                order_status_records_collection.insert_one(status_data)
+                await order_status_records_collection.insert_one(status_data)
 
             created_order = {
                 "_id": str(result.inserted_id),
@@ -109,27 +157,57 @@ async def create_order(order_data: CreateOrder, user_id: str) -> dict:
 # ORDERS - FUNCIONES DE CONSULTA
 # ============================================================================
 
-async def get_orders(skip: int = 0, limit: int = 50, user_id: str = None) -> dict:
-    """Obtener órdenes (todas o de un usuario específico)"""
+async def get_orders(skip: int = 0, limit: int = 50, user_id: str = None, cursor: str = None, total_mode: str = "exact") -> dict:
+    """
+    Obtener órdenes (todas o de un usuario específico).
+
+    Con cursor (cadena vacía para la primera página) pagina por (date, _id)
+    sin $skip ni conteo total; sin cursor se mantiene el modo skip/limit, con
+    el total según total_mode (ver utils/counts.py).
+    """
     try:
         if user_id:
             # Validar que el usuario existe (consulta directa)
-            user_exists = users_collection.find_one({"_id": ObjectId(user_id)})
+            user_exists = await users_collection.find_one({"_id": ObjectId(user_id)})
             if not user_exists:
                 return {"success": False, "message": "Usuario no encontrado", "data": None}
-            
-            pipeline = get_orders_by_user_pipeline(user_id, skip, limit)
-        else:
-            pipeline = get_all_orders_pipeline(skip, limit)
-        
-        orders = list(orders_collection.aggregate(pipeline))
-        
-        # Contar total de documentos
-        if user_id:
-            total = orders_collection.count_documents({"id_user": user_id})  # Buscar por string
+
+        if cursor is not None:
+            try:
+                after = keyset_filter(cursor)
+            except InvalidCursorError as e:
+                return {"success": False, "message": str(e), "data": None}
+
+            orders = await aggregate_list(orders_collection, get_orders_keyset_pipeline(user_id, after, limit))
+            return {
+                "success": True,
+                "message": "Órdenes obtenidas exitosamente",
+                "data": {
+                    "orders": orders[:limit],
+                    "limit": limit,
+                    "next_cursor": next_cursor(orders, limit)
+                }
+            }
+
+        count_filter = {"id_user": ObjectId(user_id)} if user_id else {}
+
+        def build(page_limit):
+            if user_id:
+                return get_orders_by_user_pipeline(user_id, skip, page_limit)
+            return get_all_orders_pipeline(skip, page_limit)
+
+        if total_mode == "exact":
+            # Página y total en una sola agregación
+            result = await aggregate_list(orders_collection, get_page_with_total_pipeline(build(limit)))
+            orders, total = unpack_page_with_total(result)
+            has_more = skip + len(orders) < total
         else:
-            total = orders_collection.count_documents({})
-        
+            # Un documento de más para saber si hay otra página sin contar
+            orders = await aggregate_list(orders_collection, build(limit + 1))
+            has_more = len(orders) > limit
+            orders = orders[:limit]
+            total = await estimated_count(orders_collection, count_filter) if total_mode == "estimated" else None
+
         return {
             "success": True,
             "message": "Órdenes obtenidas exitosamente",
@@ -138,7 +216,7 @@ async def get_orders(skip: int = 0, limit: int = 50, user_id: str = None) -> dic
                 "total": total,
                 "skip": skip,
                 "limit": limit,
-                "has_more": skip + len(orders) < total
+                "has_more": has_more
             }
         }
     
@@ -150,6 +228,26 @@ async def get_orders(skip: int = 0, limit: int = 50, user_id: str = None) -> dic
 # ORDERS - FUNCIONES DE CONSULTA ESPECÍFICA
 # ============================================================================
 
+async def get_order_validators(order_id: str, requesting_user_id: str = None, is_admin: bool = False) -> Validators | None:
+    """
+    Versión de GET /orders/{id} sin ejecutar los $lookup: date_updated cambia
+    con cada cambio de estado y de líneas (ver apply_totals_delta). Devuelve
+    None si la orden no existe o no es del usuario, para que get_order_by_id
+    responda el error.
+    """
+    if not ObjectId.is_valid(order_id):
+        return None
+    order = await orders_collection.find_one({"_id": ObjectId(order_id)}, {"id_user": 1, "date": 1, "date_updated": 1})
+    if not order or (not is_admin and str(order.get("id_user")) != requesting_user_id):
+        return None
+
+    last_modified = order.get("date_updated") or order.get("date")
+    if last_modified is None:
+        return None
+    await order_statuses.ensure_fresh()
+    return Validators(make_etag("order", order_id, last_modified, order_statuses.digest), last_modified)
+
+
 async def get_order_by_id(order_id: str, requesting_user_id: str = None, is_admin: bool = False) -> dict:
     """Obtener una orden específica por ID"""
     try:
@@ -159,7 +257,7 @@ async def get_order_by_id(order_id: str, requesting_user_id: str = None, is_admi
 
         # Si no es admin, verificar que la orden pertenece al usuario
         if not is_admin and requesting_user_id:
-            owner_result = list(orders_collection.aggregate(get_order_owner_pipeline(order_id)))
+            owner_result = await aggregate_list(orders_collection, get_order_owner_pipeline(order_id))
             if not owner_result:
                 return {"success": False, "message": "Orden no encontrada", "data": None}
 
@@ -168,11 +266,17 @@ async def get_order_by_id(order_id: str, requesting_user_id: str = None, is_admi
 
         # Obtener orden con detalles completos
         pipeline = get_order_by_id_pipeline(order_id)
-        orders = list(orders_collection.aggregate(pipeline))
+        orders = await aggregate_list(orders_collection, pipeline)
 
         if not orders:
             return {"success": False, "message": "Orden no encontrada", "data": None}
 
+        # Descripción de cada estado del historial desde el caché de referencia
+        descriptions = await order_statuses.descriptions()
+        for record in orders[0].get("status_history", []):
+            status_id = record.get("id_status")
+            record["status"] = descriptions.get(ObjectId(status_id)) if status_id and ObjectId.is_valid(status_id) else None
+
         return {
             "success": True,
             "message": "Orden obtenida exitosamente",
@@ -188,111 +292,116 @@ async def get_order_by_id(order_id: str, requesting_user_id: str = None, is_admi
 # ============================================================================
 
 async def update_order_status(order_id: str, order_status_id: str = None, requesting_user_id: str = None, is_admin: bool = False) -> dict:
-    """Actualizar el estado de una orden (solo para users si es su orden, o admins)"""
+    """
+    Actualizar el estado de una orden (solo para users si es su orden, o admins).
+
+    Las transiciones permitidas y sus efectos salen de utils.order_states:
+    una lectura de la orden y una escritura condicional sobre su estado actual.
+    """
     try:
         # Validar ObjectId
         if not ObjectId.is_valid(order_id):
             return {"success": False, "message": "ID de orden inválido", "data": None}
 
         # Verificar que la orden existe
-        order_exists = orders_collection.find_one({"_id": ObjectId(order_id)})
+        order_exists = await orders_collection.find_one(
+            {"_id": ObjectId(order_id)},
+            {"id_user": 1, "current_status": 1, "current_status_id": 1, "item_count": 1}
+        )
         if not order_exists:
             return {"success": False, "message": "Orden no encontrada", "data": None}
 
-        # Verificar permisos y restricciones para usuarios no admin
+        # Verificar permisos para usuarios no admin
         if not is_admin:
             if not requesting_user_id:
                 return {"success": False, "message": "Usuario no especificado", "data": None}
 
-            if order_exists["id_user"] != requesting_user_id:
+            if str(order_exists["id_user"]) != requesting_user_id:
                 return {"success": False, "message": "No tienes permiso para modificar esta orden", "data": None}
 
-            # Verificar que el estado actual es "InProgress"
-            current_status = order_status_records_collection.find_one(
-                {"id_order": order_id},
-                sort=[("date", -1)]
-            )
-            if current_status:
-                current_status_info = order_statuses_collection.find_one({"_id": ObjectId(current_status["id_status"])})
-                if current_status_info and current_status_info["description"] != "inprogress":
-                    return {"success": False, "message": "Solo puedes finalizar órdenes en progreso", "data": None}
-
-            # Si no se pasa estado, asumimos "ordered"
-            if order_status_id is None:
-                ordered_status = order_statuses_collection.find_one({"description": "ordered"})
-                if not ordered_status:
-                    return {"success": False, "message": "Estado 'ordered' no encontrado en el sistema", "data": None}
-                order_status_id = str(ordered_status["_id"])
-
-            # Validar que la orden tenga productos activos antes de finalizar
-            active_products = order_details_collection.count_documents({
-                "id_order": order_id,
-                "active": True
-            })
-            if active_products == 0:
-                return {"success": False, "message": "No puedes finalizar una orden vacía. Agrega al menos un producto antes de finalizar.", "data": None}
-
-        # Validar estado para admins
-        if order_status_id:
+        state_machine = await get_order_state_machine()
+
+        # Si no se pasa estado, asumimos "ordered"
+        if order_status_id is None:
+            target = state_machine.find("ordered")
+            if not target:
+                return {"success": False, "message": "Estado 'ordered' no encontrado en el sistema", "data": None}
+        else:
             if not ObjectId.is_valid(order_status_id):
                 return {"success": False, "message": "ID de estado inválido", "data": None}
-
-            status_exists = order_statuses_collection.find_one({"_id": ObjectId(order_status_id)})
-            if not status_exists:
+            target = state_machine.get(order_status_id)
+            if not target:
                 return {"success": False, "message": "Estado de orden no encontrado", "data": None}
 
-            status_description = status_exists.get("description", "").lower()
-            states_requiring_products = ["ordered", "shipped", "delivered", "processing"]
-
-            if status_description in states_requiring_products:
-                active_products = order_details_collection.count_documents({
-                    "id_order": order_id,
-                    "active": True
-                })
-                if active_products == 0:
-                    return {"success": False, "message": f"No se puede cambiar a '{status_description}' una orden vacía. La orden debe tener al menos un producto.", "data": None}
-
-        # Si el nuevo estado es "ordered", actualizar inventario y catálogos
-        if status_description == "ordered":
-            # Obtener detalles activos de la orden
-            order_details = list(order_details_collection.find({"id_order": order_id, "active": True}))
-
-            for detail in order_details:
-                id_inventory = detail.get("id_inventory") or detail.get("id_producto")  # según cómo esté guardado
-                quantity_ordered = detail.get("quantity", 0)
-
-                # Actualizar cantidad en inventario: restar quantity_ordered
-                inventory_item = inventory_collection.find_one({"_id": ObjectId(id_inventory)})
-                if not inventory_item:
-                    return {"success": False, "message": f"Inventario no encontrado para el producto {id_inventory}", "data": None}
-
-                new_quantity = inventory_item.get("quantity", 0) - quantity_ordered
-                if new_quantity < 0:
-                    return {"success": False, "message": f"No hay suficiente stock para el producto {id_inventory}", "data": None}
-
-                inventory_collection.update_one(
-                    {"_id": ObjectId(id_inventory)},
-                    {"$set": {"quantity": new_quantity}}
-                )
-
-                # Si la cantidad queda en 0, desactivar el catálogo relacionado
-                if new_quantity == 0:
-                    # Obtener el catálogo asociado al inventario
-                    catalog_id = inventory_item.get("id_catalog")
-                    if catalog_id:
-                        catalogs_collection.update_one(
-                            {"_id": ObjectId(catalog_id)},
-                            {"$set": {"active": False}}
-                        )
-
-        # Insertar nuevo registro de estado
+        previous_status = order_exists.get("current_status")
+        not_allowed = state_machine.check_transition(previous_status, target, is_admin)
+        if not_allowed:
+            return {"success": False, "message": not_allowed, "data": None}
+
+        if target.requires_items:
+            item_count = order_exists.get("item_count")
+            if item_count is None:
+                # Órdenes anteriores al contador item_count
+                item_count = await order_details_collection.count_documents({"id_order": ObjectId(order_id), "active": True})
+            if item_count == 0:
+                if not is_admin:
+                    return {"success": False, "message": "No puedes finalizar una orden vacía. Agrega al menos un producto antes de finalizar.", "data": None}
+                return {"success": False, "message": f"No se puede cambiar a '{target.description}' una orden vacía. La orden debe tener al menos un producto.", "data": None}
+
+        current = state_machine.find(previous_status)
+        status_description = target.description
         status_data = {
-            "id_order": order_id,
-            "id_status": order_status_id,
-            "date": datetime.utcnow()
+            "id_order": ObjectId(order_id),
+            "id_status": target.id,
+            "date": datetime.utcnow(),
+            "schema_version": SCHEMA_VERSION
         }
 
-        result = order_status_records_collection.insert_one(status_data)
+        sold_out_catalogs = []
+
+        async def apply_transition(session):
+            # Escritura condicional: solo si la orden sigue en el estado que se leyó
+            # (índice único parcial: una sola orden "inprogress" por usuario)
+            result = await orders_collection.update_one(
+                {"_id": ObjectId(order_id), "current_status_id": order_exists.get("current_status_id")},
+                {"$set": {
+                    "current_status_id": target.id,
+                    "current_status": status_description,
+                    "date_updated": datetime.utcnow()
+                }},
+                session=session
+            )
+            if result.matched_count == 0:
+                raise StaleOrderStatusError()
+
+            if target.decrement_stock:
+                # Descontar el stock de todas las líneas y desactivar catálogos agotados
+                sold_out_catalogs[:] = await checkout_order_stock(
+                    ObjectId(order_id),
+                    release_reservation=bool(current and current.reserve_stock) and not target.reserve_stock,
+                    session=session
+                )
+            else:
+                # Reservar o liberar stock si la orden entra o sale de un estado que reserva
+                await apply_status_change(ObjectId(order_id), previous_status, status_description, session=session)
+
+            return await order_status_records_collection.insert_one(status_data, session=session)
+
+        # Todo o nada: si falta stock para una línea no se descuenta ninguna ni cambia el estado
+        try:
+            result = await run_transaction(apply_transition)
+        except StaleOrderStatusError:
+            return {"success": False, "message": "La orden cambió de estado mientras se actualizaba, intenta de nuevo", "data": None}
+        except DuplicateKeyError:
+            return {"success": False, "message": "El usuario ya tiene otra orden en progreso", "data": None}
+        except InsufficientStockError as e:
+            missing = await find_insufficient_stock(e.quantities)
+            products = ", ".join(str(inventory_id) for inventory_id in missing) or "uno o más productos"
+            return {"success": False, "message": f"No hay suficiente stock para el producto {products}", "data": None}
+
+        if sold_out_catalogs:
+            # Los catálogos agotados quedaron inactivos: sacarlos del caché de respuestas
+            await invalidate_catalogs(*sold_out_catalogs)
 
         if result.inserted_id:
             return {
@@ -1,25 +1,30 @@
 from fastapi import HTTPException
 from bson import ObjectId, errors
 from datetime import datetime
-from utils.mongodb import get_collection
+from utils.mongodb import get_async_collection, aggregate_list
+from utils.schema import SCHEMA_VERSION
+from utils.singleflight import SingleFlight
 from models.reviews import Review
 from pipelines.reviews_pipelines import get_reviews_by_catalog_pipeline, get_review_by_id_pipeline
 
-coll = get_collection("reviews")
+coll = get_async_collection("reviews")
+
+# Lecturas concurrentes de las reseñas de un mismo catálogo comparten la agregación
+review_reads = SingleFlight("reviews")
 
 async def get_reviews_by_catalog_id(catalog_id: str) -> list[Review]:
     try:
         try:
-            _ = ObjectId(catalog_id)
+            catalog_id = str(ObjectId(catalog_id))
         except errors.InvalidId:
             raise HTTPException(status_code=400, detail="ID de catálogo inválido")
 
         pipeline = get_reviews_by_catalog_pipeline(catalog_id)
-        docs = list(coll.aggregate(pipeline))
+        docs = await review_reads.do(("catalog", catalog_id), lambda: aggregate_list(coll, pipeline))
 
         reviews = []
         for doc in docs:
-            review_data = {k: doc[k] for k in Review._fields_.keys() if k in doc}
+            review_data = {k: doc[k] for k in Review.model_fields.keys() if k in doc}
             reviews.append(Review(**review_data))
 
         return reviews
@@ -33,7 +38,11 @@ async def create_review(review: Review) -> Review:
         review.review_date = datetime.utcnow()
         review.active = True
         review_dict = review.model_dump(exclude={"id"})
-        result = coll.insert_one(review_dict)
+        review_dict["id_user"] = ObjectId(review.id_user)
+        review_dict["id_catalog"] = ObjectId(review.id_catalog)
+        review_dict["schema_version"] = SCHEMA_VERSION
+        result = await coll.insert_one(review_dict)
+        review_reads.forget("catalog", str(review_dict["id_catalog"]))
         review.id = str(result.inserted_id)
         return review
     except Exception as e:
@@ -47,12 +56,12 @@ async def get_review_by_id(review_id: str) -> Review:
             raise HTTPException(status_code=400, detail="ID de reseña inválido")
 
         pipeline = get_review_by_id_pipeline(review_id)
-        docs = list(coll.aggregate(pipeline))
+        docs = await aggregate_list(coll, pipeline)
 
         if not docs:
             raise HTTPException(status_code=404, detail="Reseña no encontrada")
 
-        review_data = {k: docs[0][k] for k in Review._fields_.keys() if k in docs[0]}
+        review_data = {k: docs[0][k] for k in Review.model_fields.keys() if k in docs[0]}
         return Review(**review_data)
     except HTTPException:
         raise
@@ -67,12 +76,14 @@ async def update_review(review_id: str, review: Review) -> Review:
             raise HTTPException(status_code=400, detail="ID de reseña inválido")
 
         update_data = review.model_dump(exclude={"id", "id_user", "id_catalog", "review_date"})
-        result = coll.update_one({"_id": ObjectId(review_id), "active": True}, {"$set": update_data})
+        result = await coll.update_one({"_id": ObjectId(review_id), "active": True}, {"$set": update_data})
 
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Reseña no encontrada")
 
-        return await get_review_by_id(review_id)
+        review = await get_review_by_id(review_id)
+        review_reads.forget("catalog", review.id_catalog)
+        return review
     except HTTPException:
         raise
     except Exception as e:
@@ -85,12 +96,14 @@ async def delete_review(review_id: str) -> Review:
         except errors.InvalidId:
             raise HTTPException(status_code=400, detail="ID de reseña inválido")
 
-        result = coll.update_one({"_id": ObjectId(review_id)}, {"$set": {"active": False}})
+        result = await coll.update_one({"_id": ObjectId(review_id)}, {"$set": {"active": False}})
 
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Reseña no encontrada")
 
-        return await get_review_by_id(review_id)
+        review = await get_review_by_id(review_id)
+        review_reads.forget("catalog", review.id_catalog)
+        return review
     except HTTPException:
         raise
     except Exception as e:
@@ -1,26 +1,30 @@
 import os
 import json
 import logging
-import firebase_admin
-import requests
 import base64
 from fastapi import HTTPException
-from firebase_admin import credentials, auth as firebase_auth
-from dotenv import load_dotenv
 
 from models.users import User
 from models.login import Login
+from models.token import RefreshTokenRequest
 
 from utils.security import create_jwt_token
-from utils.mongodb import get_collection
-
-load_dotenv()
+from utils.mongodb import get_async_collection
+from utils.tokens import issue_refresh_token, rotate_refresh_token, revoke_refresh_token
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 def initialize_firebase():
+    """
+    Inicializa el SDK de Firebase Admin una vez por proceso. Se llama desde el
+    lifespan de cada worker (y antes de usar el SDK), no al importar: el
+    import de firebase_admin es lento y no debe hacerse antes del fork.
+    """
+    import firebase_admin
+    from firebase_admin import credentials
+
     if firebase_admin._apps:
         return
 
@@ -44,9 +48,9 @@ def initialize_firebase():
         raise HTTPException(status_code=500, detail=f"Firebase configuration error: {str(e)}")
 
 
-initialize_firebase()
-
 async def create_user( user: User ) -> User:
+    from firebase_admin import auth as firebase_auth
+    initialize_firebase()
 
     user_record = {}
     try:
@@ -62,7 +66,7 @@ async def create_user( user: User ) -> User:
         )
 
     try:
-        coll = get_collection("users")
+        coll = get_async_collection("users")
 
         new_user = User(
             name=user.name
@@ -72,7 +76,7 @@ async def create_user( user: User ) -> User:
         )
 
         user_dict = new_user.model_dump(exclude={"id", "password"})
-        inserted = coll.insert_one(user_dict)
+        inserted = await coll.insert_one(user_dict)
         new_user.id = str(inserted.inserted_id)
         new_user.password = "*********"  # Mask the password in the response
         return new_user
@@ -84,16 +88,19 @@ async def create_user( user: User ) -> User:
 
 
 async def login(user: Login) -> dict:
-    api_key = os.getenv("FIREBASE_API_KEY")
-    url = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={api_key}"
-    payload = {
-        "email": user.email
-        , "password": user.password
-        , "returnSecureToken": True
-    }
+    # httpx tarda en importarse: se carga con el primer login, no al arrancar
+    import httpx
+    from utils.http_client import CircuitOpenError, sign_in_with_password
 
-    response = requests.post(url, json=payload)
-    response_data = response.json()
+    # Cliente HTTP asíncrono con pool keep-alive, timeouts y circuit breaker (utils/http_client.py)
+    try:
+        response_data = await sign_in_with_password(user.email, user.password)
+    except (CircuitOpenError, httpx.HTTPError, ValueError) as e:
+        logger.warning(f"Identity provider unavailable: {e}")
+        raise HTTPException(
+            status_code=503
+            , detail="Servicio de autenticación no disponible"
+        )
 
     if "error" in response_data:
         raise HTTPException(
@@ -101,8 +108,11 @@ async def login(user: Login) -> dict:
             , detail="Error al autenticar usuario"
         )
 
-    coll = get_collection("users")
-    user_info = coll.find_one({ "email": user.email })
+    coll = get_async_collection("users")
+    user_info = await coll.find_one(
+        { "email": user.email }
+        , { "name": 1, "lastname": 1, "email": 1, "active": 1, "admin": 1 }
+    )
 
     if not user_info:
         raise HTTPException(
@@ -110,6 +120,9 @@ async def login(user: Login) -> dict:
             , detail="Usuario no encontrado en la base de datos"
         )
 
+    # Refresh token de una sesión nueva: /token/refresh renueva el JWT sin volver a Firebase
+    refresh_token, session_id = await issue_refresh_token(user_info["_id"])
+
     return {
         "message": "Usuario Autenticado correctamente"
         , "idToken": create_jwt_token(
@@ -119,5 +132,39 @@ async def login(user: Login) -> dict:
             , user_info["active"]
             , user_info["admin"]
             , str(user_info["_id"])
+            , session_id
         )
-    }
\ No newline at end of file
+        , "refreshToken": refresh_token
+    }
+
+
+async def refresh_token(body: RefreshTokenRequest) -> dict:
+    """Canjea un refresh token por un JWT y un refresh token nuevos (sin Firebase; relee el usuario por _id)"""
+    try:
+        user_info, new_refresh_token, session_id = await rotate_refresh_token(body.refresh_token)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error refreshing token: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    return {
+        "message": "Token renovado correctamente"
+        , "idToken": create_jwt_token(
+            user_info["name"]
+            , user_info["lastname"]
+            , user_info["email"]
+            , user_info["active"]
+            , user_info["admin"]
+            , str(user_info["_id"])
+            , session_id
+        )
+        , "refreshToken": new_refresh_token
+    }
+
+
+async def revoke_token(body: RefreshTokenRequest) -> dict:
+    """Cierra la sesión: revoca el refresh token y los JWT emitidos con él"""
+    if not await revoke_refresh_token(body.refresh_token):
+        raise HTTPException(status_code=404, detail="Refresh token no encontrado")
+    return {"message": "Sesión cerrada correctamente"}
\ No newline at end of file
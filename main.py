@@ -1,6 +1,8 @@
-import uvicorn
+import asyncio
 import logging
-from fastapi import FastAPI, Request
+from datetime import datetime, timezone
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 
 # Routers
 from routes.catalogtypes import router as catalogtypes_router
@@ -11,15 +13,67 @@ from routes.order_details import router as order_details_router
 from routes.inventory import router as inventory_router
 from routes.artist import router as artist_router
 from routes.reviews import router as reviews_router
+from routes.admin import router as admin_router
 
 # Controllers para usuarios
-from controllers.users import create_user, login
+from controllers.users import create_user, login, refresh_token, revoke_token
 from models.users import User
 from models.login import Login
-from utils.security import validateuser, validateadmin
+from models.token import RefreshTokenRequest
+from utils.security import validateuser, validateadmin, AuthMiddleware
+from utils.request_cost import RequestCostMiddleware
+from utils.metrics import MetricsMiddleware, CONTENT_TYPE as METRICS_CONTENT_TYPE, render as render_metrics
+
+# Logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Arranque y apagado de cada worker. Corre después del fork, así que aquí
+    (y no al importar) se crean el cliente de Mongo, Firebase y las tareas.
+    """
+    from controllers.users import initialize_firebase
+    from utils.indexes import check_indexes_on_startup
+    from utils.mongodb import warm_up_pool, close_mongo_clients
+    from utils.reference_cache import load_reference_data
+    from utils.tokens import revocations
+
+    # Abrir las conexiones mínimas del pool antes del primer request
+    try:
+        await warm_up_pool()
+    except Exception as e:
+        logger.error(f"Could not warm up MongoDB pool: {e}")
+
+    try:
+        await asyncio.to_thread(initialize_firebase)
+    except Exception as e:
+        logger.error(f"Could not initialize Firebase: {getattr(e, 'detail', e)}")
+
+    # Crear o verificar los índices declarados en utils/indexes.py (ver MONGO_INDEXES)
+    await check_indexes_on_startup()
+
+    # Cargar order_statuses y catalogtypes en el caché de referencia (si falla se cargan en la primera request)
+    try:
+        await load_reference_data()
+    except Exception as e:
+        logger.error(f"Could not load reference data: {e}")
+
+    # Sincronizar periódicamente las sesiones revocadas (utils/tokens.py)
+    revocation_sync = asyncio.create_task(revocations.run())
+
+    try:
+        yield
+    finally:
+        revocation_sync.cancel()
+        # Cerrar el pool de conexiones HTTP a servicios externos (identity provider)
+        from utils.http_client import close_http_client
+        await close_http_client()
+        await close_mongo_clients()
 
 # Inicializar app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Configuración CORS
 from fastapi.middleware.cors import CORSMiddleware
@@ -31,6 +85,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Verifica el JWT una vez por request (con caché hasta exp) y lo deja en request.state.auth
+app.add_middleware(AuthMiddleware)
+
+# Comandos, tiempo y documentos de Mongo por request: header Server-Timing, access log y aviso de N+1
+app.add_middleware(RequestCostMiddleware)
+
+# Latencia, requests en curso y códigos de estado por ruta (GET /metrics); va por fuera de todo
+app.add_middleware(MetricsMiddleware)
+
 # Incluir routers
 app.include_router(catalogtypes_router)
 app.include_router(catalogs_router)
@@ -40,10 +103,7 @@ app.include_router(order_details_router)
 app.include_router(inventory_router)
 app.include_router(artist_router)
 app.include_router(reviews_router)
-
-# Logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+app.include_router(admin_router)
 
 # Rutas raíz y checks de salud
 @app.get("/")
@@ -55,7 +115,7 @@ def health_check():
     try:
         return {
             "status": "healthy", 
-            "timestamp": "2025-08-02", 
+            "timestamp": datetime.now(timezone.utc).isoformat(),
             "service": "tienda-api",
             "environment": "production"
         }
@@ -75,6 +135,11 @@ def readiness_check():
     except Exception as e:
         return {"status": "not_ready", "error": str(e)}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Métricas HTTP y de MongoDB de este proceso en formato de texto de Prometheus"""
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
 # Endpoints de usuarios
 @app.post("/users")
 async def create_user_endpoint(user: User) -> User:
@@ -84,6 +149,16 @@ async def create_user_endpoint(user: User) -> User:
 async def login_access(l: Login) -> dict:
     return await login(l)
 
+@app.post("/token/refresh")
+async def refresh_token_endpoint(body: RefreshTokenRequest) -> dict:
+    """Renovar el JWT con el refresh token (rota el refresh token)"""
+    return await refresh_token(body)
+
+@app.post("/token/revoke")
+async def revoke_token_endpoint(body: RefreshTokenRequest) -> dict:
+    """Cerrar sesión: revoca el refresh token y los JWT de su sesión"""
+    return await revoke_token(body)
+
 # Ejemplo de endpoint que requiere admin
 @app.get("/exampleadmin")
 @validateadmin
@@ -103,4 +178,5 @@ async def example_user(request: Request):
     }
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
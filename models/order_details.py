@@ -40,6 +40,23 @@ class OrderDetail(BaseModel):
         description="Si el detalle está activo"
     )
 
+    id_catalog: Optional[str] = Field(
+        default=None,
+        description="ID del catálogo del producto al momento de agregarlo"
+    )
+
+    unit_price: Optional[float] = Field(
+        default=None,
+        description="Precio unitario al momento de agregar el producto",
+        examples=[549.99]
+    )
+
+    product_name: Optional[str] = Field(
+        default=None,
+        description="Nombre del producto al momento de agregarlo",
+        examples=["Frank Ocean Vinilo - Blonde"]
+    )
+
     class Config:
         json_schema_extra = {
         "example": {
@@ -0,0 +1,7 @@
+from pydantic import BaseModel, Field
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str = Field(
+        min_length=1,
+        description="Refresh token opaco entregado por /login o por el último /token/refresh"
+    )
@@ -12,16 +12,28 @@ from .catalog_pipelines import (
 from .order_pipelines import (
     get_all_orders_pipeline,
     get_orders_by_user_pipeline,
+    get_orders_keyset_pipeline,
     get_order_by_id_pipeline,
     get_order_owner_pipeline,
-    get_existing_inprogress_order_pipeline
+    get_inprogress_order_filter
 )
 
 from .order_detail_pipelines import (
     get_order_details_pipeline,
-    get_order_detail_by_id_pipeline
+    get_order_detail_by_id_pipeline,
+    get_order_totals_delta_update,
+    get_order_line_snapshot_pipeline
 )
 
+from .facet_pipelines import (
+    get_page_with_total_pipeline,
+    unpack_page_with_total
+)
+
+from .version_pipelines import get_version_probe_pipeline, get_latest_version_pipeline
+
+from .slow_query_pipelines import get_slow_aggregation_offenders_pipeline
+
 __all__ = [
     # Catalog pipelines
     "get_catalog_with_type_pipeline",
@@ -32,11 +44,25 @@ __all__ = [
     # Order pipelines  
     "get_all_orders_pipeline",
     "get_orders_by_user_pipeline",
+    "get_orders_keyset_pipeline",
     "get_order_by_id_pipeline",
     "get_order_owner_pipeline",
-    "get_existing_inprogress_order_pipeline",
+    "get_inprogress_order_filter",
     
     # Order detail pipelines
     "get_order_details_pipeline",
-    "get_order_detail_by_id_pipeline"
-]
\ No newline at end of file
+    "get_order_detail_by_id_pipeline",
+    "get_order_totals_delta_update",
+    "get_order_line_snapshot_pipeline",
+
+    # Facet pipelines
+    "get_page_with_total_pipeline",
+    "unpack_page_with_total",
+
+    # Version pipelines
+    "get_version_probe_pipeline",
+    "get_latest_version_pipeline",
+
+    # Slow query pipelines
+    "get_slow_aggregation_offenders_pipeline"
+]
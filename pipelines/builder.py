@@ -0,0 +1,32 @@
+"""
+Nombre de la función que construyó cada pipeline.
+
+Las funciones de pipelines/ que devuelven una pipeline de aggregation se
+decoran con @pipeline_builder: devuelven la misma lista, pero como
+BuiltPipeline con el atributo `builder`. Así utils/slow_queries.py puede
+decir qué builder generó una aggregation lenta sin que los controllers
+tengan que pasarlo.
+
+Si la pipeline recibe otra pipeline ya construida (get_page_with_total_pipeline)
+el nombre las combina: "get_page_with_total_pipeline(get_orders_by_user_pipeline)".
+"""
+from functools import wraps
+
+
+class BuiltPipeline(list):
+    """Lista de etapas que recuerda su builder; para pymongo y BSON es una lista común"""
+    __slots__ = ("builder",)
+
+
+def builder_name(pipeline) -> str | None:
+    return getattr(pipeline, "builder", None)
+
+
+def pipeline_builder(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        pipeline = BuiltPipeline(func(*args, **kwargs))
+        inner = builder_name(args[0]) if args else None
+        pipeline.builder = f"{func.__name__}({inner})" if inner else func.__name__
+        return pipeline
+    return wrapper
@@ -1,18 +1,11 @@
 from bson import ObjectId
+from .builder import pipeline_builder
 
+@pipeline_builder
 def get_catalog_with_type_pipeline(catalog_id: str) -> list:
+    """La descripción del tipo se agrega en Python desde utils.reference_cache"""
     return [
         {"$match": {"_id": ObjectId(catalog_id)}},
-        {"$addFields": {
-            "id_catalog_type_obj": {"$toObjectId": "$id_catalog_type"}
-        }},
-        {"$lookup": {
-            "from": "catalogtypes",
-            "localField": "id_catalog_type_obj",
-            "foreignField": "_id",
-            "as": "catalog_type"
-        }},
-        {"$unwind": "$catalog_type"},
         {"$project": {
             "id": {"$toString": "$_id"},
             "id_catalog_type": {"$toString": "$id_catalog_type"},
@@ -20,28 +13,28 @@ def get_catalog_with_type_pipeline(catalog_id: str) -> list:
             "description": "$description",
             "cost": "$cost",
             "discount": "$discount",
-            "active": "$active",
-            "catalog_type_description": "$catalog_type.description"
+            "active": "$active"
         }}
     ]
 
-def get_catalogs_by_type_pipeline(catalog_type_description: str, skip: int = 0, limit: int = 10) -> list:
+@pipeline_builder
+def get_catalogs_by_type_pipeline(catalog_type_ids: list, skip: int = 0, limit: int = 10) -> list:
+    """
+    Página de catálogos activos de los tipos indicados: $match, $sort,
+    $skip y $limit sobre catalogs, sin join. Los ids de tipo se resuelven
+    antes y la descripción del tipo se agrega en Python, ambos desde
+    utils.reference_cache.
+    """
     return [
-        {"$addFields": {
-            "id_catalog_type_obj": {"$toObjectId": "$id_catalog_type"}
-        }},
-        {"$lookup": {
-            "from": "catalogtypes",
-            "localField": "id_catalog_type_obj",
-            "foreignField": "_id",
-            "as": "catalog_type"
-        }},
-        {"$unwind": "$catalog_type"},
         {"$match": {
-            "catalog_type.description": {"$regex": f"^{catalog_type_description}$", "$options": "i"},
+            "id_catalog_type": {"$in": catalog_type_ids},
             "active": True
         }},
+        {"$sort": {"_id": 1}},
+        {"$skip": skip},
+        {"$limit": limit},
         {"$project": {
+            "_id": 0,
             "id": {"$toString": "$_id"},
             "id_catalog_type": {"$toString": "$id_catalog_type"},
             "name": "$name",
@@ -49,26 +42,20 @@ def get_catalogs_by_type_pipeline(catalog_type_description: str, skip: int = 0,
             "cost": "$cost",
             "discount": "$discount",
             "active": "$active"
-        }},
-        {"$skip": skip},
-        {"$limit": limit}
+        }}
     ]
 
-def get_all_catalogs_with_types_pipeline(skip: int = 0, limit: int = 10) -> list:
+@pipeline_builder
+def get_all_catalogs_with_types_pipeline(catalog_type_ids: list, skip: int = 0, limit: int = 10) -> list:
+    """
+    Catálogos de los tipos indicados (los activos). La descripción del tipo
+    se agrega en Python desde utils.reference_cache, sin $lookup.
+    """
     return [
-        {"$addFields": {
-            "id_catalog_type_obj": {"$toObjectId": "$id_catalog_type"}
-        }},
-        {"$lookup": {
-            "from": "catalogtypes",
-            "localField": "id_catalog_type_obj",
-            "foreignField": "_id",
-            "as": "catalog_type"
-        }},
-        {"$unwind": "$catalog_type"},
-        {"$match": {
-            "catalog_type.active": True
-        }},
+        {"$match": {"id_catalog_type": {"$in": catalog_type_ids}}},
+        {"$sort": {"_id": 1}},
+        {"$skip": skip},
+        {"$limit": limit},
         {"$project": {
             "_id": 0,  # Excluir el _id original
             "id": {"$toString": "$_id"},
@@ -77,13 +64,11 @@ def get_all_catalogs_with_types_pipeline(skip: int = 0, limit: int = 10) -> list
             "description": "$description",
             "cost": "$cost",
             "discount": "$discount",
-            "active": "$active",
-            "catalog_type_description": "$catalog_type.description"
-        }},
-        {"$skip": skip},
-        {"$limit": limit}
+            "active": "$active"
+        }}
     ]
 
+@pipeline_builder
 def validate_catalog_type_pipeline(catalog_type_id: str) -> list:
     return [
         {"$match": {
@@ -97,7 +82,9 @@ def validate_catalog_type_pipeline(catalog_type_id: str) -> list:
         }}
     ]
 
+@pipeline_builder
 def search_catalogs_pipeline(search_term: str, skip: int = 0, limit: int = 10) -> list:
+    """La descripción del tipo se agrega en Python desde utils.reference_cache"""
     return [
         {"$match": {
             "$or": [
@@ -106,16 +93,8 @@ def search_catalogs_pipeline(search_term: str, skip: int = 0, limit: int = 10) -
             ],
             "active": True
         }},
-        {"$addFields": {
-            "id_catalog_type_obj": {"$toObjectId": "$id_catalog_type"}
-        }},
-        {"$lookup": {
-            "from": "catalogtypes",
-            "localField": "id_catalog_type_obj",
-            "foreignField": "_id",
-            "as": "catalog_type"
-        }},
-        {"$unwind": "$catalog_type"},
+        {"$skip": skip},
+        {"$limit": limit},
         {"$project": {
             "id": {"$toString": "$_id"},
             "id_catalog_type": {"$toString": "$id_catalog_type"},
@@ -123,9 +102,6 @@ def search_catalogs_pipeline(search_term: str, skip: int = 0, limit: int = 10) -
             "description": "$description",
             "cost": "$cost",
             "discount": "$discount",
-            "active": "$active",
-            "catalog_type_description": "$catalog_type.description"
-        }},
-        {"$skip": skip},
-        {"$limit": limit}
+            "active": "$active"
+        }}
     ]
\ No newline at end of file
@@ -1,5 +1,7 @@
 from bson import ObjectId
+from .builder import pipeline_builder
 
+@pipeline_builder
 def get_catalog_type_pipeline() -> list:
     return [
         {
@@ -9,7 +11,7 @@ def get_catalog_type_pipeline() -> list:
         },{
             "$lookup": {
                 "from": "catalogs",
-                "localField": "id",
+                "localField": "_id",
                 "foreignField": "id_catalog_type",
                 "as": "result"
             }
@@ -36,6 +38,7 @@ def get_catalog_type_pipeline() -> list:
     ]
 
 
+@pipeline_builder
 def validate_type_is_assigned_pipeline(id: str) -> list:
     return [
         {
@@ -49,7 +52,7 @@ def validate_type_is_assigned_pipeline(id: str) -> list:
         },{
             "$lookup": {
                 "from": "catalogs",
-                "localField": "id",
+                "localField": "_id",
                 "foreignField": "id_catalog_type",
                 "as": "result"
             }
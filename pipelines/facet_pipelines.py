@@ -0,0 +1,35 @@
+from .builder import pipeline_builder
+
+# Etapas que se quedan antes del $facet: filtran y ordenan la colección completa
+# y pueden usar índices (las etapas dentro de un $facet no usan índices)
+_SHARED_STAGES = ("$match", "$sort")
+
+
+@pipeline_builder
+def get_page_with_total_pipeline(pipeline: list) -> list:
+    """
+    Envuelve una pipeline paginada en un $facet que devuelve la página y el
+    total en una sola consulta: [{"data": [...], "total": [{"count": n}]}].
+
+    Los $match y $sort iniciales se quedan fuera del $facet; el resto
+    ($skip, $limit, $lookup, $project...) va a la rama "data" y la rama
+    "total" cuenta los documentos que pasan los filtros.
+    """
+    split = 0
+    while split < len(pipeline) and next(iter(pipeline[split])) in _SHARED_STAGES:
+        split += 1
+
+    return pipeline[:split] + [
+        {"$facet": {
+            "data": pipeline[split:],
+            "total": [{"$count": "count"}]
+        }}
+    ]
+
+
+def unpack_page_with_total(result: list) -> tuple[list, int]:
+    """Devuelve (página, total) del resultado de get_page_with_total_pipeline"""
+    if not result:
+        return [], 0
+    total = result[0]["total"]
+    return result[0]["data"], total[0]["count"] if total else 0
@@ -1,8 +1,7 @@
 from bson import ObjectId
-from utils.mongodb import get_collection
-
-coll = get_collection("inventory")
+from .builder import pipeline_builder
 
+@pipeline_builder
 def get_inventory_pipeline(skip: int = 0, limit: int = 10, available_only: bool = False):
     pipeline = [
         {"$match": {"active": True}}
@@ -29,32 +28,38 @@ def get_inventory_pipeline(skip: int = 0, limit: int = 10, available_only: bool
                 "as": "catalog_info"
             }
         },
-        {"$unwind": {"path": "$catalog_info", "preserveNullAndEmptyArrays": True}}
+        {"$unwind": {"path": "$catalog_info", "preserveNullAndEmptyArrays": True}},
+        {"$addFields": {
+            "id": {"$toString": "$_id"},
+            "id_catalog": {"$toString": "$id_catalog"},
+            "reserved_quantity": {"$ifNull": ["$reserved_quantity", 0]},
+            "available_stock": {"$subtract": ["$stock", {"$ifNull": ["$reserved_quantity", 0]}]}
+        }}
     ])
 
     return pipeline
 
-def get_active_order_status_ids() -> list:
-    """
-    Devuelve los id_status (string) de estados de órdenes activas
-    que reservan stock (ejemplo: 'inprogress', 'ordered', 'processing').
-    """
-    return [
-        "64e8a07d1234567890abcdef",  # inprogress
-        "64e8a07d2234567890abcdef",  # ordered
-        "64e8a07d3234567890abcdef",  # processing
-    ]
-
+@pipeline_builder
 def get_all_inventory_pipeline(skip: int = 0, limit: int | None = 50) -> list:
+    # Ordenar y paginar antes del $lookup para unir solo la página devuelta
     pipeline = [
         {"$match": {"active": True}},
+        {"$sort": {"entry_date": -1}},
+    ]
+
+    if skip > 0:
+        pipeline.append({"$skip": skip})
+
+    if isinstance(limit, int) and limit > 0:
+        pipeline.append({"$limit": limit})
 
+    pipeline.extend([
         {
             "$lookup": {
                 "from": "catalogs",
-                "let": {"catalog_id": {"$toObjectId": "$id_catalog"}},
+                "localField": "id_catalog",
+                "foreignField": "_id",
                 "pipeline": [
-                    {"$match": {"$expr": {"$eq": ["$_id", "$$catalog_id"]}}},
                     {"$project": {"description": 1, "price": 1, "_id": 0}}
                 ],
                 "as": "catalog_info"
@@ -62,52 +67,12 @@ def get_all_inventory_pipeline(skip: int = 0, limit: int | None = 50) -> list:
         },
         {"$unwind": {"path": "$catalog_info", "preserveNullAndEmptyArrays": True}},
 
-        {
-            "$lookup": {
-                "from": "order_details",
-                "let": {"inventory_id": {"$toString": "$_id"}},
-                "pipeline": [
-                    {
-                        "$match": {
-                            "$expr": {"$eq": ["$id_inventory", "$$inventory_id"]},
-                            "active": True
-                        }
-                    },
-                    {
-                        "$lookup": {
-                            "from": "order_status_record",
-                            "let": {"order_id": "$id_order"},
-                            "pipeline": [
-                                {"$match": {"$expr": {"$eq": ["$id_order", "$$order_id"]}}},
-                                {"$sort": {"date": -1}},
-                                {"$limit": 1},
-                                {"$match": {"id_status": {"$in": get_active_order_status_ids()}}}
-                            ],
-                            "as": "latest_status"
-                        }
-                    },
-                    {"$unwind": {"path": "$latest_status", "preserveNullAndEmptyArrays": False}},
-                    {
-                        "$group": {
-                            "_id": None,
-                            "reserved_quantity": {"$sum": "$quantity"}
-                        }
-                    }
-                ],
-                "as": "reserved_stock_info"
-            }
-        },
-
+        # reserved_quantity se mantiene con $inc en el propio documento (ver utils/stock.py)
         {
             "$addFields": {
-                "reserved_quantity": {
-                    "$ifNull": [{"$arrayElemAt": ["$reserved_stock_info.reserved_quantity", 0]}, 0]
-                },
+                "reserved_quantity": {"$ifNull": ["$reserved_quantity", 0]},
                 "available_stock": {
-                    "$subtract": [
-                        "$stock",
-                        {"$ifNull": [{"$arrayElemAt": ["$reserved_stock_info.reserved_quantity", 0]}, 0]}
-                    ]
+                    "$subtract": ["$stock", {"$ifNull": ["$reserved_quantity", 0]}]
                 }
             }
         },
@@ -115,7 +80,7 @@ def get_all_inventory_pipeline(skip: int = 0, limit: int | None = 50) -> list:
         {
             "$project": {
                 "id": {"$toString": "$_id"},
-                "id_catalog": 1,
+                "id_catalog": {"$toString": "$id_catalog"},
                 "stock": 1,
                 "entry_date": 1,
                 "purchase_price": 1,
@@ -128,19 +93,12 @@ def get_all_inventory_pipeline(skip: int = 0, limit: int | None = 50) -> list:
                 "available_stock": 1,
                 "_id": 0
             }
-        },
-
-        {"$sort": {"entry_date": -1}},
-    ]
-
-    if skip > 0:
-        pipeline.append({"$skip": skip})
-
-    if isinstance(limit, int) and limit > 0:
-        pipeline.append({"$limit": limit})
+        }
+    ])
 
     return pipeline
 
+@pipeline_builder
 def get_inventory_by_id_pipeline(inventory_id: str) -> list:
     return [
         {"$match": {"_id": ObjectId(inventory_id), "active": True}},
@@ -148,9 +106,9 @@ def get_inventory_by_id_pipeline(inventory_id: str) -> list:
         {
             "$lookup": {
                 "from": "catalogs",
-                "let": {"catalog_id": {"$toObjectId": "$id_catalog"}},
+                "localField": "id_catalog",
+                "foreignField": "_id",
                 "pipeline": [
-                    {"$match": {"$expr": {"$eq": ["$_id", "$$catalog_id"]}}},
                     {"$project": {"description": 1, "price": 1, "_id": 0}}
                 ],
                 "as": "catalog_info"
@@ -158,52 +116,12 @@ def get_inventory_by_id_pipeline(inventory_id: str) -> list:
         },
         {"$unwind": {"path": "$catalog_info", "preserveNullAndEmptyArrays": True}},
 
-        {
-            "$lookup": {
-                "from": "order_details",
-                "let": {"inventory_id": {"$toString": "$_id"}},
-                "pipeline": [
-                    {
-                        "$match": {
-                            "$expr": {"$eq": ["$id_inventory", "$$inventory_id"]},
-                            "active": True
-                        }
-                    },
-                    {
-                        "$lookup": {
-                            "from": "order_status_record",
-                            "let": {"order_id": "$id_order"},
-                            "pipeline": [
-                                {"$match": {"$expr": {"$eq": ["$id_order", "$$order_id"]}}},
-                                {"$sort": {"date": -1}},
-                                {"$limit": 1},
-                                {"$match": {"id_status": {"$in": get_active_order_status_ids()}}}
-                            ],
-                            "as": "latest_status"
-                        }
-                    },
-                    {"$unwind": {"path": "$latest_status", "preserveNullAndEmptyArrays": False}},
-                    {
-                        "$group": {
-                            "_id": None,
-                            "reserved_quantity": {"$sum": "$quantity"}
-                        }
-                    }
-                ],
-                "as": "reserved_stock_info"
-            }
-        },
-
+        # reserved_quantity se mantiene con $inc en el propio documento (ver utils/stock.py)
         {
             "$addFields": {
-                "reserved_quantity": {
-                    "$ifNull": [{"$arrayElemAt": ["$reserved_stock_info.reserved_quantity", 0]}, 0]
-                },
+                "reserved_quantity": {"$ifNull": ["$reserved_quantity", 0]},
                 "available_stock": {
-                    "$subtract": [
-                        "$stock",
-                        {"$ifNull": [{"$arrayElemAt": ["$reserved_stock_info.reserved_quantity", 0]}, 0]}
-                    ]
+                    "$subtract": ["$stock", {"$ifNull": ["$reserved_quantity", 0]}]
                 }
             }
         },
@@ -211,7 +129,7 @@ def get_inventory_by_id_pipeline(inventory_id: str) -> list:
         {
             "$project": {
                 "id": {"$toString": "$_id"},
-                "id_catalog": 1,
+                "id_catalog": {"$toString": "$id_catalog"},
                 "stock": 1,
                 "entry_date": 1,
                 "purchase_price": 1,
@@ -227,6 +145,7 @@ def get_inventory_by_id_pipeline(inventory_id: str) -> list:
         }
     ]
 
+@pipeline_builder
 def validate_catalog_pipeline(catalog_id: str) -> list:
     return [
         {"$match": {"_id": ObjectId(catalog_id)}},
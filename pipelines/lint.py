@@ -0,0 +1,82 @@
+"""
+Revisión estática de pipelines.
+
+Detecta patrones que hacen que el costo de una consulta crezca con el tamaño
+de la colección en vez del tamaño de la página. Por ahora:
+
+    lookup-before-limit   un $lookup antes del $limit de la misma pipeline:
+                          el join corre sobre todos los documentos y no solo
+                          sobre los que se devuelven.
+
+Se revisan también las sub-pipelines de $facet, $lookup y $unionWith.
+
+Uso:
+    python -m pipelines.lint     # revisa todas las pipelines de pipelines/samples.py
+"""
+from typing import NamedTuple
+
+
+class LintIssue(NamedTuple):
+    rule: str
+    path: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.path}: {self.rule}: {self.message}"
+
+
+def _stage_name(stage: dict) -> str:
+    return next(iter(stage), "")
+
+
+def _sub_pipelines(stage: dict) -> list:
+    """(etiqueta, sub-pipeline) de las etapas que contienen otras pipelines"""
+    name = _stage_name(stage)
+    spec = stage.get(name)
+    if name == "$facet" and isinstance(spec, dict):
+        return [(f"$facet.{key}", value) for key, value in spec.items()]
+    if name in ("$lookup", "$unionWith") and isinstance(spec, dict) and "pipeline" in spec:
+        return [(f"{name}.pipeline", spec["pipeline"])]
+    return []
+
+
+def lint_pipeline(pipeline: list, path: str = "pipeline") -> list[LintIssue]:
+    issues = []
+
+    limit_positions = [i for i, stage in enumerate(pipeline) if _stage_name(stage) == "$limit"]
+    last_limit = limit_positions[-1] if limit_positions else -1
+
+    for i, stage in enumerate(pipeline):
+        name = _stage_name(stage)
+        if name == "$lookup" and i < last_limit:
+            issues.append(LintIssue(
+                "lookup-before-limit",
+                f"{path}[{i}]",
+                f"$lookup from '{stage['$lookup'].get('from')}' runs before $limit at [{last_limit}]; "
+                f"move $sort/$skip/$limit before the join"
+            ))
+        for label, sub_pipeline in _sub_pipelines(stage):
+            issues.extend(lint_pipeline(sub_pipeline, f"{path}[{i}].{label}"))
+
+    return issues
+
+
+def lint_samples() -> list[LintIssue]:
+    from pipelines.samples import SAMPLE_PIPELINES
+
+    issues = []
+    for sample in SAMPLE_PIPELINES:
+        issues.extend(lint_pipeline(sample.build(), sample.name))
+    return issues
+
+
+def main():
+    issues = lint_samples()
+    for issue in issues:
+        print(issue)
+    print("OK" if not issues else f"{len(issues)} issue(s)")
+    raise SystemExit(1 if issues else 0)
+
+
+if __name__ == "__main__":
+    main()
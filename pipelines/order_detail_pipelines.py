@@ -1,27 +1,24 @@
 from bson import ObjectId
+from .builder import pipeline_builder
 
+@pipeline_builder
 def get_order_details_pipeline(order_id: str) -> list:
-    """Pipeline para obtener todos los detalles activos de una orden con info del inventario (producto)."""
+    """Pipeline para obtener todos los detalles activos de una orden. Usa el precio y nombre guardados en la línea, sin joins."""
     if not ObjectId.is_valid(order_id):
         raise ValueError(f"ID de orden no válido: {order_id}")
     
     return [
-        {"$match": {"id_order": order_id, "active": True}},  # id_order es string en docs order_details, no ObjectId
-        {
-            "$lookup": {
-                "from": "inventory",
-                "localField": "id_inventory",
-                "foreignField": "_id",
-                "as": "product_info"
-            }
-        },
+        {"$match": {"id_order": ObjectId(order_id), "active": True}},
         {
             "$project": {
                 "id": {"$toString": "$_id"},
-                "id_order": 1,
+                "id_order": {"$toString": "$id_order"},
                 "id_inventory": {"$toString": "$id_inventory"},
-                "product_name": {"$arrayElemAt": ["$product_info.name", 0]},
-                "product_cost": {"$arrayElemAt": ["$product_info.cost", 0]},
+                "id_catalog": {"$toString": "$id_catalog"},
+                "product_name": 1,
+                "unit_price": 1,
+                "product_cost": "$unit_price",  # nombre anterior, se mantiene por compatibilidad
+                "line_total": {"$round": [{"$multiply": ["$quantity", {"$ifNull": ["$unit_price", 0]}]}, 2]},
                 "quantity": 1,
                 "active": 1,
                 "date_created": 1,
@@ -32,6 +29,37 @@ def get_order_details_pipeline(order_id: str) -> list:
         {"$sort": {"date_created": 1}}
     ]
 
+
+@pipeline_builder
+def get_order_line_snapshot_pipeline(inventory_id: str) -> list:
+    """Pipeline para resolver precio, nombre y catálogo de un producto al agregarlo a una orden"""
+    if not ObjectId.is_valid(inventory_id):
+        raise ValueError(f"ID de producto no válido: {inventory_id}")
+
+    return [
+        {"$match": {"_id": ObjectId(inventory_id)}},
+        {"$limit": 1},
+        {
+            "$lookup": {
+                "from": "catalogs",
+                "localField": "id_catalog",
+                "foreignField": "_id",
+                "pipeline": [{"$project": {"name": 1}}],
+                "as": "catalog_info"
+            }
+        },
+        {
+            "$project": {
+                "_id": 1,
+                "id_catalog": 1,
+                "unit_price": "$sale_price",
+                "product_name": {"$arrayElemAt": ["$catalog_info.name", 0]}
+            }
+        }
+    ]
+
+
+@pipeline_builder
 def validate_order_exists_pipeline(order_id: str) -> list:
     if not ObjectId.is_valid(order_id):
         raise ValueError(f"ID de orden no válido: {order_id}")
@@ -41,6 +69,7 @@ def validate_order_exists_pipeline(order_id: str) -> list:
         {"$limit": 1}
     ]
 
+@pipeline_builder
 def validate_product_exists_pipeline(product_id: str) -> list:
     if not ObjectId.is_valid(product_id):
         raise ValueError(f"ID de producto no válido: {product_id}")
@@ -50,6 +79,7 @@ def validate_product_exists_pipeline(product_id: str) -> list:
         {"$limit": 1}
     ]
 
+@pipeline_builder
 def check_order_detail_exists_pipeline(order_id: str, product_id: str) -> list:
     if not ObjectId.is_valid(product_id):
         raise ValueError(f"ID de producto no válido: {product_id}")
@@ -57,14 +87,15 @@ def check_order_detail_exists_pipeline(order_id: str, product_id: str) -> list:
     return [
         {
             "$match": {
-                "id_order": order_id,  # id_order es string en order_details
-                "id_inventory": product_id,  # id_inventory es string en order_details
+                "id_order": ObjectId(order_id),
+                "id_inventory": ObjectId(product_id),
                 "active": True
             }
         },
         {"$limit": 1}
     ]
 
+@pipeline_builder
 def get_order_detail_by_id_pipeline(detail_id: str) -> list:
     if not ObjectId.is_valid(detail_id):
         raise ValueError(f"ID de detalle no válido: {detail_id}")
@@ -100,3 +131,33 @@ def get_order_detail_by_id_pipeline(detail_id: str) -> list:
         }
     ]
 
+
+def get_order_totals_delta_update(subtotal_delta: float, tax_rate: float, item_delta: int = 0) -> list:
+    """
+    Update con pipeline que suma subtotal_delta al subtotal de la orden y
+    recalcula impuestos y total a partir del nuevo subtotal, todo en la
+    misma escritura. Los montos se redondean a 2 decimales en cada paso para
+    que los deltas sucesivos no acumulen error de punto flotante.
+
+    item_delta ajusta item_count (líneas activas de la orden). En órdenes
+    antiguas sin item_count el campo se deja sin crear: se calcula con
+    count_documents hasta la próxima reparación de totales.
+    """
+    return [
+        {"$set": {
+            "subtotal": {"$round": [{"$add": [{"$ifNull": ["$subtotal", 0]}, subtotal_delta]}, 2]},
+            "discount": {"$ifNull": ["$discount", 0]},
+            "item_count": {"$cond": [
+                {"$eq": [{"$type": "$item_count"}, "missing"]},
+                "$$REMOVE",
+                {"$add": ["$item_count", item_delta]}
+            ]}
+        }},
+        {"$set": {
+            "taxes": {"$round": [{"$multiply": ["$subtotal", tax_rate]}, 2]}
+        }},
+        {"$set": {
+            "total": {"$round": [{"$subtract": [{"$add": ["$subtotal", "$taxes"]}, "$discount"]}, 2]},
+            "date_updated": "$$NOW"
+        }}
+    ]
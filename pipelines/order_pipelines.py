@@ -1,22 +1,27 @@
 from bson import ObjectId
+from .builder import pipeline_builder
 
+@pipeline_builder
 def get_all_orders_pipeline(skip: int = 0, limit: int = 50) -> list:
     """Pipeline para obtener todas las órdenes con información del usuario"""
     return [
+        # Ordenar y paginar antes del $lookup: solo se une la página devuelta.
+        # _id desempata órdenes con la misma fecha (mismo orden que el cursor)
+        {"$sort": {"date": -1, "_id": -1}},
+        {"$skip": skip},
+        {"$limit": limit},
         {
             "$lookup": {
                 "from": "users",
-                "let": {"user_id": {"$toObjectId": "$id_user"}},  # Convertir string a ObjectId para lookup
-                "pipeline": [
-                    {"$match": {"$expr": {"$eq": ["$_id", "$$user_id"]}}}
-                ],
+                "localField": "id_user",  # id_user es ObjectId
+                "foreignField": "_id",
                 "as": "user_info"
             }
         },
         {
             "$project": {
                 "id": {"$toString": "$_id"},
-                "id_user": "$id_user",
+                "id_user": {"$toString": "$id_user"},
                 "user_name": {"$arrayElemAt": ["$user_info.name", 0]},
                 "date": 1,
                 "payment_method": 1,
@@ -25,33 +30,35 @@ def get_all_orders_pipeline(skip: int = 0, limit: int = 50) -> list:
                 "taxes": 1,
                 "discount": 1,
                 "total": 1,
+                "status": "$current_status",
                 "_id": 0
             }
-        },
-        {"$sort": {"date": -1}},
-        {"$skip": skip},
-        {"$limit": limit}
+        }
     ]
 
 
+@pipeline_builder
 def get_orders_by_user_pipeline(user_id: str, skip: int = 0, limit: int = 50) -> list:
     """Pipeline para obtener órdenes de un usuario específico"""
     return [
-        {"$match": {"id_user": user_id}},  # Ahora id_user es string
+        {"$match": {"id_user": ObjectId(user_id)}},
+        # Ordenar y paginar antes del $lookup: solo se une la página devuelta.
+        # _id desempata órdenes con la misma fecha (mismo orden que el cursor)
+        {"$sort": {"date": -1, "_id": -1}},
+        {"$skip": skip},
+        {"$limit": limit},
         {
             "$lookup": {
                 "from": "users",
-                "let": {"user_id": {"$toObjectId": "$id_user"}},  # Convertir string a ObjectId para lookup
-                "pipeline": [
-                    {"$match": {"$expr": {"$eq": ["$_id", "$$user_id"]}}}
-                ],
+                "localField": "id_user",  # id_user es ObjectId
+                "foreignField": "_id",
                 "as": "user_info"
             }
         },
         {
             "$project": {
                 "id": {"$toString": "$_id"},
-                "id_user": "$id_user",
+                "id_user": {"$toString": "$id_user"},
                 "user_name": {"$arrayElemAt": ["$user_info.name", 0]},
                 "date": 1,
                 "payment_method": 1,
@@ -60,15 +67,56 @@ def get_orders_by_user_pipeline(user_id: str, skip: int = 0, limit: int = 50) ->
                 "taxes": 1,
                 "discount": 1,
                 "total": 1,
+                "status": "$current_status",
                 "_id": 0
             }
+        }
+    ]
+
+
+@pipeline_builder
+def get_orders_keyset_pipeline(user_id: str = None, after: dict = None, limit: int = 50) -> list:
+    """
+    Pipeline para una página de órdenes por cursor. after es el filtro de
+    utils.pagination.keyset_filter; se piden limit + 1 documentos para saber
+    si hay una página siguiente. Usa los índices id_user_date_id / date_id.
+    """
+    match = dict(after or {})
+    if user_id:
+        match["id_user"] = ObjectId(user_id)
+
+    return [
+        {"$match": match},
+        {"$sort": {"date": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        {
+            "$lookup": {
+                "from": "users",
+                "localField": "id_user",  # id_user es ObjectId
+                "foreignField": "_id",
+                "as": "user_info"
+            }
         },
-        {"$sort": {"date": -1}},
-        {"$skip": skip},
-        {"$limit": limit}
+        {
+            "$project": {
+                "id": {"$toString": "$_id"},
+                "id_user": {"$toString": "$id_user"},
+                "user_name": {"$arrayElemAt": ["$user_info.name", 0]},
+                "date": 1,
+                "payment_method": 1,
+                "delivery_type": 1,
+                "subtotal": 1,
+                "taxes": 1,
+                "discount": 1,
+                "total": 1,
+                "status": "$current_status",
+                "_id": 0
+            }
+        }
     ]
 
 
+@pipeline_builder
 def get_order_by_id_pipeline(order_id: str) -> list:
     """Pipeline para obtener una orden específica con detalles completos"""
     return [
@@ -76,37 +124,31 @@ def get_order_by_id_pipeline(order_id: str) -> list:
         {
             "$lookup": {
                 "from": "users",
-                "let": {"user_id": {"$toObjectId": "$id_user"}},  # Convertir string a ObjectId para lookup
-                "pipeline": [
-                    {"$match": {"$expr": {"$eq": ["$_id", "$$user_id"]}}}
-                ],
+                "localField": "id_user",  # id_user es ObjectId
+                "foreignField": "_id",
                 "as": "user_info"
             }
         },
         {
             "$lookup": {
                 "from": "order_details",
-                "let": {"order_id": {"$toString": "$_id"}},  # Convertir ObjectId a string para lookup
-                "pipeline": [
-                    {"$match": {"$expr": {"$eq": ["$id_order", "$$order_id"]}}}
-                ],
+                "localField": "_id",
+                "foreignField": "id_order",
                 "as": "details"
             }
         },
         {
             "$lookup": {
                 "from": "order_status_record",
-                "let": {"order_id": {"$toString": "$_id"}},  # Convertir ObjectId a string para lookup
-                "pipeline": [
-                    {"$match": {"$expr": {"$eq": ["$id_order", "$$order_id"]}}}
-                ],
+                "localField": "_id",
+                "foreignField": "id_order",
                 "as": "status_history"
             }
         },
         {
             "$project": {
                 "id": {"$toString": "$_id"},
-                "id_user": "$id_user",
+                "id_user": {"$toString": "$id_user"},
                 "user_name": {"$arrayElemAt": ["$user_info.name", 0]},
                 "date": 1,
                 "payment_method": 1,
@@ -115,13 +157,16 @@ def get_order_by_id_pipeline(order_id: str) -> list:
                 "taxes": 1,
                 "discount": 1,
                 "total": 1,
+                "status": "$current_status",
                 "details": {
                     "$map": {
                         "input": "$details",
                         "as": "detail",
                         "in": {
                             "id": {"$toString": "$$detail._id"},
-                            "id_producto": "$$detail.id_producto",  # Ya es string
+                            "id_inventory": {"$toString": "$$detail.id_inventory"},
+                            "product_name": "$$detail.product_name",
+                            "unit_price": "$$detail.unit_price",
                             "quantity": "$$detail.quantity",
                             "active": "$$detail.active",
                             "date_created": "$$detail.date_created",
@@ -135,7 +180,7 @@ def get_order_by_id_pipeline(order_id: str) -> list:
                         "as": "status",
                         "in": {
                             "id": {"$toString": "$$status._id"},
-                            "id_status": "$$status.id_status",  # Ya es string
+                            "id_status": {"$toString": "$$status.id_status"},
                             "date": "$$status.date"
                         }
                     }
@@ -146,6 +191,7 @@ def get_order_by_id_pipeline(order_id: str) -> list:
     ]
 
 
+@pipeline_builder
 def validate_user_exists_pipeline(user_id: str) -> list:
     """Pipeline para validar que un usuario existe"""
     return [
@@ -155,69 +201,16 @@ def validate_user_exists_pipeline(user_id: str) -> list:
     ]
 
 
+@pipeline_builder
 def get_order_owner_pipeline(order_id: str):
     """Pipeline para obtener el propietario de una orden"""
     return [
         {"$match": {"_id": ObjectId(order_id)}},
-        {"$project": {"id_user": "$id_user"}},  # Ya es string, no necesita conversión
+        {"$project": {"id_user": {"$toString": "$id_user"}}},
         {"$limit": 1}
     ]
 
 
-def get_existing_inprogress_order_pipeline(user_id: str):
-    """Pipeline para buscar una orden existente en estado 'inprogress' del usuario"""
-    return [
-        # Buscar órdenes del usuario (ahora id_user es string)
-        {"$match": {"id_user": user_id}},
-
-        # Lookup con order_status_record para obtener el estado más reciente
-        # Convertimos _id a string para hacer match con id_order (que ahora es string)
-        {"$lookup": {
-            "from": "order_status_record",
-            "let": {"order_id": {"$toString": "$_id"}},
-            "pipeline": [
-                {"$match": {"$expr": {"$eq": ["$id_order", "$$order_id"]}}},
-                {"$sort": {"date": -1}},
-                {"$limit": 1}
-            ],
-            "as": "latest_status_array"
-        }},
-
-        # Extraer el estado más reciente
-        {"$addFields": {
-            "latest_status": {"$arrayElemAt": ["$latest_status_array", 0]}
-        }},
-
-        # Solo procesar órdenes que tienen estado
-        {"$match": {"latest_status": {"$exists": True}}},
-
-        # Lookup con order_statuses para obtener la descripción del estado
-        # Convertimos id_status (string) a ObjectId para hacer match con _id
-        {"$lookup": {
-            "from": "order_statuses",
-            "let": {"status_id": {"$toObjectId": "$latest_status.id_status"}},
-            "pipeline": [
-                {"$match": {"$expr": {"$eq": ["$_id", "$$status_id"]}}}
-            ],
-            "as": "status_info"
-        }},
-
-        # Filtrar solo órdenes en "inprogress"
-        {"$match": {"status_info.0.description": "inprogress"}},
-
-        # Proyectar solo los campos necesarios
-        {"$project": {
-        "_id": {"$toString": "$_id"},
-        "id_user": "$id_user",  # Ya es string
-        "date": 1,
-        "subtotal": {"$ifNull": ["$subtotal", 0.0]},
-        "taxes": {"$ifNull": ["$taxes", 0.0]},
-        "discount": {"$ifNull": ["$discount", 0.0]},
-        "total": {"$ifNull": ["$total", 0.0]},
-        "status": {"$arrayElemAt": ["$status_info.description", 0]},
-        "payment_method": {"$ifNull": ["$payment_method", ""]},     # Agregado
-        "delivery_type": {"$ifNull": ["$delivery_type", ""]}        # Agregado
-        }},
-
-        {"$limit": 1}
-    ]
\ No newline at end of file
+def get_inprogress_order_filter(user_id: str) -> dict:
+    """Filtro para la orden en 'inprogress' del usuario (usa el índice parcial id_user_inprogress_unique)"""
+    return {"id_user": ObjectId(user_id), "current_status": "inprogress"}
@@ -1,5 +1,7 @@
 from bson import ObjectId
+from .builder import pipeline_builder
 
+@pipeline_builder
 def validate_order_status_exists_pipeline(order_status_id: str) -> list:
     return [
         {"$match": {"_id": ObjectId(order_status_id)}},
@@ -9,6 +11,7 @@ def validate_order_status_exists_pipeline(order_status_id: str) -> list:
 
 
 
+@pipeline_builder
 def check_duplicate_order_status_description_pipeline(description: str) -> list:
     return [
         {
@@ -21,6 +24,7 @@ def check_duplicate_order_status_description_pipeline(description: str) -> list:
     ]
 
 
+@pipeline_builder
 def check_duplicate_order_status_on_update_pipeline(order_status_id: str, description: str) -> list:
     return [
         {
@@ -35,6 +39,7 @@ def check_duplicate_order_status_on_update_pipeline(order_status_id: str, descri
 
 
 
+@pipeline_builder
 def get_all_order_statuses_pipeline() -> list:
     return [
         {
@@ -48,6 +53,7 @@ def get_all_order_statuses_pipeline() -> list:
 
 
 
+@pipeline_builder
 def get_order_status_by_id_pipeline(order_status_id: str) -> list:
     return [
         {"$match": {"_id": ObjectId(order_status_id)}},
@@ -1,15 +1,17 @@
 from bson import ObjectId
+from .builder import pipeline_builder
 
+@pipeline_builder
 def get_reviews_by_catalog_pipeline(catalog_id: str) -> list:
     """Pipeline para obtener reviews activas de un catálogo con info de usuario y catálogo"""
     return [
-        {"$match": {"id_catalog": catalog_id, "active": True}},
+        {"$match": {"id_catalog": ObjectId(catalog_id), "active": True}},
         {
             "$lookup": {
                 "from": "users",
-                "let": {"user_id": {"$toObjectId": "$id_user"}},
+                "localField": "id_user",
+                "foreignField": "_id",
                 "pipeline": [
-                    {"$match": {"$expr": {"$eq": ["$_id", "$$user_id"]}}},
                     {"$project": {"_id": 0, "name": 1, "email": 1}}  # traer nombre y email usuario
                 ],
                 "as": "user_info"
@@ -18,9 +20,9 @@ def get_reviews_by_catalog_pipeline(catalog_id: str) -> list:
         {
             "$lookup": {
                 "from": "catalogs",
-                "let": {"catalog_id": {"$toObjectId": "$id_catalog"}},
+                "localField": "id_catalog",
+                "foreignField": "_id",
                 "pipeline": [
-                    {"$match": {"$expr": {"$eq": ["$_id", "$$catalog_id"]}}},
                     {"$project": {"_id": 0, "title": 1, "description": 1}}  # título y descripción catálogo
                 ],
                 "as": "catalog_info"
@@ -29,8 +31,8 @@ def get_reviews_by_catalog_pipeline(catalog_id: str) -> list:
         {
             "$project": {
                 "id": {"$toString": "$_id"},
-                "id_user": 1,
-                "id_catalog": 1,
+                "id_user": {"$toString": "$id_user"},
+                "id_catalog": {"$toString": "$id_catalog"},
                 "comment": 1,
                 "rating": 1,
                 "review_date": 1,
@@ -42,6 +44,7 @@ def get_reviews_by_catalog_pipeline(catalog_id: str) -> list:
         }
     ]
 
+@pipeline_builder
 def get_review_by_id_pipeline(review_id: str) -> list:
     """Pipeline para obtener una review activa por id con info extra de usuario y catálogo"""
     return [
@@ -49,9 +52,9 @@ def get_review_by_id_pipeline(review_id: str) -> list:
         {
             "$lookup": {
                 "from": "users",
-                "let": {"user_id": "$id_user"},
+                "localField": "id_user",
+                "foreignField": "_id",
                 "pipeline": [
-                    {"$match": {"$expr": {"$eq": ["$_id", {"$toObjectId": "$$user_id"}]}}},
                     {"$project": {"_id": 0, "name": 1, "email": 1}}
                 ],
                 "as": "user_info"
@@ -60,9 +63,9 @@ def get_review_by_id_pipeline(review_id: str) -> list:
         {
             "$lookup": {
                 "from": "catalogs",
-                "let": {"catalog_id": "$id_catalog"},
+                "localField": "id_catalog",
+                "foreignField": "_id",
                 "pipeline": [
-                    {"$match": {"$expr": {"$eq": ["$_id", {"$toObjectId": "$$catalog_id"}]}}},
                     {"$project": {"_id": 0, "title": 1, "description": 1}}
                 ],
                 "as": "catalog_info"
@@ -71,8 +74,8 @@ def get_review_by_id_pipeline(review_id: str) -> list:
         {
             "$project": {
                 "id": {"$toString": "$_id"},
-                "id_user": 1,
-                "id_catalog": 1,
+                "id_user": {"$toString": "$id_user"},
+                "id_catalog": {"$toString": "$id_catalog"},
                 "comment": 1,
                 "rating": 1,
                 "review_date": 1,
@@ -0,0 +1,139 @@
+"""
+Catálogo de pipelines con argumentos de ejemplo.
+
+Permite construir cada pipeline sin pasar por los controllers, por ejemplo
+para revisar sus planes de ejecución (ver utils/indexes.py).
+"""
+from datetime import datetime
+from typing import Callable, NamedTuple
+
+from bson import ObjectId
+
+from .catalog_pipelines import (
+    get_catalog_with_type_pipeline,
+    get_catalogs_by_type_pipeline,
+    get_all_catalogs_with_types_pipeline,
+    validate_catalog_type_pipeline,
+    search_catalogs_pipeline,
+)
+from .catalog_type_pipelines import (
+    get_catalog_type_pipeline,
+    validate_type_is_assigned_pipeline,
+)
+from .order_pipelines import (
+    get_all_orders_pipeline,
+    get_orders_by_user_pipeline,
+    get_orders_keyset_pipeline,
+    get_order_by_id_pipeline,
+    validate_user_exists_pipeline,
+    get_order_owner_pipeline,
+)
+from .order_detail_pipelines import (
+    get_order_details_pipeline,
+    validate_order_exists_pipeline,
+    validate_product_exists_pipeline,
+    check_order_detail_exists_pipeline,
+    get_order_detail_by_id_pipeline,
+    get_order_line_snapshot_pipeline,
+)
+from .inventory_pipelines import (
+    get_inventory_pipeline,
+    get_all_inventory_pipeline,
+    get_inventory_by_id_pipeline,
+    validate_catalog_pipeline,
+)
+from .reviews_pipelines import (
+    get_reviews_by_catalog_pipeline,
+    get_review_by_id_pipeline,
+)
+from .order_status_pipelines import (
+    validate_order_status_exists_pipeline,
+    check_duplicate_order_status_description_pipeline,
+    check_duplicate_order_status_on_update_pipeline,
+    get_all_order_statuses_pipeline,
+    get_order_status_by_id_pipeline,
+)
+from .version_pipelines import get_version_probe_pipeline, get_latest_version_pipeline
+from .facet_pipelines import get_page_with_total_pipeline
+from .slow_query_pipelines import get_slow_aggregation_offenders_pipeline
+
+# IDs válidos que no tienen por qué existir en la base de datos
+SAMPLE_ID = "64e8a07d1234567890abcdef"
+SAMPLE_OTHER_ID = "64e8a07d2234567890abcdef"
+SAMPLE_DATE = datetime(2025, 1, 1)
+
+# Filtro equivalente a utils.pagination.keyset_filter para un cursor de ejemplo
+SAMPLE_KEYSET = {"$or": [
+    {"date": {"$lt": SAMPLE_DATE}},
+    {"date": SAMPLE_DATE, "_id": {"$lt": ObjectId(SAMPLE_ID)}}
+]}
+
+
+class PipelineSample(NamedTuple):
+    collection: str
+    builder: Callable[..., list]
+    args: tuple = ()
+
+    @property
+    def name(self) -> str:
+        return self.builder.__name__
+
+    def build(self) -> list:
+        return self.builder(*self.args)
+
+
+SAMPLE_PIPELINES = [
+    # Catalogs
+    PipelineSample("catalogs", get_catalog_with_type_pipeline, (SAMPLE_ID,)),
+    PipelineSample("catalogs", get_catalogs_by_type_pipeline, ([ObjectId(SAMPLE_ID)], 0, 10)),
+    PipelineSample("catalogs", get_all_catalogs_with_types_pipeline, ([ObjectId(SAMPLE_ID), ObjectId(SAMPLE_OTHER_ID)], 0, 10)),
+    PipelineSample("catalogs", search_catalogs_pipeline, ("vinilo", 0, 10)),
+    PipelineSample("catalogtypes", validate_catalog_type_pipeline, (SAMPLE_ID,)),
+
+    # Catalog types
+    PipelineSample("catalogtypes", get_catalog_type_pipeline),
+    PipelineSample("catalogtypes", validate_type_is_assigned_pipeline, (SAMPLE_ID,)),
+
+    # Orders
+    PipelineSample("orders", get_all_orders_pipeline, (0, 50)),
+    PipelineSample("orders", get_orders_by_user_pipeline, (SAMPLE_ID, 0, 50)),
+    PipelineSample("orders", get_orders_keyset_pipeline, (None, SAMPLE_KEYSET, 50)),
+    PipelineSample("orders", get_orders_keyset_pipeline, (SAMPLE_ID, SAMPLE_KEYSET, 50)),
+    PipelineSample("orders", get_page_with_total_pipeline, (get_orders_by_user_pipeline(SAMPLE_ID, 0, 50),)),
+    PipelineSample("orders", get_order_by_id_pipeline, (SAMPLE_ID,)),
+    PipelineSample("orders", get_order_owner_pipeline, (SAMPLE_ID,)),
+    PipelineSample("users", validate_user_exists_pipeline, (SAMPLE_ID,)),
+
+    # Order details
+    PipelineSample("order_details", get_order_details_pipeline, (SAMPLE_ID,)),
+    PipelineSample("order_details", check_order_detail_exists_pipeline, (SAMPLE_ID, SAMPLE_OTHER_ID)),
+    PipelineSample("order_details", get_order_detail_by_id_pipeline, (SAMPLE_ID,)),
+    PipelineSample("inventory", get_order_line_snapshot_pipeline, (SAMPLE_ID,)),
+    PipelineSample("orders", validate_order_exists_pipeline, (SAMPLE_ID,)),
+    PipelineSample("inventory", validate_product_exists_pipeline, (SAMPLE_ID,)),
+
+    # Inventory
+    PipelineSample("inventory", get_inventory_pipeline, (0, 10)),
+    PipelineSample("inventory", get_all_inventory_pipeline, (0, 50)),
+    PipelineSample("inventory", get_inventory_by_id_pipeline, (SAMPLE_ID,)),
+    PipelineSample("catalogs", validate_catalog_pipeline, (SAMPLE_ID,)),
+
+    # Reviews
+    PipelineSample("reviews", get_reviews_by_catalog_pipeline, (SAMPLE_ID,)),
+    PipelineSample("reviews", get_review_by_id_pipeline, (SAMPLE_ID,)),
+
+    # Order statuses
+    PipelineSample("order_statuses", validate_order_status_exists_pipeline, (SAMPLE_ID,)),
+    PipelineSample("order_statuses", check_duplicate_order_status_description_pipeline, ("ordered",)),
+    PipelineSample("order_statuses", check_duplicate_order_status_on_update_pipeline, (SAMPLE_ID, "ordered")),
+    PipelineSample("order_statuses", get_all_order_statuses_pipeline),
+    PipelineSample("order_statuses", get_order_status_by_id_pipeline, (SAMPLE_ID,)),
+
+    # Version probes (GET condicional)
+    PipelineSample("catalogs", get_latest_version_pipeline, ("catalogs", {"id_catalog_type": {"$in": [ObjectId(SAMPLE_ID), ObjectId(SAMPLE_OTHER_ID)]}})),
+    PipelineSample("artists", get_version_probe_pipeline),
+    PipelineSample("order_statuses", get_version_probe_pipeline),
+
+    # Aggregations lentas (GET /admin/slow-aggregations)
+    PipelineSample("slow_aggregations", get_slow_aggregation_offenders_pipeline, (SAMPLE_DATE, 20)),
+]
@@ -0,0 +1,45 @@
+from datetime import datetime
+from .builder import pipeline_builder
+
+@pipeline_builder
+def get_slow_aggregation_offenders_pipeline(since: datetime, limit: int = 20) -> list:
+    """
+    Resumen de las capturas de slow_aggregations (ver utils/slow_queries.py)
+    por colección y builder, ordenado por tiempo total en ejecuciones lentas.
+    Del plan se muestra la captura más reciente.
+    """
+    return [
+        {"$match": {"at": {"$gte": since}}},
+        {"$sort": {"at": 1}},
+        {"$group": {
+            "_id": {"collection": "$collection", "builder": "$builder"},
+            "slow_count": {"$sum": "$slow_count"},
+            "total_ms": {"$sum": "$total_ms"},
+            "max_ms": {"$max": "$max_ms"},
+            "last_seen": {"$last": "$at"},
+            "plan": {"$last": "$plan"},
+            "indexes": {"$last": "$indexes"},
+            "collscan": {"$last": "$collscan"},
+            "keys_examined": {"$last": "$keys_examined"},
+            "docs_examined": {"$last": "$docs_examined"},
+            "returned": {"$last": "$returned"}
+        }},
+        {"$sort": {"total_ms": -1}},
+        {"$limit": limit},
+        {"$project": {
+            "_id": 0,
+            "collection": "$_id.collection",
+            "builder": "$_id.builder",
+            "slow_count": 1,
+            "total_ms": {"$round": ["$total_ms", 1]},
+            "avg_ms": {"$round": [{"$divide": ["$total_ms", {"$max": ["$slow_count", 1]}]}, 1]},
+            "max_ms": 1,
+            "last_seen": 1,
+            "plan": 1,
+            "indexes": 1,
+            "collscan": 1,
+            "keys_examined": 1,
+            "docs_examined": 1,
+            "returned": 1
+        }}
+    ]
@@ -0,0 +1,45 @@
+from .builder import pipeline_builder
+
+@pipeline_builder
+def get_version_probe_pipeline(match: dict | None = None) -> list:
+    """
+    Versión de un conjunto de documentos sin traerlos: cantidad, date_updated
+    más reciente y cuántos no tienen date_updated (ver utils/conditional.py)
+    """
+    return [
+        {"$match": match or {}},
+        {"$group": {
+            "_id": None,
+            "count": {"$sum": 1},
+            "last_modified": {"$max": "$date_updated"},
+            "unversioned": {"$sum": {"$cond": [{"$eq": [{"$type": "$date_updated"}, "date"]}, 0, 1]}}
+        }}
+    ]
+
+
+@pipeline_builder
+def get_latest_version_pipeline(collection: str, match: dict) -> list:
+    """
+    Versión de un conjunto grande de documentos sin recorrerlo: el
+    date_updated más reciente y el más antiguo, cada uno con un $sort + $limit 1
+    sobre un índice {<filtro>, date_updated} (en catalogs,
+    id_catalog_type_date_updated). Si el más antiguo no es una fecha hay
+    documentos sin versión. No cuenta: el conteo se pide aparte y cacheado
+    (utils/counts.py). Mismo formato que get_version_probe_pipeline sin count.
+    """
+    def edge(direction: int) -> list:
+        return [
+            {"$match": match},
+            {"$sort": {"date_updated": direction}},
+            {"$limit": 1},
+            {"$project": {"_id": 0, "date_updated": 1}}
+        ]
+
+    return edge(-1) + [
+        {"$unionWith": {"coll": collection, "pipeline": edge(1)}},
+        {"$group": {
+            "_id": None,
+            "last_modified": {"$max": "$date_updated"},
+            "unversioned": {"$sum": {"$cond": [{"$eq": [{"$type": "$date_updated"}, "date"]}, 0, 1]}}
+        }}
+    ]
@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends, Query
+from controllers.admin import get_slow_aggregations
+from utils.security import validate_admin
+
+router = APIRouter()
+
+@router.get("/admin/slow-aggregations", response_model=dict, tags=["🛠️ Admin"])
+async def get_slow_aggregations_endpoint(
+    limit: int = Query(default=20, ge=1, le=200),
+    hours: float = Query(default=24, gt=0, description="Ventana en horas"),
+    user: dict = Depends(validate_admin)
+) -> dict:
+    """Aggregations lentas agrupadas por builder, con plan, índices y documentos examinados - Solo admin"""
+    return await get_slow_aggregations(limit=limit, hours=hours)
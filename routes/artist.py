@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, Response
 from typing import Optional
 from models.artist import Artist
 from controllers import artist as artist_controller
+from utils.conditional import conditional_get
 
 router = APIRouter(prefix="/artists", tags=["🎤 Artists"])
 
@@ -12,8 +13,12 @@ async def validateadmin(admin: Optional[str] = Header(None)):
 
 # GET /artists - listar todos los artistas
 @router.get("/", summary="Listar todos los artistas", response_model=list[Artist])
-async def get_all_artists():
-    return await artist_controller.get_artists()
+async def get_all_artists(request: Request, response: Response):
+    return await conditional_get(
+        request, response, "artists",
+        probe=artist_controller.get_artists_validators,
+        load=lambda validators: artist_controller.get_artists()
+    )
 
 # GET /artists/{id} - obtener artista por ID
 @router.get("/{artist_id}", summary="Obtener artista por ID", response_model=Artist)
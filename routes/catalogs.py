@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
+from typing import Literal
 from models.catalogs import Catalog
 from controllers.catalogs import (
     create_catalog,
     get_catalogs,
+    get_catalogs_by_type,
     get_catalog_by_id,
     update_catalog,
-    deactivate_catalog
+    deactivate_catalog,
+    get_catalogs_cache_stats,
+    get_catalogs_validators,
+    get_catalog_validators
 )
-from utils.security import validate_token  # <- solo validar usuario autenticado
+from utils.security import validate_token, validate_admin  # <- usuario autenticado / admin
+from utils.conditional import conditional_get
 
 router = APIRouter()
 
@@ -20,14 +26,44 @@ async def create_catalog_endpoint(
     return await create_catalog(catalog)
 
 @router.get("/catalogs", response_model=dict, tags=["📋 Catalogs"])
-async def get_catalogs_endpoint() -> dict:
-    """Obtener todos los catálogos"""
-    return await get_catalogs()
+async def get_catalogs_endpoint(
+    request: Request,
+    response: Response,
+    total: Literal["exact", "estimated", "none"] = Query(default="exact", description="Cómo calcular el total")
+) -> dict:
+    """Obtener todos los catálogos (responde 304 si If-None-Match coincide con el ETag)"""
+    return await conditional_get(
+        request, response, "catalogs",
+        probe=lambda: get_catalogs_validators(total_mode=total),
+        load=lambda validators: get_catalogs(total_mode=total, version=validators and validators.etag)
+    )
+
+# Debe declararse antes de /catalogs/{catalog_id}
+@router.get("/catalogs/type/{catalog_type_description}", response_model=dict, tags=["📋 Catalogs"])
+async def get_catalogs_by_type_endpoint(
+    catalog_type_description: str,
+    skip: int = Query(default=0, ge=0, description="Número de registros a omitir"),
+    limit: int = Query(default=10, ge=1, le=100, description="Número de registros a obtener"),
+    total: Literal["exact", "estimated", "none"] = Query(default="exact", description="Cómo calcular el total")
+) -> dict:
+    """Catálogos activos de un tipo, paginados; con total=exact página y total salen de una sola agregación"""
+    return await get_catalogs_by_type(catalog_type_description, skip, limit, total)
+
+@router.get("/catalogs/cache/stats", response_model=dict, tags=["📋 Catalogs"])
+async def get_catalogs_cache_stats_endpoint(
+    user: dict = Depends(validate_admin)
+) -> dict:
+    """Contadores del caché de respuestas (hits, misses, evictions) - Solo admin"""
+    return await get_catalogs_cache_stats()
 
 @router.get("/catalogs/{catalog_id}", response_model=Catalog, tags=["📋 Catalogs"])
-async def get_catalog_by_id_endpoint(catalog_id: str) -> Catalog:
-    """Obtener un catálogo por ID"""
-    return await get_catalog_by_id(catalog_id)
+async def get_catalog_by_id_endpoint(catalog_id: str, request: Request, response: Response) -> Catalog:
+    """Obtener un catálogo por ID (responde 304 si If-None-Match coincide con el ETag)"""
+    return await conditional_get(
+        request, response, "catalogs",
+        probe=lambda: get_catalog_validators(catalog_id),
+        load=lambda validators: get_catalog_by_id(catalog_id, version=validators and validators.etag)
+    )
 
 @router.put("/catalogs/{catalog_id}", response_model=Catalog, tags=["📋 Catalogs"])
 async def update_catalog_endpoint(
@@ -4,9 +4,10 @@ from controllers.order_details import (
     create_order_detail,
     update_order_detail,
     delete_order_detail,
-    get_order_details
+    get_order_details,
+    repair_order_totals
 )
-from utils.security import validateuser
+from utils.security import validateuser, validateadmin
 
 router = APIRouter(prefix="/orders", tags=["🛒 Order Details"])
 
@@ -96,3 +97,17 @@ async def remove_product_from_order(
             raise HTTPException(status_code=400, detail=result["message"])
 
     return result
+
+@router.post("/{order_id}/totals/recalculate")
+@validateadmin
+async def recalculate_totals(request: Request, order_id: str):
+    """Recalcular los totales de una orden desde sus líneas activas - Solo admin"""
+    result = await repair_order_totals(order_id)
+
+    if not result["success"]:
+        if result["message"] == "Orden no encontrada":
+            raise HTTPException(status_code=404, detail=result["message"])
+        else:
+            raise HTTPException(status_code=400, detail=result["message"])
+
+    return result
@@ -1,13 +1,16 @@
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Request, Response
 from models.order_statuses import OrderStatus
 from controllers.order_statuses import (
     create_order_status,
     get_order_statuses,
+    get_order_statuses_validators,
+    get_order_status_transitions,
     get_order_status_by_id,
     update_order_status,
     delete_order_status
 )
 from utils.security import validateadmin
+from utils.conditional import conditional_get
 
 router = APIRouter(prefix="/order-statuses", tags=["📊 Order Status"])
 
@@ -19,9 +22,20 @@ async def create_order_status_endpoint(
     return await create_order_status(order_status)
 
 @router.get("/")
-async def get_order_statuses_endpoint() -> dict:
-    """Obtener todos los order statuses"""
-    return await get_order_statuses()
+async def get_order_statuses_endpoint(request: Request, response: Response) -> dict:
+    """Obtener todos los order statuses (responde 304 si If-None-Match coincide con el ETag)"""
+    return await conditional_get(
+        request, response, "order_statuses",
+        probe=get_order_statuses_validators,
+        load=lambda validators: get_order_statuses()
+    )
+
+# Debe declararse antes de /{order_status_id}
+@router.get("/transitions")
+@validateadmin
+async def get_order_status_transitions_endpoint(request: Request) -> dict:
+    """Obtener el grafo de transiciones entre estados (requiere permisos de admin)"""
+    return await get_order_status_transitions()
 
 @router.get("/{order_status_id}")
 async def get_order_status_by_id_endpoint(order_status_id: str) -> dict:
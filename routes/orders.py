@@ -1,13 +1,16 @@
-from fastapi import APIRouter, Query, HTTPException, Request
+from fastapi import APIRouter, Query, HTTPException, Request, Response
+from typing import Literal, Optional
 from models.orders import CreateOrder
 from models.change_order_status import ChangeOrderStatus
 from controllers.orders import (
     create_order,
     get_orders,
     get_order_by_id,
+    get_order_validators,
     update_order_status
 )
 from utils.security import validateuser, validateadmin
+from utils.conditional import conditional_get
 
 router = APIRouter(prefix="/orders")
 
@@ -32,17 +35,21 @@ async def create_new_order(
 async def get_all_orders(
     request: Request,
     skip: int = Query(default=0, ge=0, description="Número de registros a omitir"),
-    limit: int = Query(default=50, ge=1, le=100, description="Número de registros a obtener")
+    limit: int = Query(default=50, ge=1, le=100, description="Número de registros a obtener"),
+    cursor: Optional[str] = Query(default=None, description="Cursor de paginación (vacío para la primera página); ignora skip"),
+    total: Literal["exact", "estimated", "none"] = Query(default="exact", description="Cómo calcular el total en modo skip/limit")
 ):
     """
     Obtener órdenes:
     - Admin: todas las órdenes del sistema
     - Usuario: solo sus propias órdenes
+
+    Con cursor la respuesta trae next_cursor (null en la última página) en vez de total/has_more.
     """
     is_admin = getattr(request.state, 'admin', False)
     user_id = None if is_admin else request.state.id
     
-    result = await get_orders(skip=skip, limit=limit, user_id=user_id)
+    result = await get_orders(skip=skip, limit=limit, user_id=user_id, cursor=cursor, total_mode=total)
     
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
@@ -54,27 +61,37 @@ async def get_all_orders(
 @validateuser
 async def get_order_details(
     request: Request,
+    response: Response,
     order_id: str
 ):
     """
     Obtener orden específica:
     - Admin: cualquier orden
     - Usuario: solo si la orden le pertenece
+
+    Responde 304 si If-None-Match coincide con el ETag (sin ejecutar los $lookup).
     """
     is_admin = getattr(request.state, 'admin', False)
     requesting_user_id = request.state.id if not is_admin else None
-    
-    result = await get_order_by_id(order_id, requesting_user_id, is_admin)
-    
-    if not result["success"]:
-        if result["message"] == "Orden no encontrada":
-            raise HTTPException(status_code=404, detail=result["message"])
-        elif "permiso" in result["message"]:
-            raise HTTPException(status_code=403, detail=result["message"])
-        else:
-            raise HTTPException(status_code=400, detail=result["message"])
-    
-    return result
+
+    async def load(validators):
+        result = await get_order_by_id(order_id, requesting_user_id, is_admin)
+
+        if not result["success"]:
+            if result["message"] == "Orden no encontrada":
+                raise HTTPException(status_code=404, detail=result["message"])
+            elif "permiso" in result["message"]:
+                raise HTTPException(status_code=403, detail=result["message"])
+            else:
+                raise HTTPException(status_code=400, detail=result["message"])
+
+        return result
+
+    return await conditional_get(
+        request, response, "orders",
+        probe=lambda: get_order_validators(order_id, requesting_user_id, is_admin),
+        load=load
+    )
 
 
 @router.put("/{order_id}/status", summary="Finalizar orden (cambiar a Ordered)", tags=["📦 Orders"])
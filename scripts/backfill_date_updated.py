@@ -0,0 +1,52 @@
+"""
+Backfill de date_updated en catalogs, artists, order_statuses y catalogtypes.
+
+Los ETags de GET /catalogs, /artists y /order-statuses se calculan con un
+probe de date_updated (ver utils/conditional.py); mientras quede algún
+documento sin el campo el probe no sirve y el ETag se calcula con un hash de
+la respuesta completa. Este script fija date_updated a la fecha de ejecución
+en los documentos que no lo tienen. Se puede volver a ejecutar.
+
+Las órdenes no lo necesitan: sin date_updated se usa su campo date.
+
+Uso:
+    python -m scripts.backfill_date_updated
+    python -m scripts.backfill_date_updated --dry-run
+"""
+import argparse
+import logging
+from datetime import datetime
+
+from utils.mongodb import get_collection
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COLLECTIONS = ("catalogs", "artists", "order_statuses", "catalogtypes")
+
+
+def backfill(dry_run: bool) -> dict:
+    now = datetime.utcnow()
+    missing = {"date_updated": {"$exists": False}}
+    stats = {}
+    for name in COLLECTIONS:
+        collection = get_collection(name)
+        if dry_run:
+            stats[name] = collection.count_documents(missing)
+        else:
+            stats[name] = collection.update_many(missing, {"$set": {"date_updated": now}}).modified_count
+        logger.info(f"{name}: {stats[name]} documents without date_updated")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill date_updated for conditional GET version probes")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    stats = backfill(args.dry_run)
+    logger.info(f"Done: {sum(stats.values())} documents")
+
+
+if __name__ == "__main__":
+    main()
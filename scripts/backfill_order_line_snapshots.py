@@ -0,0 +1,95 @@
+"""
+Backfill de unit_price / product_name / id_catalog en order_details.
+
+Las líneas creadas antes de guardar la foto de precio no tienen esos campos.
+Este script los completa con el sale_price actual del inventario y el nombre
+de su catálogo (no hay forma de saber el precio que vio el cliente). Se puede
+volver a ejecutar: solo procesa líneas sin el campo unit_price.
+
+Uso:
+    python -m scripts.backfill_order_line_snapshots
+    python -m scripts.backfill_order_line_snapshots --batch-size 500 --dry-run
+"""
+import argparse
+import logging
+
+from pymongo import UpdateOne
+
+from utils.mongodb import get_collection
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def backfill(batch_size: int, dry_run: bool) -> int:
+    details = get_collection("order_details")
+    inventory = get_collection("inventory")
+
+    updated = 0
+    last_id = None
+    while True:
+        query = {"unit_price": {"$exists": False}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+
+        batch = list(details.find(query, {"id_inventory": 1}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+
+        # Precio y nombre de todos los productos del lote en una sola consulta
+        inventory_ids = list({detail["id_inventory"] for detail in batch if detail.get("id_inventory")})
+        products = {
+            doc["_id"]: doc
+            for doc in inventory.aggregate([
+                {"$match": {"_id": {"$in": inventory_ids}}},
+                {"$lookup": {
+                    "from": "catalogs",
+                    "localField": "id_catalog",
+                    "foreignField": "_id",
+                    "pipeline": [{"$project": {"name": 1}}],
+                    "as": "catalog_info"
+                }},
+                {"$project": {
+                    "id_catalog": 1,
+                    "sale_price": 1,
+                    "name": {"$arrayElemAt": ["$catalog_info.name", 0]}
+                }}
+            ])
+        }
+
+        operations = []
+        for detail in batch:
+            product = products.get(detail.get("id_inventory"))
+            if not product:
+                logger.warning(f"Detail {detail['_id']}: inventory {detail.get('id_inventory')} not found")
+                continue
+            operations.append(UpdateOne(
+                {"_id": detail["_id"], "unit_price": {"$exists": False}},
+                {"$set": {
+                    "unit_price": product.get("sale_price", 0),
+                    "product_name": product.get("name"),
+                    "id_catalog": product.get("id_catalog")
+                }}
+            ))
+
+        if operations and not dry_run:
+            details.bulk_write(operations, ordered=False)
+        updated += len(operations)
+        last_id = batch[-1]["_id"]
+        logger.info(f"{updated} order details backfilled (last _id {last_id})")
+
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill price and name snapshots on order details")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    total = backfill(args.batch_size, args.dry_run)
+    logger.info(f"Done: {total} order details")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Backfill de current_status_id / current_status en las órdenes.
+
+Para cada orden que todavía no tiene el estado denormalizado toma el registro
+más reciente de order_status_record y guarda su id y descripción en la orden.
+Las órdenes sin historial quedan con ambos campos en null. Se puede volver a
+ejecutar: solo procesa órdenes sin el campo current_status_id.
+
+No depende de scripts/migrate_object_ids.py: id_order e id_status de
+order_status_record se aceptan como ObjectId o como string.
+
+Al final lista los usuarios con más de una orden en "inprogress", que impiden
+crear el índice único parcial id_user_inprogress_unique.
+
+Uso:
+    python -m scripts.backfill_order_status
+    python -m scripts.backfill_order_status --batch-size 500 --dry-run
+"""
+import argparse
+import logging
+
+from pymongo import UpdateOne
+
+from utils.mongodb import get_collection
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def backfill(batch_size: int, dry_run: bool) -> int:
+    orders = get_collection("orders")
+    records = get_collection("order_status_record")
+    statuses = {doc["_id"]: doc.get("description") for doc in get_collection("order_statuses").find({}, {"description": 1})}
+
+    updated = 0
+    last_id = None
+    while True:
+        query = {"current_status_id": {"$exists": False}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+
+        order_ids = [doc["_id"] for doc in orders.find(query, {"_id": 1}).sort("_id", 1).limit(batch_size)]
+        if not order_ids:
+            break
+
+        # Último estado de cada orden del lote en una sola consulta; los registros
+        # anteriores a la migración de ids guardan id_order/id_status como string
+        latest = {
+            doc["_id"]: doc["id_status"]
+            for doc in records.aggregate([
+                {"$match": {"id_order": {"$in": order_ids + [str(order_id) for order_id in order_ids]}}},
+                {"$addFields": {
+                    "id_order": {"$toObjectId": "$id_order"},
+                    "id_status": {"$convert": {"input": "$id_status", "to": "objectId", "onError": None, "onNull": None}}
+                }},
+                {"$sort": {"id_order": 1, "date": -1}},
+                {"$group": {"_id": "$id_order", "id_status": {"$first": "$id_status"}}}
+            ])
+        }
+
+        operations = []
+        for order_id in order_ids:
+            status_id = latest.get(order_id)
+            operations.append(UpdateOne(
+                {"_id": order_id, "current_status_id": {"$exists": False}},
+                {"$set": {
+                    "current_status_id": status_id,
+                    "current_status": statuses.get(status_id)
+                }}
+            ))
+
+        if not dry_run:
+            orders.bulk_write(operations, ordered=False)
+        updated += len(operations)
+        last_id = order_ids[-1]
+        logger.info(f"{updated} orders backfilled (last _id {last_id})")
+
+    return updated
+
+
+def duplicated_inprogress_orders() -> list:
+    return list(get_collection("orders").aggregate([
+        {"$match": {"current_status": "inprogress"}},
+        {"$group": {"_id": "$id_user", "orders": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill the denormalized current status on orders")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    total = backfill(args.batch_size, args.dry_run)
+    logger.info(f"Done: {total} orders")
+
+    for duplicate in duplicated_inprogress_orders():
+        logger.warning(f"User {duplicate['_id']} has {duplicate['count']} orders in progress: {duplicate['orders']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Migración al esquema v2: referencias guardadas como ObjectId.
+
+Recorre cada colección de utils.schema.FOREIGN_KEYS por _id en lotes,
+convierte los campos que todavía son string y marca el documento con
+schema_version. El avance se guarda en la colección `migrations`, así que
+si el proceso se interrumpe basta con volver a ejecutarlo.
+
+Uso:
+    python -m scripts.migrate_object_ids
+    python -m scripts.migrate_object_ids --batch-size 500 --collection orders
+    python -m scripts.migrate_object_ids --dry-run
+    python -m scripts.migrate_object_ids --restart   # ignora el progreso guardado
+"""
+import argparse
+import logging
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from utils.mongodb import get_collection
+from utils.schema import FOREIGN_KEYS, SCHEMA_VERSION
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MIGRATION_ID = f"object_id_foreign_keys_v{SCHEMA_VERSION}"
+
+
+def _convert(doc: dict, fields: list) -> tuple[dict, list]:
+    """Devuelve ($set con los campos convertidos, campos con valores inválidos)"""
+    changes = {}
+    invalid = []
+    for field in fields:
+        value = doc.get(field)
+        if isinstance(value, str):
+            if ObjectId.is_valid(value):
+                changes[field] = ObjectId(value)
+            else:
+                invalid.append(field)
+    return changes, invalid
+
+
+def migrate_collection(name: str, fields: list, batch_size: int, dry_run: bool, restart: bool) -> dict:
+    coll = get_collection(name)
+    progress = get_collection("migrations")
+    progress_id = f"{MIGRATION_ID}:{name}"
+
+    state = None if restart else progress.find_one({"_id": progress_id})
+    if state and state.get("done"):
+        logger.info(f"{name}: already migrated")
+        return state
+
+    last_id = state["last_id"] if state else None
+    stats = {"scanned": state.get("scanned", 0) if state else 0,
+             "migrated": state.get("migrated", 0) if state else 0,
+             "invalid": state.get("invalid", 0) if state else 0}
+
+    while True:
+        query = {"schema_version": {"$ne": SCHEMA_VERSION}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+
+        batch = list(coll.find(query, {field: 1 for field in fields}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+
+        operations = []
+        for doc in batch:
+            changes, invalid = _convert(doc, fields)
+            if invalid:
+                stats["invalid"] += 1
+                logger.warning(f"{name} {doc['_id']}: invalid ids in {invalid}, left as is")
+                continue
+            changes["schema_version"] = SCHEMA_VERSION
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+
+        if operations and not dry_run:
+            coll.bulk_write(operations, ordered=False)
+
+        stats["scanned"] += len(batch)
+        stats["migrated"] += len(operations)
+        last_id = batch[-1]["_id"]
+
+        if not dry_run:
+            progress.update_one(
+                {"_id": progress_id},
+                {"$set": {"last_id": last_id, "done": False, **stats}},
+                upsert=True
+            )
+        logger.info(f"{name}: {stats['migrated']} migrated, {stats['scanned']} scanned (last _id {last_id})")
+
+    if not dry_run:
+        progress.update_one({"_id": progress_id}, {"$set": {"done": True, **stats}}, upsert=True)
+    logger.info(f"{name}: done {stats}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert foreign keys stored as strings to ObjectId")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--collection", choices=sorted(FOREIGN_KEYS), help="Migrate only this collection")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--restart", action="store_true", help="Ignore saved progress")
+    args = parser.parse_args()
+
+    collections = [args.collection] if args.collection else list(FOREIGN_KEYS)
+    for name in collections:
+        migrate_collection(name, FOREIGN_KEYS[name], args.batch_size, args.dry_run, args.restart)
+
+
+if __name__ == "__main__":
+    main()
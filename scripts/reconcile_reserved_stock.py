@@ -0,0 +1,25 @@
+"""
+Reconstruye inventory.reserved_quantity desde cero.
+
+Suma las cantidades de las líneas activas de órdenes en estados que reservan
+stock (utils.stock.RESERVING_STATUSES) y reemplaza los contadores.
+
+Uso:
+    python -m scripts.reconcile_reserved_stock
+"""
+import asyncio
+import logging
+
+from utils.stock import rebuild_reserved_quantities
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    updated = asyncio.run(rebuild_reserved_quantities())
+    logger.info(f"reserved_quantity rebuilt: {updated} inventory items with reservations")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Entrada de producción: uvicorn con N workers.
+
+`python main.py` levanta un solo proceso (un core). Este runner usa el
+supervisor multiproceso de uvicorn: cada worker importa main en su propio
+proceso y en el lifespan crea su cliente de Mongo, calienta su pool y carga
+sus cachés (ver main.lifespan y utils/mongodb.py).
+
+Con SIGTERM/SIGINT (un deploy de Railway) los workers dejan de aceptar
+conexiones, terminan los requests en curso durante hasta GRACEFUL_TIMEOUT
+segundos y después corren el shutdown del lifespan.
+
+Variables de entorno (los argumentos de línea de comandos tienen prioridad):
+
+    WEB_CONCURRENCY        número de workers (default: cantidad de CPUs)
+    PORT / HOST            dirección de escucha (default 0.0.0.0:8000)
+    MONGO_POOL_BUDGET      conexiones a Mongo en total entre todos los workers
+                           (default 100); cada worker recibe budget / workers,
+                           salvo que MONGO_MAX_POOL_SIZE esté definido
+    GRACEFUL_TIMEOUT       segundos para drenar requests al apagar (default 30)
+    KEEP_ALIVE_TIMEOUT     segundos de keep-alive HTTP (default 5)
+
+uvloop y httptools se usan si están instalados (loop="auto", http="auto").
+
+Uso:
+    python serve.py --workers 4
+"""
+import argparse
+import logging
+import os
+
+import uvicorn
+
+logger = logging.getLogger("serve")
+
+MONGO_POOL_BUDGET = int(os.getenv("MONGO_POOL_BUDGET", "100"))
+MIN_POOL_PER_WORKER = 10
+
+
+def default_workers() -> int:
+    return int(os.getenv("WEB_CONCURRENCY") or os.cpu_count() or 1)
+
+
+def pool_sizes(workers: int, budget: int = MONGO_POOL_BUDGET) -> tuple[int, int]:
+    """(minPoolSize, maxPoolSize) por worker para no pasar del budget total de conexiones"""
+    max_pool = max(MIN_POOL_PER_WORKER, budget // max(workers, 1))
+    min_pool = min(int(os.getenv("MONGO_MIN_POOL_SIZE", "5")), max_pool)
+    return min_pool, max_pool
+
+
+def configure_worker_env(workers: int):
+    """Los workers heredan el entorno: utils.mongodb lee aquí el tamaño de su pool"""
+    if "MONGO_MAX_POOL_SIZE" in os.environ:
+        return
+    min_pool, max_pool = pool_sizes(workers)
+    os.environ["MONGO_MIN_POOL_SIZE"] = str(min_pool)
+    os.environ["MONGO_MAX_POOL_SIZE"] = str(max_pool)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT", "30")))
+    parser.add_argument("--keep-alive", type=int, default=int(os.getenv("KEEP_ALIVE_TIMEOUT", "5")))
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    configure_worker_env(args.workers)
+    logger.info(
+        f"Starting {args.workers} workers on {args.host}:{args.port} "
+        f"(Mongo pool per worker: {os.getenv('MONGO_MIN_POOL_SIZE', '5')}-{os.environ['MONGO_MAX_POOL_SIZE']})"
+    )
+
+    # Con workers > 1 la app se pasa como import string: cada worker la importa después del fork
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop="auto",
+        http="auto",
+        timeout_graceful_shutdown=args.graceful_timeout,
+        timeout_keep_alive=args.keep_alive,
+        log_level=args.log_level,
+        # El access log lo escribe RequestCostMiddleware, con el costo en Mongo de cada request
+        access_log=False,
+        proxy_headers=True,
+        forwarded_allow_ips="*"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import asyncio
+from utils import cache
+from utils.cache import LRUCache, ResponseCache
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_lru_evicts_least_recently_used():
+    async def scenario():
+        lru = LRUCache(max_entries=2)
+        await lru.set("a", 1, ttl=60)
+        await lru.set("b", 2, ttl=60)
+        await lru.get("a")
+        await lru.set("c", 3, ttl=60)
+        return lru, await lru.get("a"), await lru.get("b"), await lru.get("c")
+
+    lru, a, b, c = run(scenario())
+    assert (a, b, c) == (1, None, 3)
+    assert lru.evictions == 1
+
+
+def test_lru_expires_entries():
+    async def scenario():
+        lru = LRUCache()
+        await lru.set("a", 1, ttl=0)
+        return lru, await lru.get("a")
+
+    lru, value = run(scenario())
+    assert value is None
+    assert lru.expirations == 1 and lru.misses == 1
+
+
+def test_response_cache_invalidates_by_prefix(monkeypatch):
+    # Backend propio de la prueba; monkeypatch restaura el global al terminar
+    monkeypatch.setattr(cache, "_backend", LRUCache())
+    catalogs = ResponseCache("catalogs")
+    loads = []
+
+    async def loader(value):
+        loads.append(value)
+        return value
+
+    async def scenario():
+        await catalogs.get_or_load(("list", 0, 10), lambda: loader("list"))
+        await catalogs.get_or_load(("id", "x"), lambda: loader("x"))
+        await catalogs.get_or_load(("list", 0, 10), lambda: loader("list"))
+        await catalogs.invalidate_prefix("list")
+        await catalogs.get_or_load(("list", 0, 10), lambda: loader("list"))
+        await catalogs.get_or_load(("id", "x"), lambda: loader("x"))
+        return await cache.cache_stats()
+
+    stats = run(scenario())
+    assert loads == ["list", "x", "list"]
+    assert stats["hits"] == 2 and stats["invalidations"] == 1
+
+
+def test_estimated_counts_are_bounded(monkeypatch):
+    from utils import counts
+
+    class Orders:
+        name = "orders"
+        queries = 0
+
+        async def count_documents(self, filter):
+            self.queries += 1
+            return 7
+
+    monkeypatch.setattr(counts, "_counts", LRUCache(max_entries=2))
+    orders = Orders()
+
+    async def scenario():
+        for user in ("a", "b", "c", "c"):
+            assert await counts.estimated_count(orders, {"id_user": user}) == 7
+        await counts.invalidate_counts("orders")
+
+    run(scenario())
+    assert orders.queries == 3
+    assert counts._counts.evictions == 1
+    assert counts._counts.invalidations == 2
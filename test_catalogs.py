@@ -0,0 +1,50 @@
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from controllers import catalogs
+from routes.catalogs import router
+
+TYPE_ID = ObjectId()
+
+
+def build_client(monkeypatch, result):
+    pipelines = []
+
+    async def aggregate_list(collection, pipeline):
+        pipelines.append(pipeline)
+        return result
+
+    async def find(description):
+        return {"_id": TYPE_ID, "description": "vinyl"} if description == "vinyl" else None
+
+    monkeypatch.setattr(catalogs, "aggregate_list", aggregate_list)
+    async def descriptions():
+        return {TYPE_ID: "vinyl"}
+
+    monkeypatch.setattr(catalogs.catalog_types, "find", find)
+    monkeypatch.setattr(catalogs.catalog_types, "descriptions", descriptions)
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app), pipelines
+
+
+def test_catalogs_by_type_returns_page_and_total_in_one_aggregation(monkeypatch):
+    page = [{"id": str(ObjectId()), "id_catalog_type": str(TYPE_ID), "name": "Vinilo"}]
+    client, pipelines = build_client(monkeypatch, [{"data": page, "total": [{"count": 42}]}])
+
+    response = client.get("/catalogs/type/vinyl", params={"skip": 10, "limit": 5})
+
+    assert response.status_code == 200
+    assert page[0]["catalog_type_description"] == "vinyl"
+    assert response.json() == {"catalogs": page, "total": 42, "skip": 10, "limit": 5, "catalog_type": "vinyl"}
+    assert len(pipelines) == 1
+    assert pipelines[0][0] == {"$match": {"id_catalog_type": {"$in": [TYPE_ID]}, "active": True}}
+    assert "$facet" in pipelines[0][-1]
+
+
+def test_catalogs_by_unknown_type_is_not_found(monkeypatch):
+    client, pipelines = build_client(monkeypatch, [])
+
+    assert client.get("/catalogs/type/cassette").status_code == 404
+    assert pipelines == []
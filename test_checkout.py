@@ -0,0 +1,163 @@
+import asyncio
+import pytest
+from bson import ObjectId
+from datetime import datetime
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.mongodb import get_async_mongo_client, get_async_collection
+
+from controllers import order_details
+from controllers.orders import update_order_status
+from models.order_details import UpdateOrderDetail
+
+MARKER = f"test_checkout_{ObjectId()}"
+
+# El cliente asíncrono queda ligado al loop donde se usa por primera vez
+loop = asyncio.new_event_loop()
+
+
+def run(coro):
+    return loop.run_until_complete(coro)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def mongo():
+    async def check():
+        client = get_async_mongo_client()
+        await client.admin.command("ping")
+        hello = await client.admin.command("hello")
+        return "setName" in hello or hello.get("msg") == "isdbgrid"
+
+    try:
+        replica_set = run(check())
+    except Exception as e:
+        pytest.skip(f"MongoDB no disponible: {e}")
+    if not replica_set:
+        pytest.skip("Las transacciones requieren un replica set")
+
+    yield
+
+    async def cleanup():
+        order_ids = await get_async_collection("orders").distinct("_id", {"test_marker": MARKER})
+        await get_async_collection("order_status_record").delete_many({"id_order": {"$in": order_ids}})
+        for name in ("orders", "order_details", "inventory", "catalogs", "order_statuses"):
+            await get_async_collection(name).delete_many({"test_marker": MARKER})
+
+    run(cleanup())
+
+
+async def get_status(description):
+    statuses = get_async_collection("order_statuses")
+    status = await statuses.find_one({"description": description})
+    if status:
+        return status["_id"]
+    result = await statuses.insert_one({"description": description, "test_marker": MARKER})
+    return result.inserted_id
+
+
+async def seed_inventory(stock):
+    catalog = await get_async_collection("catalogs").insert_one({"name": "test", "active": True, "test_marker": MARKER})
+    item = await get_async_collection("inventory").insert_one({
+        "id_catalog": catalog.inserted_id,
+        "stock": stock,
+        "reserved_quantity": 0,
+        "sale_price": 10.0,
+        "active": True,
+        "test_marker": MARKER
+    })
+    return item.inserted_id, catalog.inserted_id
+
+
+async def seed_order(lines):
+    """lines: lista de (id_inventory, cantidad); la orden queda en progreso reservando stock"""
+    order = await get_async_collection("orders").insert_one({
+        "id_user": ObjectId(),
+        "date": datetime.utcnow(),
+        "current_status_id": await get_status("inprogress"),
+        "current_status": "inprogress",
+        "test_marker": MARKER
+    })
+    for inventory_id, quantity in lines:
+        await get_async_collection("order_details").insert_one({
+            "id_order": order.inserted_id,
+            "id_inventory": inventory_id,
+            "quantity": quantity,
+            "active": True,
+            "test_marker": MARKER
+        })
+        await get_async_collection("inventory").update_one({"_id": inventory_id}, {"$inc": {"reserved_quantity": quantity}})
+    return order.inserted_id
+
+
+def test_concurrent_checkouts_never_oversell():
+    async def scenario():
+        ordered_id = str(await get_status("ordered"))
+        inventory_id, catalog_id = await seed_inventory(5)
+        orders = [await seed_order([(inventory_id, 1)]) for _ in range(20)]
+
+        results = await asyncio.gather(*[
+            update_order_status(str(order_id), ordered_id, is_admin=True) for order_id in orders
+        ])
+
+        inventory = await get_async_collection("inventory").find_one({"_id": inventory_id})
+        catalog = await get_async_collection("catalogs").find_one({"_id": catalog_id})
+        ordered = await get_async_collection("orders").count_documents({"_id": {"$in": orders}, "current_status": "ordered"})
+        return results, inventory, catalog, ordered
+
+    results, inventory, catalog, ordered = run(scenario())
+
+    assert sum(1 for r in results if r["success"]) == 5, [r["message"] for r in results]
+    assert all("stock" in r["message"] for r in results if not r["success"])
+    assert inventory["stock"] == 0
+    assert inventory["reserved_quantity"] == 15, "Las órdenes rechazadas deben conservar su reserva"
+    assert catalog["active"] is False
+    assert ordered == 5
+
+
+def test_checkout_command_count_does_not_grow_with_lines(shared_command_counter):
+    counter = shared_command_counter
+
+    async def checkout(line_count):
+        ordered_id = str(await get_status("ordered"))
+        lines = [((await seed_inventory(10))[0], 2) for _ in range(line_count)]
+        order_id = await seed_order(lines)
+
+        counter.commands.clear()
+        result = await update_order_status(str(order_id), ordered_id, is_admin=True)
+        assert result["success"], result["message"]
+        return len(counter.commands)
+
+    one_line = run(checkout(1))
+    many_lines = run(checkout(25))
+
+    assert many_lines == one_line, f"1 línea: {one_line} comandos, 25 líneas: {many_lines} comandos"
+
+
+def test_line_edit_uses_order_status_from_its_transaction(monkeypatch):
+    async def scenario():
+        inventory_id, _ = await seed_inventory(10)
+        order_id = await seed_order([(inventory_id, 2)])
+        detail = await get_async_collection("order_details").find_one({"id_order": order_id})
+        ordered_id = await get_status("ordered")
+        find_one = order_details.orders_collection.find_one
+
+        # El checkout confirma justo después de que el controller leyó la orden en progreso
+        async def stale_find_one(*args, **kwargs):
+            order = await find_one(*args, **kwargs)
+            await get_async_collection("orders").update_one(
+                {"_id": order_id}, {"$set": {"current_status_id": ordered_id, "current_status": "ordered"}}
+            )
+            await get_async_collection("inventory").update_one({"_id": inventory_id}, {"$inc": {"reserved_quantity": -2}})
+            return order
+
+        monkeypatch.setattr(order_details.orders_collection, "find_one", stale_find_one)
+        result = await order_details.update_order_detail(str(order_id), str(detail["_id"]), UpdateOrderDetail(quantity=5), is_admin=True)
+        inventory = await get_async_collection("inventory").find_one({"_id": inventory_id})
+        return result, inventory
+
+    result, inventory = run(scenario())
+
+    assert result["success"], result["message"]
+    assert inventory["reserved_quantity"] == 0, "Una orden ya confirmada no reserva stock"
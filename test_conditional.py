@@ -0,0 +1,117 @@
+import asyncio
+from datetime import datetime
+from fastapi import Request, Response
+from utils.conditional import Validators, conditional_get, make_etag, probe_validators
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def make_request(**headers):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    })
+
+
+VALIDATORS = Validators(make_etag("catalog", "a", datetime(2025, 1, 1, 12, 0, 0, 500000)), datetime(2025, 1, 1, 12, 0, 0, 500000))
+
+
+def test_if_none_match_returns_304_without_loading():
+    loads = []
+
+    async def probe():
+        return VALIDATORS
+
+    async def load(validators):
+        loads.append(validators)
+        return {"id": "a"}
+
+    result = run(conditional_get(make_request(if_none_match=f'W/{VALIDATORS.etag}'), Response(), "catalogs", probe, load))
+
+    assert result.status_code == 304
+    assert result.headers["etag"] == VALIDATORS.etag
+    assert result.headers["last-modified"] == "Wed, 01 Jan 2025 12:00:00 GMT"
+    assert loads == []
+
+
+def test_stale_etag_loads_body_and_sets_headers():
+    response = Response()
+
+    async def probe():
+        return VALIDATORS
+
+    async def load(validators):
+        return {"id": "a", "version": validators.etag}
+
+    # If-None-Match tiene prioridad sobre If-Modified-Since
+    request = make_request(if_none_match='"old"', if_modified_since="Thu, 02 Jan 2025 00:00:00 GMT")
+    result = run(conditional_get(request, response, "catalogs", probe, load))
+
+    assert result == {"id": "a", "version": VALIDATORS.etag}
+    assert response.headers["etag"] == VALIDATORS.etag
+    assert response.headers["cache-control"] == "public, max-age=30"
+
+
+def test_if_modified_since_uses_second_precision():
+    async def probe():
+        return VALIDATORS
+
+    async def load(validators):
+        return {"id": "a"}
+
+    not_modified = run(conditional_get(make_request(if_modified_since="Wed, 01 Jan 2025 12:00:00 GMT"), Response(), "catalogs", probe, load))
+    modified = run(conditional_get(make_request(if_modified_since="Wed, 01 Jan 2025 11:59:59 GMT"), Response(), "catalogs", probe, load))
+
+    assert not_modified.status_code == 304
+    assert modified == {"id": "a"}
+
+
+def test_without_probe_etag_comes_from_body():
+    async def no_probe():
+        return None
+
+    async def load(validators):
+        return {"statuses": ["ordered"]}
+
+    response = Response()
+    run(conditional_get(make_request(), response, "order_statuses", no_probe, load))
+    etag = response.headers["etag"]
+
+    result = run(conditional_get(make_request(if_none_match=etag), Response(), "order_statuses", no_probe, load))
+    assert result.status_code == 304
+
+
+def test_probe_validators_ignores_unversioned_documents():
+    date = datetime(2025, 1, 1)
+    assert probe_validators([{"count": 2, "last_modified": date, "unversioned": 1}], "catalogs") is None
+
+    validators = probe_validators([{"count": 2, "last_modified": date, "unversioned": 0}], "catalogs", also_modified=(datetime(2025, 2, 1), None))
+    assert validators.last_modified == datetime(2025, 2, 1)
+    assert validators.etag != probe_validators([{"count": 3, "last_modified": date, "unversioned": 0}], "catalogs").etag
+
+    assert probe_validators([], "catalogs").last_modified is None
+
+
+def test_latest_version_probe_reads_two_index_edges():
+    from pipelines.version_pipelines import get_latest_version_pipeline
+
+    match = {"id_catalog_type": {"$in": []}}
+    pipeline = get_latest_version_pipeline("catalogs", match)
+    union = pipeline[4]["$unionWith"]
+
+    assert pipeline[:3] == [{"$match": match}, {"$sort": {"date_updated": -1}}, {"$limit": 1}]
+    assert union["coll"] == "catalogs"
+    assert union["pipeline"][:3] == [{"$match": match}, {"$sort": {"date_updated": 1}}, {"$limit": 1}]
+    assert "$group" in pipeline[-1]
+
+
+def test_probe_validators_uses_separate_count():
+    date = datetime(2025, 1, 1)
+    result = [{"last_modified": date, "unversioned": 0}]
+    assert probe_validators(result, "catalogs", count=2).etag == probe_validators(
+        [{"count": 2, "last_modified": date, "unversioned": 0}], "catalogs").etag
+    assert probe_validators(result, "catalogs", count=2).etag != probe_validators(result, "catalogs", count=3).etag
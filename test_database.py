@@ -1,5 +1,5 @@
 import pytest
-from utils.mongodb import get_mongo_client, t_connection, get_collection
+from utils.mongodb import get_mongo_client, t_connection, get_collection, get_async_collection
 import os
 from dotenv import load_dotenv
 
@@ -34,3 +34,38 @@ def test_get_collection():
         pytest.fail( f"Error en el llamado del cliente { str(e) } " )
 
 
+def test_get_async_collection():
+    try:
+        coll_users = get_async_collection("users")
+        assert coll_users is not None, "Error al obtener la collection asincrona de users"
+    except Exception as e:
+        pytest.fail( f"Error en el llamado del cliente asincrono { str(e) } " )
+
+
+def test_async_collection_is_lazy():
+    from utils import mongodb
+    mongodb._async_client = None
+    coll_users = get_async_collection("users")
+    # El handle no crea el cliente: los workers lo crean después del fork
+    assert mongodb._async_client is None
+    assert coll_users is get_async_collection("users")
+    assert coll_users.name == "users"
+
+
+def test_cart_writes_skip_the_transaction_on_a_standalone_mongod(monkeypatch):
+    import asyncio
+    from types import SimpleNamespace
+    from utils import mongodb
+
+    async def hello(name):
+        return {"isWritablePrimary": True}  # standalone: sin setName
+
+    client = SimpleNamespace(admin=SimpleNamespace(command=hello))
+    monkeypatch.setattr(mongodb, "get_async_mongo_client", lambda: client)
+    monkeypatch.setattr(mongodb, "_transactions_support", (None, False))
+
+    async def callback(session):
+        return session
+
+    assert asyncio.run(mongodb.run_transaction_if_supported(callback)) is None
+    assert mongodb._transactions_support == (client, False)
@@ -0,0 +1,100 @@
+import asyncio
+import httpx
+import pytest
+from utils import http_client
+from utils.http_client import CircuitBreaker, CircuitOpenError, sign_in_with_password
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_after_consecutive_failures_and_recovers():
+    clock = Clock()
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=10, clock=clock)
+
+    async def fail():
+        raise httpx.ConnectError("down")
+
+    async def ok():
+        return "ok"
+
+    for _ in range(2):
+        with pytest.raises(httpx.ConnectError):
+            run(breaker.call(fail))
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        run(breaker.call(ok))
+
+    clock.now = 10
+    assert breaker.state == "half-open"
+    assert run(breaker.call(ok)) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_failed_trial_reopens_the_circuit():
+    clock = Clock()
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 10
+
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # solo una llamada de prueba a la vez
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_cancelled_trial_does_not_keep_the_circuit_open():
+    clock = Clock()
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 10
+
+    async def hang():
+        await asyncio.sleep(60)
+
+    async def ok():
+        return "ok"
+
+    async def scenario():
+        with pytest.raises(TimeoutError):
+            async with asyncio.timeout(0.01):
+                await breaker.call(hang)
+        return await breaker.call(ok)
+
+    assert run(scenario()) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_sign_in_counts_only_server_errors(monkeypatch):
+    statuses = iter([400, 503])
+
+    def handler(request):
+        assert request.url.path == "/v1/accounts:signInWithPassword"
+        status = next(statuses)
+        return httpx.Response(status, json={"error": {"message": "INVALID_PASSWORD"}})
+
+    breaker = CircuitBreaker("identity-provider", failure_threshold=5)
+    monkeypatch.setattr(http_client, "identity_breaker", breaker)
+
+    async def scenario():
+        http_client.set_http_client(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        try:
+            rejected = await sign_in_with_password("user@example.com", "wrong")
+            with pytest.raises(httpx.HTTPStatusError):
+                await sign_in_with_password("user@example.com", "wrong")
+            return rejected
+        finally:
+            await http_client.close_http_client()
+
+    assert "error" in run(scenario())
+    assert breaker.failures == 1
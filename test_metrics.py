@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from utils import metrics
+
+
+def build_app():
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        if item_id == "missing":
+            raise HTTPException(status_code=404, detail="Not found")
+        return {"id": item_id}
+
+    return app
+
+
+def test_requests_are_labelled_by_route_template():
+    metrics.http_requests_total.reset()
+    metrics.http_request_duration_seconds.reset()
+    client = TestClient(build_app())
+
+    client.get("/items/a")
+    client.get("/items/b")
+    client.get("/items/missing")
+    client.get("/nowhere")
+
+    assert metrics.http_requests_total.value("GET", "/items/{item_id}", "200") == 2
+    assert metrics.http_requests_total.value("GET", "/items/{item_id}", "404") == 1
+    assert metrics.http_requests_total.value("GET", "unmatched", "404") == 1
+    assert metrics.http_request_duration_seconds.count("GET", "/items/{item_id}") == 3
+    assert metrics.http_requests_in_flight.value("GET") == 0
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_latency_seconds", "Prueba", ("op",), buckets=(0.1, 1))
+    metrics._registry.remove(histogram)
+    histogram.observe(0.05, "find")
+    histogram.observe(0.5, "find")
+    histogram.observe(3, "find")
+
+    lines = histogram.render()
+    assert 'test_latency_seconds_bucket{op="find",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{op="find",le="1"} 2' in lines
+    assert 'test_latency_seconds_bucket{op="find",le="+Inf"} 3' in lines
+    assert 'test_latency_seconds_count{op="find"} 3' in lines
+
+
+def test_mongo_commands_are_counted_per_collection():
+    metrics.mongodb_commands_total.reset()
+    listener = metrics.MongoCommandMetrics()
+
+    def command(name, body, request_id, duration_micros=1500):
+        listener.started(SimpleNamespace(command_name=name, command=body, request_id=request_id, connection_id=("h", 1)))
+        return SimpleNamespace(command_name=name, request_id=request_id, connection_id=("h", 1), duration_micros=duration_micros)
+
+    listener.succeeded(command("find", {"find": "catalogs"}, 1))
+    listener.succeeded(command("getMore", {"getMore": 123, "collection": "catalogs"}, 2))
+    listener.failed(command("aggregate", {"aggregate": "orders"}, 3))
+    listener.succeeded(command("ping", {"ping": 1}, 4))
+
+    assert metrics.mongodb_commands_total.value("catalogs", "find", "ok") == 1
+    assert metrics.mongodb_commands_total.value("catalogs", "getMore", "ok") == 1
+    assert metrics.mongodb_commands_total.value("orders", "aggregate", "error") == 1
+    assert metrics.mongodb_commands_total.value("-", "ping", "ok") == 1
+    assert 'mongodb_commands_total{collection="catalogs",command="find",outcome="ok"} 1' in metrics.render()
+
+
+def test_listeners_are_registered_with_the_client():
+    from utils import mongodb
+    kinds = {type(listener) for listener in mongodb._event_listeners}
+    assert {metrics.MongoCommandMetrics, metrics.MongoPoolMetrics} <= kinds
@@ -0,0 +1,41 @@
+from bson import ObjectId
+from utils.order_states import OrderStateMachine
+
+
+def build(*descriptions):
+    return OrderStateMachine([{"_id": ObjectId(), "description": d} for d in descriptions], version=1)
+
+
+def test_user_can_only_finalize_orders_in_progress():
+    machine = build("inprogress", "ordered", "shipped", "cancelled")
+
+    assert machine.check_transition("inprogress", machine.find("ordered"), is_admin=False) is None
+    assert machine.check_transition(None, machine.find("ordered"), is_admin=False) is None
+    assert machine.check_transition("inprogress", machine.find("shipped"), is_admin=False) is not None
+    assert machine.check_transition("ordered", machine.find("ordered"), is_admin=False) == "Solo puedes finalizar órdenes en progreso"
+
+
+def test_admin_follows_transition_table():
+    machine = build("inprogress", "ordered", "shipped", "delivered")
+
+    assert machine.check_transition("ordered", machine.find("shipped"), is_admin=True) is None
+    assert machine.check_transition("inprogress", machine.find("delivered"), is_admin=True) is not None
+    assert machine.check_transition("delivered", machine.find("ordered"), is_admin=True) is not None
+
+
+def test_statuses_outside_the_table_are_unrestricted_for_admins():
+    machine = build("inprogress", "ordered", "delivered", "returned")
+
+    assert machine.check_transition("delivered", machine.find("returned"), is_admin=True) is None
+    assert machine.check_transition("returned", machine.find("ordered"), is_admin=True) is None
+    assert machine.find("returned").restricted is False
+
+
+def test_effects_are_precomputed_per_status():
+    machine = build("inprogress", "ordered", "shipped")
+
+    assert machine.find("inprogress").reserve_stock
+    assert not machine.find("inprogress").requires_items
+    assert machine.find("ordered").decrement_stock and machine.find("ordered").requires_items
+    assert not machine.find("shipped").decrement_stock
+    assert machine.get(str(machine.find("ordered").id)) is machine.find("ordered")
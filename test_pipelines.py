@@ -0,0 +1,94 @@
+import pytest
+from pipelines.lint import lint_pipeline
+from pipelines.samples import SAMPLE_PIPELINES
+
+
+@pytest.mark.parametrize("sample", SAMPLE_PIPELINES, ids=lambda sample: f"{sample.collection}.{sample.name}")
+def test_sample_pipelines_pass_lint(sample):
+    issues = lint_pipeline(sample.build(), sample.name)
+    assert not issues, "\n".join(str(issue) for issue in issues)
+
+
+def test_lint_flags_lookup_before_limit():
+    pipeline = [
+        {"$lookup": {"from": "users", "localField": "id_user", "foreignField": "_id", "as": "user_info"}},
+        {"$sort": {"date": -1}},
+        {"$limit": 10}
+    ]
+    issues = lint_pipeline(pipeline)
+    assert [issue.rule for issue in issues] == ["lookup-before-limit"]
+    assert issues[0].path == "pipeline[0]"
+
+
+def test_lint_allows_lookup_after_limit():
+    pipeline = [
+        {"$sort": {"date": -1}},
+        {"$limit": 10},
+        {"$lookup": {"from": "users", "localField": "id_user", "foreignField": "_id", "as": "user_info"}}
+    ]
+    assert lint_pipeline(pipeline) == []
+
+
+def test_lint_checks_facet_sub_pipelines():
+    pipeline = [
+        {"$facet": {
+            "data": [
+                {"$lookup": {"from": "users", "localField": "id_user", "foreignField": "_id", "as": "user_info"}},
+                {"$limit": 10}
+            ],
+            "total": [{"$count": "count"}]
+        }}
+    ]
+    issues = lint_pipeline(pipeline)
+    assert [issue.path for issue in issues] == ["pipeline[0].$facet.data[0]"]
+
+
+def test_page_with_total_keeps_match_and_sort_outside_facet():
+    from pipelines.facet_pipelines import get_page_with_total_pipeline
+    from pipelines.order_pipelines import get_orders_by_user_pipeline
+
+    pipeline = get_page_with_total_pipeline(get_orders_by_user_pipeline("64e8a07d1234567890abcdef", 20, 10))
+
+    assert [next(iter(stage)) for stage in pipeline] == ["$match", "$sort", "$facet"]
+    data = pipeline[-1]["$facet"]["data"]
+    assert [next(iter(stage)) for stage in data][:3] == ["$skip", "$limit", "$lookup"]
+    assert pipeline[-1]["$facet"]["total"] == [{"$count": "count"}]
+    assert lint_pipeline(pipeline) == []
+
+
+def test_unpack_page_with_total():
+    from pipelines.facet_pipelines import unpack_page_with_total
+
+    assert unpack_page_with_total([{"data": [{"id": "a"}], "total": [{"count": 7}]}]) == ([{"id": "a"}], 7)
+    assert unpack_page_with_total([{"data": [], "total": []}]) == ([], 0)
+
+
+def test_skip_pages_break_date_ties_like_the_cursor():
+    from pipelines.order_pipelines import get_all_orders_pipeline, get_orders_by_user_pipeline, get_orders_keyset_pipeline
+
+    keyset_sort = get_orders_keyset_pipeline()[1]
+    assert keyset_sort == {"$sort": {"date": -1, "_id": -1}}
+    assert keyset_sort in get_all_orders_pipeline()
+    assert keyset_sort in get_orders_by_user_pipeline("64e8a07d1234567890abcdef")
+
+
+def test_index_usage_is_attributed_to_the_collection_that_owns_it():
+    from utils.indexes import collect_index_usage
+
+    explain = {"stages": [
+        {"$cursor": {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "description_unique"}}}}},
+        {"$lookup": {"from": "order_statuses"}, "indexesUsed": ["_id_"]},
+        {"$unionWith": {"coll": "token_revocations", "pipeline": [
+            {"$cursor": {"queryPlanner": {"winningPlan": {"stage": "IXSCAN", "indexName": "expires_at_ttl"}}}}
+        ]}},
+    ]}
+    eq_lookup = {"queryPlanner": {"winningPlan": {"queryPlan": {
+        "stage": "EQ_LOOKUP", "foreignCollection": "db.users", "strategy": "IndexedLoopJoin", "indexName": "_id_",
+        "inputStage": {"stage": "IXSCAN", "indexName": "id_user_date_id"}
+    }}}}
+
+    assert collect_index_usage(explain, "catalogtypes") == (
+        {("catalogtypes", "description_unique"), ("order_statuses", "_id_"), ("token_revocations", "expires_at_ttl")},
+        False
+    )
+    assert collect_index_usage(eq_lookup, "orders") == ({("users", "_id_"), ("orders", "id_user_date_id")}, False)
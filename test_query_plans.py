@@ -0,0 +1,277 @@
+"""
+Regresiones de planes de ejecución: cada pipeline de pipelines/samples.py
+se corre con explain("executionStats") sobre un dataset sembrado con los
+índices de utils/indexes.py, y debe:
+
+- no tener COLLSCAN (ni $lookup sin índice), y
+- examinar como máximo DOCS_PER_RESULT documentos por documento devuelto
+  (más DOCS_EXAMINED_SLACK), salvo los presupuestos de EXAMINED_BUDGETS.
+
+Necesita un mongod local: se usa TEST_MONGODB_URI si está definido, si no
+se levanta `mongod` (o MONGOD_BIN) en un directorio temporal. Sin ninguno
+de los dos las pruebas se saltean.
+"""
+import importlib
+import inspect
+import os
+import pkgutil
+import random
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+
+import pipelines
+from pipelines.samples import SAMPLE_PIPELINES, SAMPLE_ID, SAMPLE_OTHER_ID
+from utils.indexes import INDEXES, collect_plan_usage
+from utils.slow_queries import execution_stats
+
+DB_NAME = "query_plans_test"
+
+DOCS_PER_RESULT = 5
+DOCS_EXAMINED_SLACK = 10
+
+SAMPLE_OID = ObjectId(SAMPLE_ID)
+SAMPLE_OTHER_OID = ObjectId(SAMPLE_OTHER_ID)
+
+# Pipelines que leen la colección completa a propósito (clave: "colección.builder")
+FULL_SCAN_ALLOWED = {
+    "catalogs.search_catalogs_pipeline": "regex sin ancla e insensible a mayúsculas: ningún índice la resuelve",
+    "catalogtypes.get_catalog_type_pipeline": "lista todos los tipos con su cantidad de catálogos",
+    "order_statuses.get_all_order_statuses_pipeline": "tabla de referencia completa",
+    "artists.get_version_probe_pipeline": "el probe sin filtro cuenta toda la colección",
+    "order_statuses.get_version_probe_pipeline": "el probe sin filtro cuenta toda la colección",
+    "slow_aggregations.get_slow_aggregation_offenders_pipeline": "colección capped acotada, sin índices",
+}
+
+# Documentos que examina por diseño (además del presupuesto por resultado): las que
+# cuentan o agrupan todo lo que coincide con el filtro, o que ordenan después de un $in
+EXAMINED_BUDGETS = {
+    "catalogs.get_catalogs_by_type_pipeline":
+        lambda db: db.catalogs.count_documents({"id_catalog_type": {"$in": [SAMPLE_OID]}, "active": True}),
+    "catalogs.get_all_catalogs_with_types_pipeline":
+        lambda db: db.catalogs.count_documents({"id_catalog_type": {"$in": [SAMPLE_OID, SAMPLE_OTHER_OID]}}),
+    "catalogtypes.validate_type_is_assigned_pipeline":
+        lambda db: db.catalogs.count_documents({"id_catalog_type": SAMPLE_OID}),
+    "orders.get_page_with_total_pipeline":
+        lambda db: db.orders.count_documents({"id_user": SAMPLE_OID}),
+}
+
+
+def sample_key(sample) -> str:
+    return f"{sample.collection}.{sample.name}"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def mongo_client():
+    uri = os.getenv("TEST_MONGODB_URI")
+    process = None
+    dbpath = None
+
+    if not uri:
+        mongod = os.getenv("MONGOD_BIN") or shutil.which("mongod")
+        if not mongod:
+            pytest.skip("mongod no disponible (instalar mongod o definir TEST_MONGODB_URI)")
+        dbpath = tempfile.mkdtemp(prefix="query-plans-")
+        port = _free_port()
+        process = subprocess.Popen(
+            [mongod, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1",
+             "--nounixsocket", "--logpath", os.path.join(dbpath, "mongod.log")],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        uri = f"mongodb://127.0.0.1:{port}"
+
+    client = MongoClient(uri, serverSelectionTimeoutMS=1000)
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            client.admin.command("ping")
+            break
+        except Exception:
+            if time.monotonic() > deadline or (process and process.poll() is not None):
+                client.close()
+                if process:
+                    process.kill()
+                pytest.skip("no se pudo conectar al mongod de prueba")
+            time.sleep(0.2)
+
+    try:
+        yield client
+    finally:
+        client.drop_database(DB_NAME)
+        client.close()
+        if process:
+            process.terminate()
+            process.wait(timeout=30)
+            shutil.rmtree(dbpath, ignore_errors=True)
+
+
+def seed(db):
+    """Dataset determinístico con la forma y proporciones de producción; los SAMPLE_ID existen"""
+    rng = random.Random(42)
+    start = datetime(2023, 1, 1)
+
+    def some_date() -> datetime:
+        return start + timedelta(minutes=rng.randrange(3 * 365 * 24 * 60))
+
+    def ids(count: int, *fixed) -> list:
+        return list(fixed) + [ObjectId() for _ in range(count - len(fixed))]
+
+    user_ids = ids(500, SAMPLE_OID)
+    db.users.insert_many([
+        {"_id": _id, "name": f"User {i}", "lastname": "Test", "email": f"user{i}@example.com", "active": True}
+        for i, _id in enumerate(user_ids)
+    ])
+
+    type_ids = ids(12, SAMPLE_OID, SAMPLE_OTHER_OID)
+    db.catalogtypes.insert_many([
+        {"_id": _id, "description": f"type {i}", "active": True, "date_updated": some_date()}
+        for i, _id in enumerate(type_ids)
+    ])
+
+    catalog_ids = ids(3000, SAMPLE_OID, SAMPLE_OTHER_OID)
+    db.catalogs.insert_many([
+        {
+            "_id": _id,
+            "id_catalog_type": SAMPLE_OID if _id == SAMPLE_OID else rng.choice(type_ids),
+            "name": f"Vinilo {i}", "description": f"Edición {i}", "cost": rng.randint(10, 90), "discount": 0,
+            "active": _id == SAMPLE_OID or rng.random() < 0.9, "date_updated": some_date()
+        }
+        for i, _id in enumerate(catalog_ids)
+    ])
+
+    inventory_ids = ids(3000, SAMPLE_OID, SAMPLE_OTHER_OID)
+    db.inventory.insert_many([
+        {
+            "_id": _id, "id_catalog": SAMPLE_OID if _id == SAMPLE_OID else rng.choice(catalog_ids),
+            "stock": rng.randint(0, 40), "reserved_quantity": 0, "sale_price": rng.randint(10, 90),
+            "entry_date": some_date(), "active": _id in (SAMPLE_OID, SAMPLE_OTHER_OID) or rng.random() < 0.9
+        }
+        for _id in inventory_ids
+    ])
+
+    status_ids = ids(6, SAMPLE_OID)
+    db.order_statuses.insert_many([
+        {"_id": _id, "description": description, "active": True, "date_updated": some_date()}
+        for _id, description in zip(status_ids, ["ordered", "paid", "shipped", "delivered", "cancelled", "inprogress"])
+    ])
+
+    # El usuario de ejemplo tiene más órdenes que una página (50)
+    order_ids = ids(5000, SAMPLE_OID)
+    orders, details, records = [], [], []
+    for i, order_id in enumerate(order_ids):
+        orders.append({
+            "_id": order_id, "id_user": SAMPLE_OID if i < 60 else rng.choice(user_ids), "date": some_date(),
+            "payment_method": "card", "delivery_type": "home", "subtotal": 100, "taxes": 13, "discount": 0,
+            "total": 113, "current_status": rng.choice(["ordered", "paid", "shipped", "delivered", "cancelled"])
+        })
+        products = rng.sample(inventory_ids[2:], rng.randint(1, 4))
+        if order_id == SAMPLE_OID:
+            products[0] = SAMPLE_OTHER_OID
+        for j, product in enumerate(products):
+            details.append({
+                "_id": SAMPLE_OID if order_id == SAMPLE_OID and j == 0 else ObjectId(),
+                "id_order": order_id, "id_inventory": product, "id_catalog": rng.choice(catalog_ids),
+                "product_name": "Vinilo", "unit_price": 20, "quantity": rng.randint(1, 3),
+                "active": rng.random() < 0.95 or order_id == SAMPLE_OID, "date_created": some_date()
+            })
+        for _ in range(rng.randint(1, 3)):
+            records.append({"id_order": order_id, "id_status": rng.choice(status_ids), "date": some_date()})
+    db.orders.insert_many(orders)
+    db.order_details.insert_many(details)
+    db.order_status_record.insert_many(records)
+
+    review_ids = ids(4000, SAMPLE_OID)
+    db.reviews.insert_many([
+        {
+            "_id": _id, "id_user": rng.choice(user_ids),
+            "id_catalog": SAMPLE_OID if _id == SAMPLE_OID or i % 250 == 0 else rng.choice(catalog_ids),
+            "rating": rng.randint(1, 5), "comment": "ok", "active": _id == SAMPLE_OID or rng.random() < 0.9
+        }
+        for i, _id in enumerate(review_ids)
+    ])
+
+    db.artists.insert_many([{"name": f"Artist {i}", "active": True, "date_updated": some_date()} for i in range(200)])
+
+    db.create_collection("slow_aggregations", capped=True, size=1024 * 1024)
+    db.slow_aggregations.insert_many([
+        {"at": some_date(), "collection": "orders", "builder": rng.choice(["a", "b", "c"]), "slow_count": 1,
+         "total_ms": 250.0, "max_ms": 250.0, "plan": "COLLSCAN", "collscan": True}
+        for _ in range(300)
+    ])
+
+
+@pytest.fixture(scope="module")
+def db(mongo_client):
+    mongo_client.drop_database(DB_NAME)
+    database = mongo_client[DB_NAME]
+    for collection, models in INDEXES.items():
+        database[collection].create_indexes(models)
+    seed(database)
+    return database
+
+
+def explain(db, collection: str, pipeline: list) -> dict:
+    return db.command(
+        "explain",
+        {"aggregate": collection, "pipeline": pipeline, "cursor": {}},
+        verbosity="executionStats"
+    )
+
+
+@pytest.mark.parametrize("sample", SAMPLE_PIPELINES, ids=sample_key)
+def test_pipeline_uses_indexes(db, sample):
+    key = sample_key(sample)
+    if key in FULL_SCAN_ALLOWED:
+        pytest.skip(FULL_SCAN_ALLOWED[key])
+
+    pipeline = sample.build()
+    results = len(list(db[sample.collection].aggregate(pipeline)))
+    plan = explain(db, sample.collection, pipeline)
+    indexes, collscan = collect_plan_usage(plan)
+    stats = execution_stats(plan)
+
+    assert not collscan, f"{key} hace COLLSCAN (índices usados: {sorted(indexes) or '-'})"
+
+    budget = DOCS_PER_RESULT * max(results, 1) + DOCS_EXAMINED_SLACK
+    if key in EXAMINED_BUDGETS:
+        budget += EXAMINED_BUDGETS[key](db)
+    assert stats["docs_examined"] <= budget, (
+        f"{key} examinó {stats['docs_examined']} documentos para {results} resultados "
+        f"(máximo {budget}; índices: {sorted(indexes) or '-'})"
+    )
+
+
+def test_every_builder_has_a_sample():
+    """Un builder nuevo en pipelines/ tiene que agregarse a pipelines/samples.py"""
+    sampled = {sample.name for sample in SAMPLE_PIPELINES}
+    builders = set()
+    for info in pkgutil.iter_modules(pipelines.__path__):
+        if not info.name.endswith("_pipelines"):
+            continue
+        module = importlib.import_module(f"pipelines.{info.name}")
+        for name, func in inspect.getmembers(module, inspect.isfunction):
+            # Los builders están decorados con @pipeline_builder (pipelines/builder.py)
+            if hasattr(func, "__wrapped__") and func.__module__ == module.__name__:
+                builders.add(name)
+
+    assert len(builders) > 30
+    assert builders - sampled == set()
+
+
+def test_exceptions_refer_to_existing_samples():
+    keys = {sample_key(sample) for sample in SAMPLE_PIPELINES}
+    assert set(FULL_SCAN_ALLOWED) <= keys
+    assert set(EXAMINED_BUDGETS) <= keys
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from utils import request_cost
+from utils.metrics import MongoCommandMetrics
+
+listener = MongoCommandMetrics()
+
+
+def fake_command(collection: str, request_id: int, docs: int = 0):
+    """Simula un comando de pymongo pasando por el CommandListener de utils/metrics"""
+    listener.started(SimpleNamespace(command_name="find", command={"find": collection}, request_id=request_id, connection_id=("h", 1)))
+    listener.succeeded(SimpleNamespace(
+        command_name="find", request_id=request_id, connection_id=("h", 1), duration_micros=2000,
+        reply={"cursor": {"firstBatch": [{}] * docs}}
+    ))
+
+
+def build_app(threshold: int = 10):
+    app = FastAPI()
+    app.add_middleware(request_cost.RequestCostMiddleware, threshold=threshold)
+
+    @app.get("/details/{n}")
+    async def details(n: int):
+        fake_command("orders", 1, docs=1)
+
+        async def in_task():
+            fake_command("order_statuses", 2)
+
+        # Las tareas creadas desde el request heredan el contexto
+        await asyncio.create_task(in_task())
+        for i in range(n):
+            fake_command("inventory", 100 + i, docs=3)
+        return {"ok": True}
+
+    return app
+
+
+def test_server_timing_reports_db_cost():
+    response = TestClient(build_app()).get("/details/2")
+    timing = response.headers["server-timing"]
+    assert timing.startswith('db;dur=8.0;desc="4 cmds, 7 docs", app;dur=')
+
+
+def test_commands_outside_a_request_are_not_tracked():
+    assert request_cost.current() is None
+    fake_command("orders", 1)
+    assert request_cost.current() is None
+
+
+def test_n_plus_one_suspects_are_logged(caplog):
+    client = TestClient(build_app(threshold=3))
+    with caplog.at_level(logging.INFO, logger="utils.request_cost"):
+        client.get("/details/1")
+        client.get("/details/5")
+
+    warnings = [r.getMessage() for r in caplog.records if r.levelno == logging.WARNING]
+    assert len(warnings) == 1
+    assert "GET /details/{n} made 7 Mongo round trips" in warnings[0]
+    assert "find inventory x5" in warnings[0]
+    assert any("db_cmds=3" in r.getMessage() for r in caplog.records if r.levelno == logging.INFO)
+
+
+def test_returned_documents():
+    assert request_cost.returned_documents({"cursor": {"nextBatch": [{}, {}]}}) == 2
+    assert request_cost.returned_documents({"value": {"_id": 1}, "ok": 1}) == 1
+    assert request_cost.returned_documents({"value": None, "ok": 1}) == 0
+    assert request_cost.returned_documents({"n": 1, "ok": 1}) == 0
@@ -0,0 +1,69 @@
+import time
+import jwt
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+from utils import security
+from utils.security import AuthMiddleware, create_jwt_token, validateuser, verify_token
+
+
+@pytest.fixture(autouse=True)
+def secret_key(monkeypatch):
+    # Las pruebas no dependen de SECRET_KEY del entorno
+    monkeypatch.setattr(security, "SECRET_KEY", "test-secret")
+
+
+def make_token(**claims) -> str:
+    payload = {"id": "64e8a07d1234567890abcdef", "email": "user@example.com", "active": True, "admin": False, "exp": int(time.time()) + 60}
+    payload.update(claims)
+    return jwt.encode(payload, security.SECRET_KEY, algorithm="HS256")
+
+
+def test_verified_token_is_cached_until_exp(monkeypatch):
+    token = make_token()
+    assert verify_token(token) is verify_token(token)
+
+    now = time.time()
+    monkeypatch.setattr(security.time, "time", lambda: now + 120)
+    with pytest.raises(HTTPException) as error:
+        verify_token(token)
+    assert error.value.detail == "Expired token"
+
+
+def test_invalid_tokens_are_rejected():
+    with pytest.raises(HTTPException) as error:
+        verify_token(make_token() + "x")
+    assert error.value.status_code == 401
+
+    with pytest.raises(HTTPException) as error:
+        verify_token(make_token(email=None))
+    assert error.value.detail == "Token Invalid"
+
+
+def test_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(security, "AUTH_CACHE_MAX_ENTRIES", 2)
+    for i in range(5):
+        verify_token(make_token(id=str(i)))
+    assert len(security._verified_tokens) == 2
+
+
+def test_middleware_attaches_principal_for_decorators():
+    app = FastAPI()
+    app.add_middleware(AuthMiddleware)
+
+    @app.get("/me")
+    @validateuser
+    async def me(request: Request):
+        return {"id": request.state.id, "email": request.state.email}
+
+    @app.get("/public")
+    async def public():
+        return {"ok": True}
+
+    client = TestClient(app)
+    token = create_jwt_token("Ana", "Pérez", "ana@example.com", True, False, "abc")
+
+    assert client.get("/me", headers={"Authorization": f"Bearer {token}"}).json() == {"id": "abc", "email": "ana@example.com"}
+    assert client.get("/me").status_code == 400
+    assert client.get("/me", headers={"Authorization": "Basic abc"}).status_code == 400
+    assert client.get("/public", headers={"Authorization": "Bearer nope"}).json() == {"ok": True}
@@ -0,0 +1,27 @@
+import os
+import serve
+
+
+def test_pool_budget_is_split_between_workers():
+    assert serve.pool_sizes(1, budget=100) == (5, 100)
+    assert serve.pool_sizes(4, budget=100) == (5, 25)
+    # Nunca menos que el mínimo por worker aunque se pase del budget
+    assert serve.pool_sizes(32, budget=100) == (5, serve.MIN_POOL_PER_WORKER)
+
+
+def test_explicit_pool_size_is_respected(monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "7")
+    serve.configure_worker_env(8)
+    assert os.environ["MONGO_MAX_POOL_SIZE"] == "7"
+
+
+def test_workers_inherit_pool_size(monkeypatch):
+    # setenv antes de delenv: así monkeypatch registra las variables y deshace lo
+    # que configure_worker_env escribe en os.environ
+    for name in ("MONGO_MAX_POOL_SIZE", "MONGO_MIN_POOL_SIZE"):
+        monkeypatch.setenv(name, "unset")
+        monkeypatch.delenv(name)
+    serve.configure_worker_env(4)
+    min_pool, max_pool = serve.pool_sizes(4)
+    assert os.environ["MONGO_MIN_POOL_SIZE"] == str(min_pool)
+    assert os.environ["MONGO_MAX_POOL_SIZE"] == str(max_pool)
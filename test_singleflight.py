@@ -0,0 +1,128 @@
+import asyncio
+import pytest
+from bson import ObjectId
+from utils.singleflight import SingleFlight
+from utils import mongodb
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_calls_share_one_load():
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"id": "a"}
+
+    async def scenario():
+        flights = SingleFlight("catalogs")
+        results = await asyncio.gather(*(flights.do(("id", "a"), load) for _ in range(50)))
+        return flights, results
+
+    flights, results = run(scenario())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "followers": 49}
+
+
+def test_errors_are_shared_and_not_cached():
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def scenario():
+        flights = SingleFlight("catalogs")
+        first = await asyncio.gather(*(flights.do(("id", "a"), fail) for _ in range(5)), return_exceptions=True)
+        second = await asyncio.gather(flights.do(("id", "a"), fail), return_exceptions=True)
+        return first + second
+
+    results = run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(calls) == 2
+
+
+def test_timeout_applies_to_every_waiter():
+    async def hang():
+        await asyncio.sleep(10)
+
+    async def scenario():
+        flights = SingleFlight("catalogs", timeout=0.05)
+        return await asyncio.gather(*(flights.do(("id", "a"), hang) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, asyncio.TimeoutError) for result in run(scenario()))
+
+
+def test_forget_starts_a_new_flight():
+    calls = []
+
+    async def load():
+        calls.append(1)
+        call = len(calls)
+        await asyncio.sleep(0.01)
+        return call
+
+    async def scenario():
+        flights = SingleFlight("catalogs")
+        before = asyncio.ensure_future(flights.do(("id", "a"), load))
+        await asyncio.sleep(0)
+        flights.forget_prefix("id")
+        after = await flights.do(("id", "a"), load)
+        return await before, after
+
+    assert run(scenario()) == (1, 2)
+
+
+@pytest.fixture(scope="module")
+def mongo():
+    """Cliente compartido propio del módulo (el cliente asíncrono queda ligado a su loop)"""
+    loop = asyncio.new_event_loop()
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(mongodb, "_async_client", None)
+        try:
+            loop.run_until_complete(mongodb.get_async_mongo_client().admin.command("ping"))
+        except Exception as e:
+            loop.run_until_complete(mongodb.close_mongo_clients())
+            loop.close()
+            pytest.skip(f"MongoDB no disponible: {e}")
+
+        yield loop
+
+        loop.run_until_complete(mongodb.close_mongo_clients())
+    loop.close()
+
+
+def test_concurrent_review_reads_send_one_mongo_command(mongo, shared_command_counter):
+    from controllers.reviews import get_reviews_by_catalog_id
+
+    marker = f"test_singleflight_{ObjectId()}"
+    catalogs = mongodb.get_async_collection("catalogs")
+    reviews = mongodb.get_async_collection("reviews")
+
+    async def scenario():
+        catalog = await catalogs.insert_one({"name": "test", "active": True, "test_marker": marker})
+        await reviews.insert_many([
+            {"id_user": ObjectId(), "id_catalog": catalog.inserted_id, "comment": f"review {i}", "rating": 5,
+             "active": True, "test_marker": marker}
+            for i in range(3)
+        ])
+        try:
+            shared_command_counter.commands.clear()
+            results = await asyncio.gather(*(
+                get_reviews_by_catalog_id(str(catalog.inserted_id)) for _ in range(50)
+            ))
+            return results, list(shared_command_counter.commands)
+        finally:
+            await reviews.delete_many({"test_marker": marker})
+            await catalogs.delete_many({"test_marker": marker})
+
+    results, commands = mongo.run_until_complete(scenario())
+
+    assert commands == ["aggregate"]
+    assert len(results[0]) == 3
+    assert all(result == results[0] for result in results)
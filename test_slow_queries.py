@@ -0,0 +1,108 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from pipelines.builder import builder_name
+from pipelines.facet_pipelines import get_page_with_total_pipeline
+from pipelines.order_pipelines import get_orders_by_user_pipeline
+from utils import slow_queries
+
+SAMPLE_ID = "64e8a07d1234567890abcdef"
+
+COLLSCAN_EXPLAIN = {
+    "stages": [
+        {"$cursor": {
+            "queryPlanner": {"winningPlan": {"stage": "PROJECTION_SIMPLE", "inputStage": {"stage": "COLLSCAN"}}},
+            "executionStats": {"nReturned": 3, "totalKeysExamined": 0, "totalDocsExamined": 5000}
+        }},
+        {"$lookup": {"from": "users"}, "totalDocsExamined": 3, "indexesUsed": ["_id_"]}
+    ]
+}
+
+SBE_EXPLAIN = {
+    "queryPlanner": {"winningPlan": {"queryPlan": {
+        "stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "orders_user_date"}
+    }}},
+    "executionStats": {"nReturned": 50, "totalKeysExamined": 50, "totalDocsExamined": 50}
+}
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_pipelines_remember_their_builder():
+    inner = get_orders_by_user_pipeline(SAMPLE_ID, 0, 10)
+    wrapped = get_page_with_total_pipeline(inner)
+
+    assert builder_name(inner) == "get_orders_by_user_pipeline"
+    assert builder_name(wrapped) == "get_page_with_total_pipeline(get_orders_by_user_pipeline)"
+    assert isinstance(inner, list) and inner == list(inner)
+
+
+def test_explain_summaries():
+    assert slow_queries.winning_plan(COLLSCAN_EXPLAIN) == "PROJECTION_SIMPLE > COLLSCAN"
+    assert slow_queries.winning_plan(SBE_EXPLAIN) == "FETCH > IXSCAN(orders_user_date)"
+    assert slow_queries.execution_stats(SBE_EXPLAIN) == {"keys_examined": 50, "docs_examined": 50, "returned": 50}
+    assert slow_queries.execution_stats(COLLSCAN_EXPLAIN) == {"keys_examined": 0, "docs_examined": 5003, "returned": 3}
+
+
+class FakeCollection:
+    name = "orders"
+
+    def __init__(self, explain):
+        self.explains = 0
+
+        async def command(*args, **kwargs):
+            self.explains += 1
+            return explain
+
+        self.database = SimpleNamespace(command=command)
+
+
+@pytest.fixture
+def slow_log(tmp_path, monkeypatch):
+    path = tmp_path / "slow.jsonl"
+    monkeypatch.setattr(slow_queries, "SLOW_QUERY_LOG_FILE", str(path))
+    monkeypatch.setattr(slow_queries, "SLOW_AGGREGATION_MS", 100)
+    monkeypatch.setattr(slow_queries, "SLOW_EXPLAIN_SAMPLE_RATE", 1)
+    monkeypatch.setattr(slow_queries, "_pending", {})
+    monkeypatch.setattr(slow_queries, "_last_capture", {})
+    return path
+
+
+def test_slow_aggregations_are_captured_once_per_interval(slow_log):
+    collection = FakeCollection(COLLSCAN_EXPLAIN)
+    pipeline = get_orders_by_user_pipeline(SAMPLE_ID, 0, 10)
+
+    async def scenario():
+        slow_queries.observe(collection, pipeline, 0.05)   # rápida: se ignora
+        slow_queries.observe(collection, pipeline, 0.3)
+        slow_queries.observe(collection, pipeline, 0.5)    # dentro del intervalo: solo se cuenta
+        await asyncio.gather(*slow_queries._tasks)
+        return await slow_queries.top_offenders()
+
+    offenders = run(scenario())
+    assert collection.explains == 1
+    assert len(offenders) == 1
+    offender = offenders[0]
+    assert offender["builder"] == "get_orders_by_user_pipeline"
+    assert offender["collscan"] is True
+    assert offender["docs_examined"] == 5003
+    assert offender["plan"] == "PROJECTION_SIMPLE > COLLSCAN"
+    # La ejecución que no tuvo explain queda pendiente para la siguiente captura
+    assert offender["slow_count"] == 1
+    assert slow_queries._pending[("orders", "get_orders_by_user_pipeline")][0] == 1
+
+
+def test_offenders_are_ranked_by_total_slow_time():
+    now = slow_queries.datetime.utcnow()
+    records = [
+        {"at": now, "collection": "orders", "builder": "a", "slow_count": 10, "total_ms": 3000, "max_ms": 400},
+        {"at": now, "collection": "catalogs", "builder": "b", "slow_count": 1, "total_ms": 900, "max_ms": 900},
+        {"at": now, "collection": "orders", "builder": "a", "slow_count": 2, "total_ms": 600, "max_ms": 300},
+    ]
+    offenders = slow_queries.summarize(records, limit=10)
+    assert [o["builder"] for o in offenders] == ["a", "b"]
+    assert offenders[0]["slow_count"] == 12
+    assert offenders[0]["avg_ms"] == 300
+    assert offenders[0]["max_ms"] == 400
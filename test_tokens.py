@@ -0,0 +1,135 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from bson import ObjectId
+from fastapi import HTTPException
+from utils import security, tokens
+from utils.security import create_jwt_token, verify_token
+from utils.tokens import RevocationList, hash_token, revocations
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture(autouse=True)
+def secret_key(monkeypatch):
+    # Las pruebas no dependen de SECRET_KEY del entorno
+    monkeypatch.setattr(security, "SECRET_KEY", "test-secret")
+
+
+def matches(doc: dict, query: dict) -> bool:
+    for field, condition in query.items():
+        value = doc.get(field)
+        if isinstance(condition, dict):
+            if "$gt" in condition and not value > condition["$gt"]:
+                return False
+            if "$ne" in condition and value == condition["$ne"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class FakeCollection:
+    """Lo mínimo de una colección async que usa utils/tokens.py"""
+
+    def __init__(self, docs=None):
+        self.docs = list(docs or [])
+
+    async def insert_one(self, doc):
+        self.docs.append(dict(doc))
+
+    async def find_one(self, query, projection=None):
+        return next((dict(doc) for doc in self.docs if matches(doc, query)), None)
+
+    async def find_one_and_update(self, query, update):
+        for doc in self.docs:
+            if matches(doc, query):
+                before = dict(doc)
+                doc.update(update["$set"])
+                return before
+        return None
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs.append({**query, **update["$set"]})
+
+    async def delete_many(self, query):
+        self.docs = [doc for doc in self.docs if not matches(doc, query)]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    collections = {
+        "users": FakeCollection(),
+        "refresh_tokens": FakeCollection(),
+        "token_revocations": FakeCollection()
+    }
+    monkeypatch.setattr(tokens, "_collection", collections.__getitem__)
+    return collections
+
+
+def test_refresh_tokens_are_stored_hashed():
+    assert hash_token("abc") == hash_token("abc")
+    assert hash_token("abc") != "abc"
+    assert len(hash_token("abc")) == 64
+
+
+def test_revocation_list_accepts_ids_and_strings():
+    revoked = RevocationList()
+    session_id = ObjectId()
+    revoked.add(session_id)
+
+    assert session_id in revoked
+    assert str(session_id) in revoked
+    assert ObjectId() not in revoked
+    assert None not in revoked
+
+
+def test_revoked_session_rejects_cached_access_token():
+    session_id = ObjectId()
+    token = create_jwt_token("Ana", "Pérez", "ana@example.com", True, False, "abc", session_id)
+    assert verify_token(token)["sid"] == str(session_id)
+
+    revocations.add(session_id)
+    with pytest.raises(HTTPException) as error:
+        verify_token(token)
+    assert error.value.detail == "Revoked token"
+
+
+def test_refresh_uses_current_user_and_keeps_session_expiry(db):
+    user_id = ObjectId()
+    db["users"].docs.append({"_id": user_id, "name": "Ana", "lastname": "Pérez", "email": "ana@example.com",
+                             "active": True, "admin": True})
+    token, session_id = run(tokens.issue_refresh_token(user_id))
+    expires_at = db["refresh_tokens"].docs[0]["expires_at"]
+
+    # Le quitan admin después del login: el JWT renovado ya no lo lleva
+    db["users"].docs[0]["admin"] = False
+    user, new_token, same_session = run(tokens.rotate_refresh_token(token))
+
+    assert user["admin"] is False
+    assert same_session == session_id
+    assert db["refresh_tokens"].docs[-1]["expires_at"] == expires_at
+
+
+def test_refresh_rejects_inactive_user(db):
+    user_id = ObjectId()
+    db["users"].docs.append({"_id": user_id, "active": False, "admin": False})
+    token, session_id = run(tokens.issue_refresh_token(user_id))
+
+    with pytest.raises(HTTPException) as error:
+        run(tokens.rotate_refresh_token(token))
+
+    assert error.value.status_code == 401
+    assert session_id in revocations
+    assert db["refresh_tokens"].docs == []
+
+
+def test_refresh_fails_after_session_expiry(db):
+    user_id = ObjectId()
+    db["users"].docs.append({"_id": user_id, "active": True})
+    token, _ = run(tokens.issue_refresh_token(user_id, expires_at=datetime.utcnow() - timedelta(seconds=1)))
+
+    with pytest.raises(HTTPException):
+        run(tokens.rotate_refresh_token(token))
@@ -0,0 +1,9 @@
+"""
+Utilidades compartidas.
+
+El .env se carga aquí, una sola vez y antes que cualquier módulo de utils,
+porque varios leen variables de entorno al importarse.
+"""
+from dotenv import load_dotenv
+
+load_dotenv()
@@ -0,0 +1,159 @@
+"""
+Caché de respuestas con backend intercambiable.
+
+El backend por defecto es un LRU + TTL en memoria del proceso, con tamaño
+máximo CACHE_MAX_ENTRIES (default 1024) y TTL CACHE_TTL segundos (default 60).
+Para compartir el caché entre workers se puede registrar otro backend con
+set_cache_backend(); solo tiene que implementar los métodos de CacheBackend.
+
+Las claves se arman como "<namespace>:<parte>:<parte>" para poder invalidar
+por prefijo, por ejemplo todas las listas de catálogos ("catalogs:list:")
+sin tocar los catálogos individuales ("catalogs:id:<id>").
+
+Los misses concurrentes de una misma clave comparten una sola carga
+(utils/singleflight.py), así una clave caliente que expira no dispara una
+consulta por request.
+"""
+import os
+import time
+from collections import OrderedDict
+
+from utils.singleflight import SingleFlight
+
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))
+
+_MISSING = object()
+
+
+class CacheBackend:
+    """Interfaz de los backends; todos los métodos son async para permitir backends remotos"""
+
+    async def get(self, key: str):
+        """Devuelve el valor o None si no está (o expiró)"""
+        raise NotImplementedError
+
+    async def set(self, key: str, value, ttl: float):
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def delete_prefix(self, prefix: str):
+        raise NotImplementedError
+
+    async def stats(self) -> dict:
+        raise NotImplementedError
+
+
+class LRUCache(CacheBackend):
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # clave -> (expira, valor)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    async def get(self, key: str):
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    async def set(self, key: str, value, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str):
+        if self._entries.pop(key, _MISSING) is not _MISSING:
+            self.invalidations += 1
+
+    async def delete_prefix(self, prefix: str):
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+            self.invalidations += 1
+
+    async def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "lru",
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+class ResponseCache:
+    """Caché read-through de un namespace (p. ej. "catalogs") sobre el backend activo"""
+
+    def __init__(self, namespace: str, ttl: float = CACHE_TTL):
+        self.namespace = namespace
+        self.ttl = ttl
+        # Se incrementa en cada invalidación: un resultado cargado antes no se guarda
+        self._generation = 0
+        self._flights = SingleFlight(namespace)
+
+    def key(self, *parts) -> str:
+        return ":".join([self.namespace, *(str(part) for part in parts)])
+
+    async def get_or_load(self, parts: tuple, loader):
+        key = self.key(*parts)
+        value = await _backend.get(key)
+        if value is not None:
+            return value
+
+        async def load_and_store():
+            generation = self._generation
+            value = await loader()
+            if value is not None and generation == self._generation:
+                await _backend.set(key, value, self.ttl)
+            return value
+
+        return await self._flights.do(parts, load_and_store)
+
+    async def invalidate(self, *parts):
+        self._generation += 1
+        self._flights.forget(*parts)
+        await _backend.delete(self.key(*parts))
+
+    async def invalidate_prefix(self, *parts):
+        self._generation += 1
+        self._flights.forget_prefix(*parts)
+        await _backend.delete_prefix(self.key(*parts) + ":" if parts else self.namespace + ":")
+
+    def flight_stats(self) -> dict:
+        return self._flights.stats()
+
+
+_backend: CacheBackend = LRUCache()
+
+
+def set_cache_backend(backend: CacheBackend):
+    """Reemplaza el backend (llamar al arrancar, antes de atender requests)"""
+    global _backend
+    _backend = backend
+
+
+async def cache_stats() -> dict:
+    return await _backend.stats()
@@ -0,0 +1,129 @@
+"""
+GET condicional (ETag / Last-Modified) y Cache-Control por ruta.
+
+Cada endpoint pasa dos funciones a conditional_get():
+
+    probe(): consulta barata de versión (date_updated, conteo) que devuelve
+             Validators, o None si no se puede saber la versión sin cargar
+             el recurso (documentos antiguos sin date_updated, permisos).
+    load(validators): carga la respuesta completa.
+
+Si el probe coincide con If-None-Match (o, sin ese header, con
+If-Modified-Since) se responde 304 sin ejecutar load() ni serializar nada.
+Si no hay probe, el ETag sale de un hash del cuerpo: se ahorra el envío,
+no la consulta.
+
+Las políticas de Cache-Control se configuran con CACHE_CONTROL_<POLITICA>,
+por ejemplo CACHE_CONTROL_CATALOGS="public, max-age=120".
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import NamedTuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+CACHE_CONTROL_DEFAULTS = {
+    "catalogs": "public, max-age=30",
+    "artists": "public, max-age=60",
+    "order_statuses": "public, max-age=300",
+    "orders": "private, no-cache",
+}
+
+CACHE_CONTROL_POLICIES = {
+    policy: os.getenv(f"CACHE_CONTROL_{policy.upper()}", default)
+    for policy, default in CACHE_CONTROL_DEFAULTS.items()
+}
+
+
+class Validators(NamedTuple):
+    etag: str
+    last_modified: datetime | None = None
+
+
+def make_etag(*parts) -> str:
+    """ETag fuerte a partir de las partes que identifican la versión del recurso"""
+    digest = hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def body_etag(body) -> str:
+    return make_etag(json.dumps(jsonable_encoder(body), sort_keys=True, default=str))
+
+
+def probe_validators(result: list, *parts, also_modified: tuple = (), count: int | None = None) -> Validators | None:
+    """
+    Validators a partir del resultado de get_version_probe_pipeline (o de
+    get_latest_version_pipeline con el conteo en `count`).
+
+    Devuelve None si algún documento no tiene date_updated (su cambio no se
+    vería en el probe). also_modified agrega fechas de otras fuentes que
+    afectan la respuesta (p. ej. los tipos de catálogo).
+    """
+    probe = result[0] if result else {"count": 0, "last_modified": None, "unversioned": 0}
+    if count is not None:
+        probe = {**probe, "count": count}
+    if probe["unversioned"]:
+        return None
+    dates = [date for date in (probe["last_modified"], *also_modified) if date is not None]
+    return Validators(
+        make_etag(*parts, probe["count"], probe["last_modified"]),
+        max(dates) if dates else None
+    )
+
+
+def _as_utc(value: datetime) -> datetime:
+    # PyMongo devuelve datetimes naive en UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # Comparación débil (RFC 9110 13.1.2): W/"x" coincide con "x"
+    if header.strip() == "*":
+        return True
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return etag in [candidate[2:] if candidate.startswith("W/") else candidate for candidate in candidates]
+
+
+def is_not_modified(request: Request, validators: Validators) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Si viene If-None-Match se ignora If-Modified-Since
+        return _etag_matches(if_none_match, validators.etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and validators.last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return _as_utc(validators.last_modified) <= _as_utc(since)
+    return False
+
+
+def validator_headers(validators: Validators, policy: str) -> dict:
+    headers = {"ETag": validators.etag, "Cache-Control": CACHE_CONTROL_POLICIES[policy]}
+    if validators.last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(validators.last_modified), usegmt=True)
+    return headers
+
+
+async def conditional_get(request: Request, response: Response, policy: str, probe, load):
+    """Devuelve Response 304 si el cliente ya tiene la versión actual, o el cuerpo con ETag/Cache-Control"""
+    validators = await probe() if probe else None
+    if validators is not None and is_not_modified(request, validators):
+        return Response(status_code=304, headers=validator_headers(validators, policy))
+
+    body = await load(validators)
+    if validators is None:
+        validators = Validators(body_etag(body))
+        if is_not_modified(request, validators):
+            return Response(status_code=304, headers=validator_headers(validators, policy))
+
+    response.headers.update(validator_headers(validators, policy))
+    return body
@@ -0,0 +1,54 @@
+"""
+Conteos para la paginación.
+
+Los listados aceptan total=exact|estimated|none:
+
+    exact      total exacto, calculado en la misma agregación que la página ($facet)
+    estimated  conteo cacheado en memoria por COUNT_CACHE_TTL segundos (default 60);
+               sin filtro usa estimated_document_count (metadatos de la colección)
+    none       sin total; has_more se calcula pidiendo un documento de más
+
+El caché es un LRU por proceso (utils/cache.LRUCache) de hasta
+COUNT_CACHE_MAX_ENTRIES conteos (default 1024): los filtros por usuario no lo
+hacen crecer sin límite. Con varios workers cada uno tiene su propia copia.
+"""
+import os
+
+from bson import json_util
+
+from utils.cache import LRUCache
+
+TOTAL_MODES = ("exact", "estimated", "none")
+
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "60"))
+COUNT_CACHE_MAX_ENTRIES = int(os.getenv("COUNT_CACHE_MAX_ENTRIES", "1024"))
+
+# "<colección>:<filtro serializado>" -> conteo
+_counts = LRUCache(COUNT_CACHE_MAX_ENTRIES)
+
+
+def _cache_key(collection, filter: dict | None) -> str:
+    return f"{collection.name}:{json_util.dumps(filter or {}, sort_keys=True)}"
+
+
+async def estimated_count(collection, filter: dict | None = None, ttl: float | None = None) -> int:
+    """Conteo de documentos que puede tener hasta ttl segundos de antigüedad"""
+    ttl = COUNT_CACHE_TTL if ttl is None else ttl
+    key = _cache_key(collection, filter)
+
+    cached = await _counts.get(key)
+    if cached is not None:
+        return cached
+
+    if filter:
+        count = await collection.count_documents(filter)
+    else:
+        count = await collection.estimated_document_count()
+
+    await _counts.set(key, count, ttl)
+    return count
+
+
+async def invalidate_counts(collection_name: str | None = None):
+    """Descarta los conteos cacheados de una colección (o de todas)"""
+    await _counts.delete_prefix(f"{collection_name}:" if collection_name else "")
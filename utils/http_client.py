@@ -0,0 +1,139 @@
+"""
+Cliente HTTP asíncrono compartido para servicios externos.
+
+Un solo httpx.AsyncClient por proceso con pool de conexiones keep-alive, así
+cada login no abre una conexión TLS nueva ni bloquea el event loop.
+
+Variables de entorno:
+
+    HTTP_TIMEOUT                 timeout total por request en segundos (default 10)
+    HTTP_CONNECT_TIMEOUT         timeout de conexión (default 3)
+    HTTP_MAX_CONNECTIONS         conexiones simultáneas del pool (default 100)
+    HTTP_MAX_KEEPALIVE           conexiones ociosas que se conservan (default 20)
+    IDENTITY_PROVIDER_URL        base de la API de Firebase Auth; se puede apuntar
+                                 a un servidor local en pruebas de carga
+    IDENTITY_BREAKER_FAILURES    fallos seguidos que abren el circuito (default 5)
+    IDENTITY_BREAKER_RESET       segundos con el circuito abierto (default 30)
+
+El circuit breaker cuenta como fallo los errores de red, los timeouts y las
+respuestas 5xx; un 4xx (contraseña incorrecta) es una respuesta válida.
+"""
+import os
+import time
+
+import httpx
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+
+IDENTITY_PROVIDER_URL = os.getenv("IDENTITY_PROVIDER_URL", "https://identitytoolkit.googleapis.com").rstrip("/")
+
+_http_client = None
+
+
+class CircuitOpenError(Exception):
+    """El servicio externo falló varias veces seguidas y no se está llamando"""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        state = self.state
+        if state == "open" or (state == "half-open" and self._trial_in_flight):
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        if state == "half-open":
+            # Una sola llamada de prueba mientras el circuito está semiabierto
+            self._trial_in_flight = True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+
+    async def call(self, fn):
+        """Ejecuta fn() si el circuito lo permite; fn debe lanzar excepción para contar como fallo"""
+        self.before_call()
+        try:
+            result = await fn()
+        except Exception:
+            self.record_failure()
+            raise
+        finally:
+            # Una llamada cancelada (cliente desconectado, timeout, shutdown) no es un
+            # fallo del servicio, pero debe liberar el lugar de la llamada de prueba
+            self._trial_in_flight = False
+        self.record_success()
+        return result
+
+
+identity_breaker = CircuitBreaker(
+    "identity-provider",
+    failure_threshold=int(os.getenv("IDENTITY_BREAKER_FAILURES", "5")),
+    reset_timeout=float(os.getenv("IDENTITY_BREAKER_RESET", "30"))
+)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE)
+        )
+    return _http_client
+
+
+def set_http_client(client: httpx.AsyncClient):
+    """Reemplaza el cliente compartido (p. ej. con un transport de pruebas)"""
+    global _http_client
+    _http_client = client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def sign_in_with_password(email: str, password: str) -> dict:
+    """
+    accounts:signInWithPassword de Firebase Auth. Devuelve el JSON de la
+    respuesta (con "error" si las credenciales no son válidas). Lanza
+    CircuitOpenError o httpx.HTTPError si el servicio no está disponible.
+    """
+    async def post():
+        response = await get_http_client().post(
+            f"{IDENTITY_PROVIDER_URL}/v1/accounts:signInWithPassword",
+            params={"key": os.getenv("FIREBASE_API_KEY")},
+            json={"email": email, "password": password, "returnSecureToken": True}
+        )
+        if response.status_code >= 500:
+            response.raise_for_status()
+        return response.json()
+
+    return await identity_breaker.call(post)
@@ -0,0 +1,279 @@
+"""
+Registro declarativo de índices por colección.
+
+Cada colección declara aquí los índices que necesitan sus consultas. Al
+arrancar la app se crean o se verifican según MONGO_INDEXES:
+
+    MONGO_INDEXES=create   crea los que falten
+    MONGO_INDEXES=verify   solo registra en el log los que faltan (default)
+    MONGO_INDEXES=off      no hace nada
+
+También se puede usar desde la línea de comandos:
+
+    python -m utils.indexes create
+    python -m utils.indexes verify
+    python -m utils.indexes report   # qué índices usan las pipelines de pipelines/
+"""
+import argparse
+import asyncio
+import logging
+import os
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from utils.mongodb import get_async_collection, get_async_mongo_client, DB
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_ONLY = {"active": True}
+
+INDEXES = {
+    "orders": [
+        # _id como desempate: sirve al orden (date, _id) de la paginación por skip y por cursor
+        IndexModel([("id_user", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], name="id_user_date_id"),
+        IndexModel([("date", DESCENDING), ("_id", DESCENDING)], name="date_id"),
+        # Una sola orden en progreso por usuario; también resuelve el carrito con un find_one
+        IndexModel(
+            [("id_user", ASCENDING)],
+            name="id_user_inprogress_unique",
+            unique=True,
+            partialFilterExpression={"current_status": "inprogress"},
+        ),
+    ],
+    "order_details": [
+        IndexModel([("id_order", ASCENDING), ("active", ASCENDING)], name="id_order_active"),
+        IndexModel(
+            [("id_order", ASCENDING), ("id_inventory", ASCENDING)],
+            name="id_order_id_inventory_active_unique",
+            unique=True,
+            partialFilterExpression=ACTIVE_ONLY,
+        ),
+        IndexModel([("id_inventory", ASCENDING)], name="id_inventory_active", partialFilterExpression=ACTIVE_ONLY),
+    ],
+    "order_status_record": [
+        IndexModel([("id_order", ASCENDING), ("date", DESCENDING)], name="id_order_date"),
+    ],
+    "reviews": [
+        IndexModel([("id_catalog", ASCENDING)], name="id_catalog_active", partialFilterExpression=ACTIVE_ONLY),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "inventory": [
+        IndexModel([("entry_date", DESCENDING)], name="entry_date_active", partialFilterExpression=ACTIVE_ONLY),
+    ],
+    "catalogs": [
+        IndexModel([("id_catalog_type", ASCENDING), ("active", ASCENDING)], name="id_catalog_type_active"),
+        # Probe de versión de GET /catalogs: date_updated más reciente por tipo sin recorrer los catálogos
+        IndexModel([("id_catalog_type", ASCENDING), ("date_updated", DESCENDING)], name="id_catalog_type_date_updated"),
+    ],
+    "catalogtypes": [
+        IndexModel([("description", ASCENDING)], name="description_unique", unique=True),
+    ],
+    "order_statuses": [
+        IndexModel([("description", ASCENDING)], name="description_unique", unique=True),
+    ],
+    "refresh_tokens": [
+        IndexModel([("token_hash", ASCENDING)], name="token_hash_unique", unique=True),
+        IndexModel([("family", ASCENDING)], name="family"),
+        # Mongo borra los refresh tokens vencidos
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "token_revocations": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+# Opciones que se comparan al verificar un índice existente
+_COMPARED_OPTIONS = ("unique", "partialFilterExpression", "expireAfterSeconds")
+
+
+def _index_spec(model: IndexModel) -> dict:
+    spec = dict(model.document)
+    spec["key"] = list(spec["key"].items())
+    return spec
+
+
+def _differences(expected: dict, existing: dict) -> list:
+    diffs = []
+    if list(existing.get("key", [])) != expected["key"]:
+        diffs.append(f"key {existing.get('key')} != {expected['key']}")
+    for option in _COMPARED_OPTIONS:
+        if existing.get(option) != expected.get(option):
+            diffs.append(f"{option} {existing.get(option)!r} != {expected.get(option)!r}")
+    return diffs
+
+
+async def verify_indexes() -> list:
+    """Devuelve una lista de problemas (índices que faltan o que no coinciden)"""
+    problems = []
+    for collection, models in INDEXES.items():
+        existing = await get_async_collection(collection).index_information()
+        for model in models:
+            expected = _index_spec(model)
+            name = expected["name"]
+            if name not in existing:
+                problems.append(f"{collection}.{name}: missing")
+                continue
+            for diff in _differences(expected, existing[name]):
+                problems.append(f"{collection}.{name}: {diff}")
+    return problems
+
+
+async def create_indexes() -> list:
+    """Crea los índices del registro; devuelve los que no se pudieron crear"""
+    failures = []
+    for collection, models in INDEXES.items():
+        coll = get_async_collection(collection)
+        # Uno por uno para que un conflicto no impida crear el resto
+        for model in models:
+            name = model.document["name"]
+            try:
+                await coll.create_indexes([model])
+            except OperationFailure as e:
+                failures.append(f"{collection}.{name}: {e}")
+    return failures
+
+
+async def check_indexes_on_startup():
+    mode = os.getenv("MONGO_INDEXES", "verify").lower()
+    if mode == "off":
+        return
+
+    try:
+        if mode == "create":
+            for failure in await create_indexes():
+                logger.error(f"Could not create index {failure}")
+        for problem in await verify_indexes():
+            logger.warning(f"Index check: {problem}")
+    except Exception as e:
+        logger.error(f"Index check failed: {e}")
+
+
+# ============================================================================
+# REPORTE DE USO DE ÍNDICES POR LAS PIPELINES
+# ============================================================================
+
+# Ramas del explain que no corresponden al plan ganador
+_IGNORED_EXPLAIN_KEYS = {"rejectedPlans", "allPlansExecution"}
+
+
+def collect_plan_usage(explain: dict) -> tuple[set, bool]:
+    """Recorre un explain y devuelve (nombres de índices usados, hubo COLLSCAN)"""
+    used, collscan = collect_index_usage(explain, None)
+    return {name for _, name in used}, collscan
+
+
+def collect_index_usage(explain: dict, collection: str | None) -> tuple[set, bool]:
+    """
+    Como collect_plan_usage pero con la colección de cada índice:
+    {(colección, índice)}. Los índices de un $lookup (o EQ_LOOKUP con SBE) se
+    atribuyen a su colección `from` y los de un $unionWith a su `coll`; el
+    resto, a `collection` (la de la pipeline).
+    """
+    used = set()
+    collscan = False
+
+    def walk(node, current):
+        nonlocal collscan
+        if isinstance(node, dict):
+            if node.get("stage") == "COLLSCAN":
+                collscan = True
+            if node.get("collectionScans"):
+                collscan = True
+
+            # Etapa $lookup del explain: sus índices son de la colección foránea (MongoDB 5.0+)
+            lookup = node.get("$lookup")
+            stage_collection = lookup.get("from", current) if isinstance(lookup, dict) else current
+            for name in node.get("indexesUsed", []):
+                used.add((stage_collection, name))
+
+            if node.get("stage") == "EQ_LOOKUP":
+                # Con SBE el $lookup es una etapa EQ_LOOKUP; sin índice recorre la colección foránea
+                if node.get("strategy") in ("HashJoin", "NestedLoopJoin"):
+                    collscan = True
+                foreign = node.get("foreignCollection", "").split(".", 1)[-1] or current
+                if "indexName" in node:
+                    used.add((foreign, node["indexName"]))
+            elif "indexName" in node:
+                used.add((current, node["indexName"]))
+
+            for key, value in node.items():
+                if key in _IGNORED_EXPLAIN_KEYS:
+                    continue
+                if key == "$lookup":
+                    walk(value, stage_collection)
+                elif key == "$unionWith" and isinstance(value, dict):
+                    walk(value, value.get("coll", current))
+                else:
+                    walk(value, current)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item, current)
+
+    walk(explain, collection)
+    return used, collscan
+
+
+async def explain_pipeline(collection: str, pipeline: list, verbosity: str = "executionStats") -> dict:
+    db = get_async_mongo_client()[DB]
+    return await db.command(
+        "explain",
+        {"aggregate": collection, "pipeline": pipeline, "cursor": {}},
+        verbosity=verbosity,
+    )
+
+
+async def report(verbosity: str = "executionStats"):
+    from pipelines.samples import SAMPLE_PIPELINES
+
+    used_by = {(collection, model.document["name"]): [] for collection, models in INDEXES.items() for model in models}
+
+    print("Pipelines:")
+    for sample in SAMPLE_PIPELINES:
+        try:
+            explain = await explain_pipeline(sample.collection, sample.build(), verbosity)
+        except Exception as e:
+            print(f"  {sample.name} ({sample.collection}): explain failed: {e}")
+            continue
+
+        used, collscan = collect_index_usage(explain, sample.collection)
+        flags = " COLLSCAN" if collscan else ""
+        names = sorted(name if collection == sample.collection else f"{collection}.{name}" for collection, name in used)
+        print(f"  {sample.name} ({sample.collection}): {', '.join(names) or '-'}{flags}")
+
+        # Solo se acredita el índice de la colección que la pipeline tocó realmente
+        for key in used:
+            if key in used_by:
+                used_by[key].append(sample.name)
+
+    print("\nRegistered indexes:")
+    for (collection, name), builders in used_by.items():
+        print(f"  {collection}.{name}: {', '.join(sorted(set(builders))) or 'UNUSED'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the MongoDB index registry")
+    parser.add_argument("command", choices=["create", "verify", "report"])
+    parser.add_argument("--verbosity", default="executionStats", choices=["queryPlanner", "executionStats"])
+    args = parser.parse_args()
+
+    if args.command == "create":
+        failures = asyncio.run(create_indexes())
+        for failure in failures:
+            print(f"FAILED {failure}")
+        raise SystemExit(1 if failures else 0)
+
+    if args.command == "verify":
+        problems = asyncio.run(verify_indexes())
+        for problem in problems:
+            print(problem)
+        print("OK" if not problems else f"{len(problems)} problem(s)")
+        raise SystemExit(1 if problems else 0)
+
+    asyncio.run(report(args.verbosity))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Métricas en formato de texto de Prometheus, en memoria del proceso.
+
+Sin agente ni dependencias externas: los contadores e histogramas viven en
+este módulo y GET /metrics los serializa (render()).
+
+- HTTP (MetricsMiddleware): latencia por ruta, requests en curso y
+  requests por código de estado. La ruta es la plantilla de FastAPI
+  (/catalogs/{catalog_id}), no el path, para no crear una serie por id.
+- MongoDB (MongoCommandMetrics): comandos y latencia por colección y
+  operación, desde un CommandListener de pymongo. El mismo listener suma el
+  costo de cada request (utils/request_cost.py).
+- Pool de conexiones (MongoPoolMetrics): espera para obtener una conexión
+  del pool y conexiones abiertas/en uso, desde un ConnectionPoolListener.
+
+Ambos listeners se registran en utils/mongodb.py antes de crear el cliente.
+
+Las métricas son por proceso: con varios workers (serve.py) cada scrape
+llega a uno de ellos y devuelve solo sus números.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from pymongo import monitoring
+
+from utils import request_cost
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+
+_registry = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = HTTP_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # [conteo por bucket (no acumulado, el último es +Inf), suma, cantidad]
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, *labels) -> int:
+        state = self._values.get(labels)
+        return state[2] if state else 0
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((labels, ([*state[0]], state[1], state[2])) for labels, state in self._values.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                le = _format_labels(self.labelnames, labels, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+def render() -> str:
+    """Todas las métricas registradas en formato de texto de Prometheus"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# HTTP
+http_requests_total = Counter(
+    "http_requests_total", "Requests HTTP terminados", ("method", "route", "status"))
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds", "Latencia de los requests HTTP", ("method", "route"))
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight", "Requests HTTP en curso", ("method",))
+
+# MongoDB
+mongodb_commands_total = Counter(
+    "mongodb_commands_total", "Comandos enviados a MongoDB", ("collection", "command", "outcome"))
+mongodb_command_duration_seconds = Histogram(
+    "mongodb_command_duration_seconds", "Latencia de los comandos de MongoDB", ("collection", "command"),
+    buckets=MONGO_BUCKETS)
+mongodb_pool_checkout_seconds = Histogram(
+    "mongodb_pool_checkout_seconds", "Espera para obtener una conexión del pool", ("outcome",),
+    buckets=MONGO_BUCKETS)
+mongodb_pool_connections = Gauge(
+    "mongodb_pool_connections", "Conexiones abiertas del pool", ("address",))
+mongodb_pool_checked_out = Gauge(
+    "mongodb_pool_checked_out", "Conexiones del pool en uso", ("address",))
+
+process_start_time_seconds = Gauge(
+    "process_start_time_seconds", "Inicio del proceso (epoch en segundos)")
+process_start_time_seconds.set(time.time())
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que mide cada request HTTP (ver métricas http_* arriba)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_flight.dec(method)
+            # El router de FastAPI deja la ruta encontrada en el scope
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_request_duration_seconds.observe(elapsed, method, route)
+            http_requests_total.inc(method, route, str(status))
+
+
+def _command_collection(event: monitoring.CommandStartedEvent) -> str:
+    if event.command_name == "getMore":
+        return event.command.get("collection", "-")
+    target = event.command.get(event.command_name)
+    return target if isinstance(target, str) else "-"
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Cuenta y mide los comandos de MongoDB por colección y operación"""
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        self._collections[(event.request_id, event.connection_id)] = _command_collection(event)
+
+    def _finished(self, event, outcome: str):
+        collection = self._collections.pop((event.request_id, event.connection_id), "-")
+        duration = event.duration_micros / 1e6
+        mongodb_commands_total.inc(collection, event.command_name, outcome)
+        mongodb_command_duration_seconds.observe(duration, collection, event.command_name)
+
+        # Costo del request en curso (Server-Timing, ver utils/request_cost.py)
+        cost = request_cost.current()
+        if cost is not None:
+            cost.record(collection, event.command_name, duration, getattr(event, "reply", None))
+
+    def succeeded(self, event):
+        self._finished(event, "ok")
+
+    def failed(self, event):
+        self._finished(event, "error")
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Espera de checkout y conexiones abiertas/en uso del pool de MongoDB"""
+
+    def connection_checked_out(self, event):
+        mongodb_pool_checkout_seconds.observe(event.duration, "ok")
+        mongodb_pool_checked_out.inc(_address(event))
+
+    def connection_check_out_failed(self, event):
+        mongodb_pool_checkout_seconds.observe(event.duration, "error")
+
+    def connection_checked_in(self, event):
+        mongodb_pool_checked_out.dec(_address(event))
+
+    def connection_created(self, event):
+        mongodb_pool_connections.inc(_address(event))
+
+    def connection_closed(self, event):
+        mongodb_pool_connections.dec(_address(event))
+
+    def pool_closed(self, event):
+        mongodb_pool_connections.set(0, _address(event))
+        mongodb_pool_checked_out.set(0, _address(event))
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+
+def _address(event) -> str:
+    host, port = event.address
+    return f"{host}:{port}"
@@ -1,40 +1,176 @@
+"""
+Clientes de MongoDB (sync para scripts, async para los controllers).
+
+Nada se conecta al importar: los clientes se crean en el primer uso y
+get_async_collection() devuelve un handle perezoso, así los controllers
+pueden declarar sus colecciones a nivel de módulo sin crear el cliente antes
+de que uvicorn/gunicorn hagan fork de los workers. En la app el cliente
+asíncrono se crea en el lifespan de cada worker (ver main.py), que además
+precalienta el pool (warm_up_pool) y lo cierra al apagar (close_mongo_clients).
+
+    MONGO_MIN_POOL_SIZE   conexiones que el pool mantiene abiertas (default 5)
+    MONGO_MAX_POOL_SIZE   máximo de conexiones por servidor (default 100)
+    MONGO_TLS             "false" para un mongod local sin TLS (default true)
+"""
+import asyncio
 import os
-from dotenv import load_dotenv
-from pymongo import MongoClient
+import time
+from pymongo import MongoClient, AsyncMongoClient
 from pymongo.server_api import ServerApi
-
-load_dotenv()
+from utils.metrics import MongoCommandMetrics, MongoPoolMetrics
+from utils import slow_queries
 
 # Try both variable names for compatibility
 DB = os.getenv("DATABASE_NAME") or os.getenv("MONGO_DB_NAME")
 URI = os.getenv("MONGODB_URI") or os.getenv("URI")
 
-# Validate that we have the required environment variables
-if not DB:
-    raise ValueError("Database name not found. Set DATABASE_NAME or MONGO_DB_NAME environment variable")
-if not URI:
-    raise ValueError("MongoDB URI not found. Set MONGODB_URI or URI environment variable")
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_TLS = os.getenv("MONGO_TLS", "true").lower() != "false"
 
 
 _client = None
+_async_client = None
+# Métricas de comandos y del pool para GET /metrics (ver utils/metrics.py)
+_event_listeners = [MongoCommandMetrics(), MongoPoolMetrics()]
+_async_collections = {}
+
+def _check_settings():
+    # Validate that we have the required environment variables
+    if not DB:
+        raise ValueError("Database name not found. Set DATABASE_NAME or MONGO_DB_NAME environment variable")
+    if not URI:
+        raise ValueError("MongoDB URI not found. Set MONGODB_URI or URI environment variable")
+
+def _tls_options() -> dict:
+    if not MONGO_TLS:
+        return {"tls": False}
+    return {"tls": True, "tlsAllowInvalidCertificates": True}
+
+def register_event_listener(listener):
+    """Registra un listener de pymongo.monitoring; debe llamarse antes de crear el cliente asíncrono"""
+    if _async_client is not None:
+        raise RuntimeError("Event listeners must be registered before the async client is created")
+    _event_listeners.append(listener)
 
 def get_mongo_client():
     global _client
     if _client is None:
+        _check_settings()
         _client = MongoClient(
             URI,
             server_api=ServerApi("1"),
-            tls=True,
-            tlsAllowInvalidCertificates=True,
+            **_tls_options(),
             serverSelectionTimeoutMS=5000  # Timeout más corto
         )
     return _client
 
+def get_async_mongo_client():
+    """Cliente asíncrono para usar dentro de los controllers (no bloquea el event loop)"""
+    global _async_client
+    if _async_client is None:
+        _check_settings()
+        _async_client = AsyncMongoClient(
+            URI,
+            server_api=ServerApi("1"),
+            **_tls_options(),
+            serverSelectionTimeoutMS=5000,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            event_listeners=_event_listeners
+        )
+    return _async_client
+
+async def warm_up_pool(connections: int = MONGO_MIN_POOL_SIZE):
+    """Abre `connections` conexiones en paralelo para que los primeros requests no paguen el handshake TLS"""
+    client = get_async_mongo_client()
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(max(connections, 1))))
+
+async def close_mongo_clients():
+    """Cierra ambos clientes; el próximo uso crea clientes nuevos"""
+    global _client, _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+    if _client is not None:
+        _client.close()
+        _client = None
+
+class LazyAsyncCollection:
+    """
+    Handle de una colección del cliente asíncrono que se resuelve en el primer
+    uso (y de nuevo si el cliente se cerró y se volvió a crear).
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._collection = None
+
+    def _resolve(self):
+        if self._collection is None or self._collection.database.client is not _async_client:
+            self._collection = get_async_mongo_client()[DB][self.name]
+        return self._collection
+
+    def __getattr__(self, attr):
+        return getattr(self._resolve(), attr)
+
+    def __repr__(self):
+        return f"LazyAsyncCollection({self.name!r})"
+
 def get_collection(col):
     """Obtiene una colección de MongoDB"""
     client = get_mongo_client()
     return client[DB][col]
 
+def get_async_collection(col):
+    """Obtiene una colección de MongoDB con el cliente asíncrono (handle perezoso, no conecta)"""
+    if col not in _async_collections:
+        _async_collections[col] = LazyAsyncCollection(col)
+    return _async_collections[col]
+
+async def aggregate_list(collection, pipeline, **kwargs) -> list:
+    """
+    Ejecuta una aggregation en una colección asíncrona y devuelve todos los documentos.
+    Las que superan SLOW_AGGREGATION_MS se registran con su explain (utils/slow_queries.py).
+    """
+    start = time.perf_counter()
+    cursor = await collection.aggregate(pipeline, **kwargs)
+    result = await cursor.to_list()
+    slow_queries.observe(collection, pipeline, time.perf_counter() - start)
+    return result
+
+async def run_transaction(callback):
+    """
+    Ejecuta callback(session) en una transacción multi-documento.
+    with_transaction reintenta ante errores transitorios y hace abort si callback lanza una excepción.
+    Requiere replica set o mongos.
+    """
+    async with get_async_mongo_client().start_session() as session:
+        return await session.with_transaction(callback)
+
+# (cliente, admite transacciones): se pregunta una vez por cliente
+_transactions_support = (None, False)
+
+async def supports_transactions() -> bool:
+    """True si el servidor es un replica set o mongos; un mongod standalone no acepta transacciones"""
+    global _transactions_support
+    client = get_async_mongo_client()
+    if _transactions_support[0] is not client:
+        hello = await client.admin.command("hello")
+        _transactions_support = (client, "setName" in hello or hello.get("msg") == "isdbgrid")
+    return _transactions_support[1]
+
+async def run_transaction_if_supported(callback):
+    """
+    Como run_transaction, pero en un mongod standalone ejecuta callback(None):
+    las escrituras se aplican una por una, sin atomicidad entre documentos.
+    Solo para escrituras que se pueden reparar después (p. ej. los totales de
+    una orden con POST /orders/{id}/totals/recalculate); el checkout usa
+    run_transaction.
+    """
+    if await supports_transactions():
+        return await run_transaction(callback)
+    return await callback(None)
+
 def t_connection():
     try:
         client = get_mongo_client()
@@ -43,6 +179,15 @@ def t_connection():
     except Exception as e:
         print(f"Error connecting to MongoDB: {e}")
         return False
+
+async def t_async_connection():
+    try:
+        client = get_async_mongo_client()
+        await client.admin.command("ping")
+        return True
+    except Exception as e:
+        print(f"Error connecting to MongoDB: {e}")
+        return False
     
     # Alias para compatibilidad con /ready de Railway
-test_connection = t_connection
\ No newline at end of file
+test_connection = t_connection
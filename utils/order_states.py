@@ -0,0 +1,157 @@
+"""
+Máquina de estados de las órdenes.
+
+Se compila a partir de los estados de order_statuses (caché de referencia) y
+de la tabla TRANSITIONS. Para cada estado precalcula:
+
+    targets         estados a los que un admin puede mover la orden
+    user_targets    estados a los que el dueño de la orden puede moverla
+    reserve_stock   la orden reserva stock mientras está en este estado
+    decrement_stock al entrar a este estado se descuenta el stock (checkout)
+    requires_items  no se puede entrar a este estado con la orden vacía
+
+Los estados que existen en order_statuses pero no aparecen en TRANSITIONS no
+tienen restricciones para admins (se pueden alcanzar y dejar desde cualquier
+estado), para no bloquear estados agregados desde la API.
+
+La máquina se recompila sola cuando cambia la versión del caché de referencia.
+"""
+from typing import NamedTuple
+
+from bson import ObjectId
+
+from utils.reference_cache import order_statuses
+from utils.stock import RESERVING_STATUSES
+
+# None representa una orden sin estado (documentos antiguos)
+TRANSITIONS = {
+    None: ("inprogress", "ordered"),
+    "inprogress": ("ordered", "cancelled"),
+    "ordered": ("processing", "shipped", "cancelled"),
+    "processing": ("shipped", "cancelled"),
+    "shipped": ("delivered",),
+    "delivered": (),
+    "cancelled": (),
+}
+
+# Transiciones permitidas al dueño de la orden (además de ser admin-válidas)
+USER_TRANSITIONS = {
+    None: ("ordered",),
+    "inprogress": ("ordered",),
+}
+
+DECREMENTING_STATUSES = ("ordered",)
+STATUSES_REQUIRING_ITEMS = ("ordered", "processing", "shipped", "delivered")
+
+
+class StatusNode(NamedTuple):
+    id: ObjectId
+    description: str
+    targets: frozenset
+    user_targets: frozenset
+    reserve_stock: bool
+    decrement_stock: bool
+    requires_items: bool
+    restricted: bool
+
+    def to_dict(self) -> dict:
+        return {
+            "id": str(self.id),
+            "description": self.description,
+            "targets": sorted(self.targets),
+            "user_targets": sorted(self.user_targets),
+            "reserve_stock": self.reserve_stock,
+            "decrement_stock": self.decrement_stock,
+            "requires_items": self.requires_items,
+            "restricted": self.restricted,
+        }
+
+
+class OrderStateMachine:
+    def __init__(self, statuses: list, version: int):
+        self.version = version
+        descriptions = {doc["description"].lower() for doc in statuses if doc.get("description")}
+        # Estados sin entrada en la tabla: alcanzables desde cualquier estado
+        unrestricted = {description for description in descriptions if description not in TRANSITIONS}
+
+        def targets_from(description):
+            if description in TRANSITIONS:
+                return frozenset(t for t in TRANSITIONS[description] if t in descriptions) | unrestricted
+            return frozenset(descriptions - {description})
+
+        self._initial = targets_from(None)
+        self._initial_user = frozenset(USER_TRANSITIONS.get(None, ())) & self._initial
+        self.nodes = {}
+        self._by_id = {}
+        for doc in statuses:
+            description = (doc.get("description") or "").lower()
+            if not description:
+                continue
+            targets = targets_from(description)
+            node = StatusNode(
+                id=doc["_id"],
+                description=description,
+                targets=targets,
+                user_targets=frozenset(USER_TRANSITIONS.get(description, ())) & targets,
+                reserve_stock=description in RESERVING_STATUSES,
+                decrement_stock=description in DECREMENTING_STATUSES,
+                requires_items=description in STATUSES_REQUIRING_ITEMS,
+                restricted=description in TRANSITIONS,
+            )
+            self.nodes[description] = node
+            self._by_id[node.id] = node
+
+    def get(self, status_id) -> StatusNode | None:
+        if isinstance(status_id, str):
+            if not ObjectId.is_valid(status_id):
+                return None
+            status_id = ObjectId(status_id)
+        return self._by_id.get(status_id)
+
+    def find(self, description: str | None) -> StatusNode | None:
+        return self.nodes.get((description or "").lower())
+
+    def check_transition(self, current: str | None, target: StatusNode, is_admin: bool) -> str | None:
+        """Devuelve el motivo por el que la transición no está permitida, o None"""
+        current = current.lower() if current else None
+        if current is not None and current not in self.nodes:
+            # Estado actual que ya no existe en order_statuses: solo lo puede mover un admin
+            if is_admin:
+                return None
+            return "Solo puedes finalizar órdenes en progreso"
+
+        if current is None:
+            allowed, allowed_user = self._initial, self._initial_user
+        else:
+            node = self.nodes[current]
+            allowed, allowed_user = node.targets, node.user_targets
+
+        if not is_admin:
+            if not allowed_user:
+                return "Solo puedes finalizar órdenes en progreso"
+            if target.description not in allowed_user:
+                return f"No puedes cambiar tu orden a '{target.description}'"
+            return None
+
+        if target.description not in allowed:
+            return f"No se puede cambiar una orden de '{current}' a '{target.description}'"
+        return None
+
+    def graph(self) -> dict:
+        return {
+            "version": self.version,
+            "initial": sorted(self._initial),
+            "statuses": [node.to_dict() for node in self.nodes.values()],
+        }
+
+
+_machine = None
+
+
+async def get_order_state_machine() -> OrderStateMachine:
+    """Máquina compilada; se recompila si el caché de order_statuses se recargó"""
+    global _machine
+    statuses = await order_statuses.all()
+    if _machine is None or _machine.version != order_statuses.version:
+        _machine = OrderStateMachine(statuses, order_statuses.version)
+    return _machine
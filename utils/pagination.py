@@ -0,0 +1,49 @@
+"""
+Paginación por cursor (keyset) para listados ordenados por (date, _id) descendente.
+
+El cursor es opaco para el cliente: codifica la fecha y el _id del último
+documento de la página. La página siguiente se pide con un $match sobre esos
+valores en vez de $skip, así que su costo no depende de la profundidad.
+"""
+import base64
+import json
+from datetime import datetime
+
+from bson import ObjectId
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(date: datetime, document_id) -> str:
+    payload = json.dumps({"d": date.isoformat(), "i": str(document_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, ObjectId]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["d"]), ObjectId(payload["i"])
+    except Exception:
+        raise InvalidCursorError("Cursor inválido")
+
+
+def keyset_filter(cursor: str | None) -> dict:
+    """Filtro para los documentos posteriores al cursor en orden (date desc, _id desc)"""
+    if not cursor:
+        return {}
+    date, document_id = decode_cursor(cursor)
+    return {"$or": [
+        {"date": {"$lt": date}},
+        {"date": date, "_id": {"$lt": document_id}}
+    ]}
+
+
+def next_cursor(items: list, limit: int, date_field: str = "date", id_field: str = "id") -> str | None:
+    """Cursor de la página siguiente; items debe traer hasta limit + 1 elementos"""
+    if len(items) <= limit:
+        return None
+    last = items[limit - 1]
+    return encode_cursor(last[date_field], last[id_field])
@@ -0,0 +1,95 @@
+"""
+Caché en memoria de las tablas de referencia (order_statuses y catalogtypes).
+
+Son colecciones pequeñas que casi no cambian, así que se cargan completas al
+arrancar la app y las descripciones se resuelven en Python en vez de con un
+$lookup o un find_one por request.
+
+- Los controllers de cada tabla llaman a refresh() después de escribir, así
+  que en el mismo proceso los cambios se ven de inmediato.
+- Otros procesos (varios workers) los ven cuando su copia supera
+  REFERENCE_CACHE_MAX_AGE segundos (default 300) y se recarga.
+
+Cada recarga incrementa version, que sirve para saber si algo derivado del
+caché quedó viejo. version es local al proceso; digest (hash de id,
+descripción y active) y last_modified (date_updated más reciente) dependen
+solo de los datos y sirven para armar ETags iguales en todos los workers.
+"""
+import asyncio
+import hashlib
+import os
+import time
+
+from bson import ObjectId
+
+from utils.mongodb import get_async_collection
+
+REFERENCE_CACHE_MAX_AGE = float(os.getenv("REFERENCE_CACHE_MAX_AGE", "300"))
+
+
+class ReferenceTable:
+    def __init__(self, collection_name: str):
+        self.collection_name = collection_name
+        self.version = 0
+        self.digest = None
+        self.last_modified = None
+        self.loaded_at = None
+        self._by_id = {}
+        self._by_description = {}
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self) -> bool:
+        return self.loaded_at is not None and time.monotonic() - self.loaded_at < REFERENCE_CACHE_MAX_AGE
+
+    async def refresh(self):
+        docs = await get_async_collection(self.collection_name).find({}).to_list()
+        self._by_id = {doc["_id"]: doc for doc in docs}
+        self._by_description = {doc.get("description", "").lower(): doc for doc in docs}
+        fields = sorted((str(doc["_id"]), doc.get("description"), doc.get("active")) for doc in docs)
+        self.digest = hashlib.sha256(repr(fields).encode()).hexdigest()[:16]
+        self.last_modified = max((doc["date_updated"] for doc in docs if doc.get("date_updated")), default=None)
+        self.version += 1
+        self.loaded_at = time.monotonic()
+
+    async def ensure_fresh(self):
+        if self._is_fresh():
+            return
+        async with self._lock:
+            # Otra corrutina pudo recargar mientras esperábamos el lock
+            if not self._is_fresh():
+                await self.refresh()
+
+    async def get(self, document_id) -> dict | None:
+        """Documento por _id (acepta str u ObjectId)"""
+        await self.ensure_fresh()
+        if isinstance(document_id, str):
+            if not ObjectId.is_valid(document_id):
+                return None
+            document_id = ObjectId(document_id)
+        return self._by_id.get(document_id)
+
+    async def find(self, description: str) -> dict | None:
+        """Documento por descripción, sin distinguir mayúsculas"""
+        await self.ensure_fresh()
+        return self._by_description.get((description or "").lower())
+
+    async def all(self, active_only: bool = False) -> list:
+        await self.ensure_fresh()
+        docs = list(self._by_id.values())
+        if active_only:
+            docs = [doc for doc in docs if doc.get("active") is True]
+        return docs
+
+    async def descriptions(self) -> dict:
+        """{_id: descripción} para resolver referencias en Python"""
+        await self.ensure_fresh()
+        return {document_id: doc.get("description") for document_id, doc in self._by_id.items()}
+
+
+order_statuses = ReferenceTable("order_statuses")
+catalog_types = ReferenceTable("catalogtypes")
+
+
+async def load_reference_data():
+    """Carga ambas tablas (al arrancar la app)"""
+    await asyncio.gather(order_statuses.refresh(), catalog_types.refresh())
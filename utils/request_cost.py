@@ -0,0 +1,111 @@
+"""
+Costo en base de datos de cada request.
+
+RequestCostMiddleware abre un RequestCost en un ContextVar al empezar el
+request; el CommandListener de utils/metrics.py suma ahí cada comando de
+MongoDB que se ejecuta en ese contexto (incluye las tareas creadas desde el
+request, que heredan el contexto). Con eso cada respuesta lleva:
+
+    Server-Timing: db;dur=12.4;desc="6 cmds, 25 docs", app;dur=31.0
+
+y una línea de access log con comandos, tiempo en Mongo y documentos
+devueltos. Los requests que hacen más de N_PLUS_ONE_THRESHOLD comandos
+(default 10) se registran como warning, con el detalle por colección, como
+sospechosos de N+1.
+"""
+import logging
+import os
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+
+
+class RequestCost:
+    def __init__(self):
+        self.commands = 0
+        self.db_time = 0.0
+        self.documents = 0
+        self.by_command = Counter()
+
+    def record(self, collection: str, command: str, duration: float, reply: dict | None = None):
+        self.commands += 1
+        self.db_time += duration
+        self.documents += returned_documents(reply)
+        self.by_command[f"{command} {collection}"] += 1
+
+    def server_timing(self, total: float) -> str:
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.commands} cmds, {self.documents} docs", '
+            f"app;dur={total * 1000:.1f}"
+        )
+
+
+_current = ContextVar("request_cost", default=None)
+
+
+def current() -> RequestCost | None:
+    """Costo del request en curso (None fuera de un request)"""
+    return _current.get()
+
+
+def returned_documents(reply: dict | None) -> int:
+    """Documentos que devolvió un comando: lotes de cursor o el resultado de findAndModify"""
+    if not reply:
+        return 0
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or ())
+    if "value" in reply:
+        return 1 if reply["value"] is not None else 0
+    return 0
+
+
+class RequestCostMiddleware:
+    """Middleware ASGI: Server-Timing, access log y aviso de N+1 con el costo en Mongo de cada request"""
+
+    def __init__(self, app, threshold: int | None = None):
+        self.app = app
+        self.threshold = N_PLUS_ONE_THRESHOLD if threshold is None else threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cost = RequestCost()
+        token = _current.set(cost)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", cost.server_timing(time.perf_counter() - start).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            self.log(scope, status, time.perf_counter() - start, cost)
+
+    def log(self, scope, status: int, elapsed: float, cost: RequestCost):
+        path = scope["path"]
+        logger.info(
+            f'{scope["method"]} {path} {status} {elapsed * 1000:.1f}ms '
+            f"db_cmds={cost.commands} db_ms={cost.db_time * 1000:.1f} db_docs={cost.documents}"
+        )
+        if cost.commands > self.threshold:
+            route = getattr(scope.get("route"), "path", None) or path
+            detail = ", ".join(f"{name} x{count}" for name, count in cost.by_command.most_common())
+            logger.warning(
+                f'N+1 suspect: {scope["method"]} {route} made {cost.commands} Mongo round trips '
+                f"(threshold {self.threshold}): {detail}"
+            )
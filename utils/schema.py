@@ -0,0 +1,29 @@
+"""
+Versión del esquema de documentos.
+
+Desde la versión 2 las referencias entre colecciones (id_user, id_order,
+id_inventory, id_catalog, id_catalog_type, id_status) se guardan como
+ObjectId, de modo que los $lookup pueden usar localField/foreignField y los
+índices de la colección destino. Los documentos antiguos se convierten con
+scripts/migrate_object_ids.py.
+"""
+from bson import ObjectId
+
+SCHEMA_VERSION = 2
+
+# Campos que referencian el _id de otra colección, por colección
+FOREIGN_KEYS = {
+    "orders": ["id_user"],
+    "order_details": ["id_order", "id_inventory"],
+    "order_status_record": ["id_order", "id_status"],
+    "reviews": ["id_user", "id_catalog"],
+    "inventory": ["id_catalog"],
+    "catalogs": ["id_catalog_type"],
+}
+
+
+def to_object_id(value) -> ObjectId:
+    """Convierte un id en string a ObjectId (los ObjectId se devuelven tal cual)"""
+    if isinstance(value, ObjectId):
+        return value
+    return ObjectId(value)
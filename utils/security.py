@@ -2,20 +2,24 @@ import os
 import secrets
 import hashlib
 import base64
+import time
 import jwt
 
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from fastapi import HTTPException, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from dotenv import load_dotenv
 from jwt import PyJWTError
 from functools import wraps
-
-load_dotenv()
+from utils.tokens import revocations
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 security = HTTPBearer()
 
+# Tokens ya verificados: sha256(token) -> payload, hasta su exp (LRU acotado)
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "4096"))
+_verified_tokens = OrderedDict()
+
 # Función para crear un JWT
 def create_jwt_token(
         firstname:str
@@ -24,66 +28,118 @@ def create_jwt_token(
         , active: bool
         , admin: bool
         , id: str
+        , session_id: str = None
 ):
-    expiration = datetime.utcnow() + timedelta(hours=1)  # El token expira en 1 hora
-    token = jwt.encode(
-        {
-            "id": id,
-            "firstname": firstname,
-            "lastname": lastname,
-            "email": email,
-            "active": active,
-            "admin": admin,
-            "exp": expiration,
-            "iat": datetime.utcnow()
-        },
-        SECRET_KEY,
-        algorithm="HS256"
-    )
+    now = datetime.utcnow()
+    expiration = now + timedelta(hours=1)  # El token expira en 1 hora
+    payload = {
+        "id": id,
+        "firstname": firstname,
+        "lastname": lastname,
+        "email": email,
+        "active": active,
+        "admin": admin,
+        "exp": expiration,
+        "iat": now
+    }
+    if session_id:
+        # Sesión del refresh token (ver utils/tokens.py); permite revocar el JWT
+        payload["sid"] = str(session_id)
+    token = jwt.encode(payload, SECRET_KEY, algorithm="HS256")
     return token
 
-def validateuser(func):
-    @wraps(func)
-    async def wrapper( *args, **kwargs ):
-        request = kwargs.get('request')
-        if not request:
-            raise HTTPException( status_code=400, detail="Request object not found"  )
-
-        authorization: str = request.headers.get("Authorization")
-        if not authorization:
-            raise HTTPException( status_code=400, detail="Authorization header missing"  )
+def verify_token(token: str) -> dict:
+    """
+    Verifica la firma HS256 una sola vez por token: el payload queda en caché
+    (clave sha256 del token) hasta su exp. La lista de sesiones revocadas se
+    consulta siempre. El payload devuelto es compartido, no modificarlo.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = _verified_tokens.get(key)
+    if payload is not None:
+        if payload["exp"] <= time.time():
+            del _verified_tokens[key]
+            raise HTTPException( status_code=401 , detail="Expired token" )
+        if payload.get("sid") in revocations:
+            raise HTTPException( status_code=401 , detail="Revoked token" )
+        _verified_tokens.move_to_end(key)
+        return payload
 
-        schema, token = authorization.split()
-        if schema.lower() != "bearer":
-            raise HTTPException( status_code=400, detail="Invalid auth schema"  )
+    try:
+        payload = jwt.decode( token , SECRET_KEY, algorithms=["HS256"] )
+    except PyJWTError:
+        raise HTTPException( status_code=401, detail="Invalid token or expired token"  )
 
-        try:
-            payload = jwt.decode( token , SECRET_KEY, algorithms=["HS256"] )
+    if payload.get("email") is None or not isinstance(payload.get("exp"), (int, float)):
+        raise HTTPException( status_code=401 , detail="Token Invalid" )
+    if payload.get("sid") in revocations:
+        raise HTTPException( status_code=401 , detail="Revoked token" )
 
-            email = payload.get("email")
-            firstname = payload.get("firstname")
-            lastname = payload.get("lastname")
-            active = payload.get("active")
-            exp = payload.get("exp")
-            id = payload.get("id")
+    _verified_tokens[key] = payload
+    while len(_verified_tokens) > AUTH_CACHE_MAX_ENTRIES:
+        _verified_tokens.popitem(last=False)
+    return payload
 
-            if email is None:
-                raise HTTPException( status_code=401 , detail="Token Invalid" )
+def resolve_authorization(authorization: str | None) -> tuple:
+    """(payload, None) si el header trae un token válido, o (None, HTTPException) con el motivo"""
+    if not authorization:
+        return None, HTTPException( status_code=400, detail="Authorization header missing"  )
 
-            if datetime.utcfromtimestamp(exp) < datetime.utcnow():
-                raise HTTPException( status_code=401 , detail="Expired token" )
+    parts = authorization.split()
+    if len(parts) != 2 or parts[0].lower() != "bearer":
+        return None, HTTPException( status_code=400, detail="Invalid auth schema"  )
 
-            if not active:
-                raise HTTPException( status_code=401 , detail="Inactive user" )
+    try:
+        return verify_token(parts[1]), None
+    except HTTPException as e:
+        return None, e
+
+class AuthMiddleware:
+    """
+    Middleware ASGI que verifica el token de cada request una sola vez y deja
+    el resultado en request.state.auth para los decoradores y dependencias.
+    No rechaza requests: las rutas públicas siguen funcionando sin token.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            authorization = None
+            for name, value in scope["headers"]:
+                if name == b"authorization":
+                    authorization = value.decode("latin-1")
+                    break
+            scope.setdefault("state", {})["auth"] = resolve_authorization(authorization)
+        await self.app(scope, receive, send)
+
+def authenticate(request: Request) -> dict:
+    """Payload del token del request; lo verifica aquí si el request no pasó por AuthMiddleware"""
+    auth = getattr(request.state, "auth", None)
+    if auth is None:
+        auth = resolve_authorization(request.headers.get("Authorization"))
+        request.state.auth = auth
+
+    payload, error = auth
+    if error:
+        raise error
+    return payload
 
-            request.state.email = email
-            request.state.firstname = firstname
-            request.state.lastname = lastname
-            request.state.id = id
+def validateuser(func):
+    @wraps(func)
+    async def wrapper( *args, **kwargs ):
+        request = kwargs.get('request')
+        if not request:
+            raise HTTPException( status_code=400, detail="Request object not found"  )
 
+        payload = authenticate(request)
+        if not payload.get("active"):
+            raise HTTPException( status_code=401 , detail="Inactive user" )
 
-        except PyJWTError:
-            raise HTTPException( status_code=401, detail="Invalid token or expired token"  )
+        request.state.email = payload.get("email")
+        request.state.firstname = payload.get("firstname")
+        request.state.lastname = payload.get("lastname")
+        request.state.id = payload.get("id")
 
         return await func( *args, **kwargs )
     return wrapper
@@ -95,118 +151,43 @@ def validateadmin(func):
         if not request:
             raise HTTPException( status_code=400, detail="Request object not found"  )
 
-        authorization: str = request.headers.get("Authorization")
-        if not authorization:
-            raise HTTPException( status_code=400, detail="Authorization header missing"  )
-
-        schema, token = authorization.split()
-        if schema.lower() != "bearer":
-            raise HTTPException( status_code=400, detail="Invalid auth schema"  )
-
-        try:
-            payload = jwt.decode( token , SECRET_KEY, algorithms=["HS256"] )
-
-            email = payload.get("email")
-            firstname = payload.get("firstname")
-            lastname = payload.get("lastname")
-            active = payload.get("active")
-            admin = payload.get("admin")
-            exp = payload.get("exp")
-            id = payload.get("id")
-
-            if email is None:
-                raise HTTPException( status_code=401 , detail="Token Invalid" )
-
-            if datetime.utcfromtimestamp(exp) < datetime.utcnow():
-                raise HTTPException( status_code=401 , detail="Expired token" )
-
-            if not active or not admin:
-                raise HTTPException( status_code=401 , detail="Inactive user or not admin" )
+        payload = authenticate(request)
+        if not payload.get("active") or not payload.get("admin"):
+            raise HTTPException( status_code=401 , detail="Inactive user or not admin" )
 
-            request.state.email = email
-            request.state.firstname = firstname
-            request.state.lastname = lastname
-            request.state.admin = admin
-            request.state.id = id
-
-
-        except PyJWTError:
-            raise HTTPException( status_code=401, detail="Invalid token or expired token"  )
+        request.state.email = payload.get("email")
+        request.state.firstname = payload.get("firstname")
+        request.state.lastname = payload.get("lastname")
+        request.state.admin = payload.get("admin")
+        request.state.id = payload.get("id")
 
         return await func( *args, **kwargs )
     return wrapper
 
 
+def _principal(payload: dict) -> dict:
+    return {
+        "id": payload.get("id"),
+        "email": payload.get("email"),
+        "firstname": payload.get("firstname"),
+        "lastname": payload.get("lastname"),
+        "active": payload.get("active"),
+        "role": "admin" if payload.get("admin", False) else "user"
+    }
+
+
 # Funciones para FastAPI Dependency Injection
-def validate_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+def validate_token(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """Validar token JWT para usuarios autenticados - Para usar con Depends()"""
-    token = credentials.credentials
-    
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        
-        email = payload.get("email")
-        firstname = payload.get("firstname")
-        lastname = payload.get("lastname")
-        active = payload.get("active")
-        admin = payload.get("admin", False)
-        exp = payload.get("exp")
-        user_id = payload.get("id")
-        
-        if email is None:
-            raise HTTPException(status_code=401, detail="Token Invalid")
-        
-        if datetime.utcfromtimestamp(exp) < datetime.utcnow():
-            raise HTTPException(status_code=401, detail="Expired token")
-        
-        if not active:
-            raise HTTPException(status_code=401, detail="Inactive user")
-        
-        return {
-            "id": user_id,
-            "email": email,
-            "firstname": firstname,
-            "lastname": lastname,
-            "active": active,
-            "role": "admin" if admin else "user"
-        }
-        
-    except PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token or expired token")
+    payload = authenticate(request)
+    if not payload.get("active"):
+        raise HTTPException(status_code=401, detail="Inactive user")
+    return _principal(payload)
 
 
-def validate_admin(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+def validate_admin(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """Validar token JWT para administradores - Para usar con Depends()"""
-    token = credentials.credentials
-    
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        
-        email = payload.get("email")
-        firstname = payload.get("firstname")
-        lastname = payload.get("lastname")
-        active = payload.get("active")
-        admin = payload.get("admin", False)
-        exp = payload.get("exp")
-        user_id = payload.get("id")
-        
-        if email is None:
-            raise HTTPException(status_code=401, detail="Token Invalid")
-        
-        if datetime.utcfromtimestamp(exp) < datetime.utcnow():
-            raise HTTPException(status_code=401, detail="Expired token")
-        
-        if not active or not admin:
-            raise HTTPException(status_code=401, detail="Inactive user or not admin")
-        
-        return {
-            "id": user_id,
-            "email": email,
-            "firstname": firstname,
-            "lastname": lastname,
-            "active": active,
-            "role": "admin"
-        }
-        
-    except PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token or expired token")
\ No newline at end of file
+    payload = authenticate(request)
+    if not payload.get("active") or not payload.get("admin", False):
+        raise HTTPException(status_code=401, detail="Inactive user or not admin")
+    return _principal(payload)
@@ -0,0 +1,71 @@
+"""
+Coalescing de lecturas concurrentes idénticas (single-flight).
+
+Si llegan varias lecturas con la misma clave mientras la primera todavía
+está consultando Mongo, todas esperan esa misma consulta y reciben el mismo
+resultado (o la misma excepción) en vez de lanzar una cada una.
+
+- La consulta corre en una tarea propia: si el request que la inició se
+  cancela (cliente desconectado) los demás siguen esperando el resultado.
+- Cada clave tiene un timeout (SINGLEFLIGHT_TIMEOUT segundos, default 10);
+  al vencerse se cancela la consulta y todos reciben TimeoutError.
+- Las claves se arman como en utils/cache.py ("<namespace>:<parte>:...") con
+  parámetros ya normalizados.
+- forget()/forget_prefix() sueltan la consulta en curso después de una
+  escritura: los requests que lleguen después lanzan una consulta nueva en
+  vez de unirse a una que pudo leer el dato anterior.
+
+El resultado es el mismo objeto para todos los que esperan: no modificarlo.
+"""
+import asyncio
+import os
+
+SINGLEFLIGHT_TIMEOUT = float(os.getenv("SINGLEFLIGHT_TIMEOUT", "10"))
+
+
+class SingleFlight:
+    def __init__(self, namespace: str, timeout: float = SINGLEFLIGHT_TIMEOUT):
+        self.namespace = namespace
+        self.timeout = timeout
+        self._calls = {}  # clave -> tarea en curso
+        self.leaders = 0
+        self.followers = 0
+
+    def key(self, *parts) -> str:
+        return ":".join([self.namespace, *(str(part) for part in parts)])
+
+    async def do(self, parts: tuple, fn, timeout: float | None = None):
+        """Ejecuta fn() una sola vez por clave entre las llamadas concurrentes"""
+        key = self.key(*parts)
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(asyncio.wait_for(fn(), timeout or self.timeout))
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.followers += 1
+        # shield: cancelar a un request no cancela la consulta compartida
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Marca la excepción como leída aunque todos los requests se hayan cancelado
+            task.exception()
+
+    def forget(self, *parts):
+        self._calls.pop(self.key(*parts), None)
+
+    def forget_prefix(self, *parts):
+        prefix = self.key(*parts) + ":" if parts else self.namespace + ":"
+        for key in [key for key in self._calls if key.startswith(prefix)]:
+            del self._calls[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
@@ -0,0 +1,257 @@
+"""
+Registro de aggregations lentas con el explain capturado automáticamente.
+
+aggregate_list() (utils/mongodb.py), que usan todos los controllers, mide
+cada aggregation y llama a observe(). Si tardó más de SLOW_AGGREGATION_MS
+(default 200):
+
+- se escribe un warning en el log con la colección y el builder de la
+  pipeline (ver pipelines/builder.py);
+- con probabilidad SLOW_EXPLAIN_SAMPLE_RATE (default 1) y como máximo una
+  vez cada SLOW_EXPLAIN_INTERVAL segundos (default 300) por colección y
+  builder, se vuelve a correr la pipeline con explain("executionStats") en
+  una tarea aparte, sin bloquear el request. Solo corre un explain a la vez.
+
+Cada captura guarda el plan ganador, índices usados, si hubo COLLSCAN, keys
+y documentos examinados, y cuántas ejecuciones lentas hubo (y su duración)
+desde la captura anterior, así el conteo no se pierde por el rate limit. No
+se guardan los valores de la pipeline, solo los nombres de las etapas.
+
+Destino: la colección capped slow_aggregations (SLOW_QUERY_CAPPED_BYTES,
+default 16 MB) o, si SLOW_QUERY_LOG_FILE está definido, ese archivo JSONL.
+top_offenders() resume las capturas para GET /admin/slow-aggregations.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from pipelines.builder import builder_name
+
+logger = logging.getLogger(__name__)
+
+SLOW_AGGREGATION_MS = float(os.getenv("SLOW_AGGREGATION_MS", "200"))
+SLOW_EXPLAIN_SAMPLE_RATE = float(os.getenv("SLOW_EXPLAIN_SAMPLE_RATE", "1"))
+SLOW_EXPLAIN_INTERVAL = float(os.getenv("SLOW_EXPLAIN_INTERVAL", "300"))
+SLOW_QUERY_LOG_FILE = os.getenv("SLOW_QUERY_LOG_FILE")
+SLOW_QUERY_CAPPED_BYTES = int(os.getenv("SLOW_QUERY_CAPPED_BYTES", str(16 * 1024 * 1024)))
+
+SLOW_QUERY_COLLECTION = "slow_aggregations"
+
+# Ejecuciones lentas desde la última captura: (colección, builder) -> [cantidad, ms totales, ms máximo]
+_pending = {}
+_last_capture = {}
+_tasks = set()
+_capped_ready = False
+
+
+def observe(collection, pipeline: list, elapsed: float):
+    """Registra una aggregation que tardó `elapsed` segundos; si es lenta programa la captura del explain"""
+    elapsed_ms = elapsed * 1000
+    if elapsed_ms < SLOW_AGGREGATION_MS:
+        return
+
+    key = (collection.name, builder_name(pipeline) or "unknown")
+    logger.warning(f"Slow aggregation: {key[1]} on {key[0]} took {elapsed_ms:.0f}ms")
+
+    pending = _pending.setdefault(key, [0, 0.0, 0.0])
+    pending[0] += 1
+    pending[1] += elapsed_ms
+    pending[2] = max(pending[2], elapsed_ms)
+
+    now = time.monotonic()
+    if _tasks or now - _last_capture.get(key, -SLOW_EXPLAIN_INTERVAL) < SLOW_EXPLAIN_INTERVAL:
+        return
+    if random.random() >= SLOW_EXPLAIN_SAMPLE_RATE:
+        return
+
+    _last_capture[key] = now
+    count, total_ms, max_ms = _pending.pop(key)
+    # Contexto vacío: el explain no debe sumarse al costo del request (utils/request_cost.py)
+    task = asyncio.get_running_loop().create_task(
+        capture(collection, pipeline, key[1], count, total_ms, max_ms), context=contextvars.Context()
+    )
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+def stage_names(pipeline: list) -> list:
+    return [next(iter(stage), "") for stage in pipeline]
+
+
+def winning_plan(explain: dict) -> str:
+    """Resumen del plan ganador, p. ej. "FETCH > IXSCAN(orders_user_date)" o "COLLSCAN" """
+    def find(node):
+        if isinstance(node, dict):
+            if "winningPlan" in node:
+                plan = node["winningPlan"]
+                # Con el motor SBE el árbol de etapas está en queryPlan
+                return plan.get("queryPlan", plan)
+            for value in node.values():
+                found = find(value)
+                if found:
+                    return found
+        elif isinstance(node, list):
+            for item in node:
+                found = find(item)
+                if found:
+                    return found
+        return None
+
+    def describe(plan):
+        stage = plan.get("stage", "?")
+        if "indexName" in plan:
+            stage = f"{stage}({plan['indexName']})"
+        children = [plan["inputStage"]] if "inputStage" in plan else plan.get("inputStages", [])
+        if not children:
+            return stage
+        inner = " + ".join(describe(child) for child in children)
+        return f"{stage} > {inner}" if len(children) == 1 else f"{stage} > [{inner}]"
+
+    plan = find(explain)
+    return describe(plan) if plan else "unknown"
+
+
+def execution_stats(explain: dict) -> dict:
+    """
+    Keys y documentos examinados sumando todas las etapas (las de $lookup los
+    reportan en la etapa, fuera de executionStats) y documentos devueltos
+    por la consulta inicial.
+    """
+    totals = {"keys_examined": 0, "docs_examined": 0, "returned": None}
+
+    def walk(node):
+        if isinstance(node, dict):
+            stats = node.get("executionStats")
+            if isinstance(stats, dict):
+                totals["keys_examined"] += stats.get("totalKeysExamined", 0)
+                totals["docs_examined"] += stats.get("totalDocsExamined", 0)
+                if totals["returned"] is None:
+                    totals["returned"] = stats.get("nReturned")
+            elif "totalDocsExamined" in node:
+                totals["keys_examined"] += node.get("totalKeysExamined", 0)
+                totals["docs_examined"] += node.get("totalDocsExamined", 0)
+            for key, value in node.items():
+                if key != "executionStats":
+                    walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(explain)
+    return totals
+
+
+async def capture(collection, pipeline: list, builder: str, count: int, total_ms: float, max_ms: float):
+    from utils.indexes import collect_plan_usage
+
+    try:
+        explain = await collection.database.command(
+            "explain",
+            {"aggregate": collection.name, "pipeline": list(pipeline), "cursor": {}},
+            verbosity="executionStats"
+        )
+        indexes, collscan = collect_plan_usage(explain)
+        record = {
+            "at": datetime.utcnow(),
+            "collection": collection.name,
+            "builder": builder,
+            "stages": stage_names(pipeline),
+            "slow_count": count,
+            "total_ms": round(total_ms, 1),
+            "max_ms": round(max_ms, 1),
+            "plan": winning_plan(explain),
+            "indexes": sorted(indexes),
+            "collscan": collscan,
+            **execution_stats(explain)
+        }
+        await save(record)
+    except Exception as e:
+        logger.error(f"Could not capture explain for {builder} on {collection.name}: {e}")
+
+
+async def save(record: dict):
+    if SLOW_QUERY_LOG_FILE:
+        line = json.dumps(record, default=str)
+        await asyncio.to_thread(_append_line, SLOW_QUERY_LOG_FILE, line)
+        return
+    await _ensure_capped_collection()
+    await _collection().insert_one(record)
+
+
+def _append_line(path: str, line: str):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+def _collection():
+    from utils.mongodb import get_async_collection
+    return get_async_collection(SLOW_QUERY_COLLECTION)
+
+
+async def _ensure_capped_collection():
+    global _capped_ready
+    if _capped_ready:
+        return
+    from pymongo.errors import CollectionInvalid
+
+    try:
+        await _collection().database.create_collection(
+            SLOW_QUERY_COLLECTION, capped=True, size=SLOW_QUERY_CAPPED_BYTES
+        )
+    except CollectionInvalid:
+        pass  # ya existe
+    _capped_ready = True
+
+
+async def top_offenders(limit: int = 20, hours: float = 24) -> list:
+    """Builders con más tiempo total en aggregations lentas en las últimas `hours` horas"""
+    since = datetime.utcnow() - timedelta(hours=hours)
+    if SLOW_QUERY_LOG_FILE:
+        records = await asyncio.to_thread(_read_records, SLOW_QUERY_LOG_FILE, since)
+        return summarize(records, limit)
+
+    from pipelines.slow_query_pipelines import get_slow_aggregation_offenders_pipeline
+    from utils.mongodb import aggregate_list
+    return await aggregate_list(_collection(), get_slow_aggregation_offenders_pipeline(since, limit))
+
+
+def _read_records(path: str, since: datetime) -> list:
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            record["at"] = datetime.fromisoformat(record["at"])
+            if record["at"] >= since:
+                records.append(record)
+    return records
+
+
+def summarize(records: list, limit: int) -> list:
+    """Mismo resumen que get_slow_aggregation_offenders_pipeline, para las capturas en JSONL"""
+    groups = {}
+    for record in sorted(records, key=lambda r: r["at"]):
+        key = (record["collection"], record["builder"])
+        group = groups.setdefault(key, {"collection": key[0], "builder": key[1], "slow_count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        group["slow_count"] += record["slow_count"]
+        group["total_ms"] += record["total_ms"]
+        group["max_ms"] = max(group["max_ms"], record["max_ms"])
+        # Del plan se muestra la captura más reciente
+        for field in ("plan", "indexes", "collscan", "keys_examined", "docs_examined", "returned"):
+            group[field] = record.get(field)
+        group["last_seen"] = record["at"]
+
+    offenders = sorted(groups.values(), key=lambda g: g["total_ms"], reverse=True)[:limit]
+    for group in offenders:
+        group["avg_ms"] = round(group["total_ms"] / group["slow_count"], 1) if group["slow_count"] else 0
+        group["total_ms"] = round(group["total_ms"], 1)
+    return offenders
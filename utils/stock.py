@@ -0,0 +1,171 @@
+"""
+Stock reservado por órdenes activas.
+
+inventory.reserved_quantity se mantiene con $inc: cuando se agrega, cambia o
+elimina una línea de una orden que reserva stock, y cuando la orden entra o
+sale de un estado que reserva. Así las lecturas de inventario no tienen que
+recorrer el historial de órdenes.
+
+Una orden reserva stock mientras está en "inprogress" (carrito). Al pasar a
+"ordered" el stock se descuenta de verdad y la reserva se libera.
+rebuild_reserved_quantities() recalcula todo desde cero
+(ver scripts/reconcile_reserved_stock.py).
+"""
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from utils.mongodb import get_async_collection, aggregate_list
+
+RESERVING_STATUSES = ("inprogress",)
+
+
+class InsufficientStockError(Exception):
+    """No hay stock suficiente para una o más líneas de la orden"""
+
+    def __init__(self, quantities: dict):
+        # {id_inventory: cantidad pedida} de la orden que no se pudo descontar
+        self.quantities = quantities
+        super().__init__("No hay suficiente stock para uno o más productos")
+
+
+def reserves_stock(status_description: str | None) -> bool:
+    return status_description in RESERVING_STATUSES
+
+
+async def reserve(inventory_id: ObjectId, quantity: int, session=None):
+    """Suma (o resta, si quantity es negativo) unidades reservadas de un inventario"""
+    if quantity == 0:
+        return
+    await get_async_collection("inventory").update_one(
+        {"_id": inventory_id},
+        {"$inc": {"reserved_quantity": quantity}},
+        session=session
+    )
+
+
+async def apply_order_reservation(order_id: ObjectId, sign: int, session=None):
+    """Reserva (sign=1) o libera (sign=-1) todas las líneas activas de una orden"""
+    details = await get_async_collection("order_details").find(
+        {"id_order": order_id, "active": True},
+        {"id_inventory": 1, "quantity": 1},
+        session=session
+    ).to_list()
+
+    operations = [
+        UpdateOne({"_id": detail["id_inventory"]}, {"$inc": {"reserved_quantity": sign * detail.get("quantity", 0)}})
+        for detail in details
+    ]
+    if operations:
+        await get_async_collection("inventory").bulk_write(operations, ordered=False, session=session)
+
+
+async def apply_status_change(order_id: ObjectId, previous_status: str | None, new_status: str | None, session=None):
+    """Ajusta las reservas cuando una orden entra o sale de un estado que reserva stock"""
+    if reserves_stock(previous_status) and not reserves_stock(new_status):
+        await apply_order_reservation(order_id, -1, session=session)
+    elif not reserves_stock(previous_status) and reserves_stock(new_status):
+        await apply_order_reservation(order_id, 1, session=session)
+
+
+async def rebuild_reserved_quantities() -> int:
+    """
+    Recalcula reserved_quantity de todo el inventario a partir de las órdenes
+    en estados que reservan. Conviene ejecutarlo con poco tráfico: los
+    cambios que lleguen mientras corre pueden quedar fuera del recálculo.
+    """
+    reserved = await aggregate_list(get_async_collection("order_details"), [
+        {"$match": {"active": True}},
+        {"$lookup": {
+            "from": "orders",
+            "localField": "id_order",
+            "foreignField": "_id",
+            "pipeline": [
+                {"$match": {"current_status": {"$in": list(RESERVING_STATUSES)}}},
+                {"$project": {"_id": 1}}
+            ],
+            "as": "reserving_order"
+        }},
+        {"$match": {"reserving_order.0": {"$exists": True}}},
+        {"$group": {"_id": "$id_inventory", "reserved_quantity": {"$sum": "$quantity"}}}
+    ])
+
+    inventory = get_async_collection("inventory")
+    reserved_ids = [doc["_id"] for doc in reserved]
+
+    await inventory.update_many(
+        {"_id": {"$nin": reserved_ids}, "reserved_quantity": {"$ne": 0}},
+        {"$set": {"reserved_quantity": 0}}
+    )
+    operations = [
+        UpdateOne({"_id": doc["_id"]}, {"$set": {"reserved_quantity": doc["reserved_quantity"]}})
+        for doc in reserved
+    ]
+    if operations:
+        await inventory.bulk_write(operations, ordered=False)
+
+    return len(operations)
+
+
+async def _order_quantities(order_id: ObjectId, session=None) -> dict:
+    details = await get_async_collection("order_details").find(
+        {"id_order": order_id, "active": True},
+        {"id_inventory": 1, "quantity": 1},
+        session=session
+    ).to_list()
+
+    quantities = {}
+    for detail in details:
+        quantities[detail["id_inventory"]] = quantities.get(detail["id_inventory"], 0) + detail.get("quantity", 0)
+    return quantities
+
+
+async def find_insufficient_stock(quantities: dict) -> list:
+    """Ids de inventario sin stock suficiente (llamar fuera de la transacción abortada)"""
+    items = await get_async_collection("inventory").find(
+        {"_id": {"$in": list(quantities)}}, {"stock": 1}
+    ).to_list()
+    stock = {item["_id"]: item.get("stock", 0) for item in items}
+    return [inventory_id for inventory_id, quantity in quantities.items() if stock.get(inventory_id, 0) < quantity]
+
+
+async def checkout_order_stock(order_id: ObjectId, release_reservation: bool, session) -> list:
+    """
+    Descuenta el stock de todas las líneas activas de una orden con un solo
+    bulk_write de $inc condicionales (stock >= cantidad). Debe ejecutarse
+    dentro de una transacción: si alguna línea no tiene stock suficiente lanza
+    InsufficientStockError y la transacción se aborta completa.
+
+    Desactiva en un solo update_many los catálogos cuyo inventario queda en 0.
+    Devuelve los ids de esos catálogos.
+    """
+    quantities = await _order_quantities(order_id, session=session)
+    if not quantities:
+        return []
+
+    inventory = get_async_collection("inventory")
+    operations = []
+    for inventory_id, quantity in quantities.items():
+        inc = {"stock": -quantity}
+        if release_reservation:
+            inc["reserved_quantity"] = -quantity
+        operations.append(UpdateOne({"_id": inventory_id, "stock": {"$gte": quantity}}, {"$inc": inc}))
+
+    result = await inventory.bulk_write(operations, ordered=False, session=session)
+    if result.matched_count != len(operations):
+        raise InsufficientStockError(quantities)
+
+    sold_out = await inventory.find(
+        {"_id": {"$in": list(quantities)}, "stock": 0},
+        {"id_catalog": 1},
+        session=session
+    ).to_list()
+    catalog_ids = [item["id_catalog"] for item in sold_out if item.get("id_catalog")]
+    if catalog_ids:
+        await get_async_collection("catalogs").update_many(
+            {"_id": {"$in": catalog_ids}},
+            {"$set": {"active": False, "date_updated": datetime.utcnow()}},
+            session=session
+        )
+    return catalog_ids
@@ -0,0 +1,161 @@
+"""
+Refresh tokens rotativos y lista de sesiones revocadas.
+
+POST /login entrega, además del JWT, un refresh token opaco. POST
+/token/refresh lo canjea por un JWT nuevo y un refresh token nuevo sin pasar
+por Firebase: solo relee el usuario por _id (una búsqueda por índice) para
+emitir el JWT con active/admin actuales. Un usuario desactivado no puede
+renovar y su sesión se revoca.
+
+- En Mongo (colección refresh_tokens) solo se guarda el sha256 del token,
+  con un índice TTL sobre expires_at.
+- La sesión vence REFRESH_TOKEN_TTL_DAYS (default 30) después del login: los
+  tokens rotados heredan el expires_at de la sesión, así que renovar no
+  extiende la ventana.
+- Cada canje marca el token como usado y emite uno nuevo de la misma sesión
+  (family). Presentar un token ya usado revoca la sesión completa: alguien
+  más tiene una copia.
+- Las sesiones revocadas se guardan en token_revocations (también con TTL) y
+  cada proceso las mantiene en memoria en `revocations`, que se resincroniza
+  cada REVOCATION_SYNC_INTERVAL segundos (default 30). Los JWT llevan la
+  sesión en el claim "sid", así que una revocación corta también los access
+  tokens vigentes (en este proceso de inmediato, en los demás al sincronizar).
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import secrets
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_TTL_DAYS = float(os.getenv("REFRESH_TOKEN_TTL_DAYS", "30"))
+REVOCATION_SYNC_INTERVAL = float(os.getenv("REVOCATION_SYNC_INTERVAL", "30"))
+
+# Datos del usuario que van en el JWT
+USER_PROJECTION = {"name": 1, "lastname": 1, "email": 1, "active": 1, "admin": 1}
+
+
+def _collection(name: str):
+    # Import diferido: utils.security usa `revocations` sin necesitar la conexión a Mongo
+    from utils.mongodb import get_async_collection
+    return get_async_collection(name)
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class RevocationList:
+    """Sesiones revocadas en memoria; sync() la reemplaza con el contenido de token_revocations"""
+
+    def __init__(self):
+        self._revoked = set()
+        self._local = set()  # revocadas en este proceso que aún no vio un sync
+        self.synced_at = None
+
+    def __contains__(self, session_id) -> bool:
+        return session_id is not None and str(session_id) in self._revoked
+
+    def add(self, session_id):
+        self._revoked.add(str(session_id))
+        self._local.add(str(session_id))
+
+    async def sync(self):
+        docs = await _collection("token_revocations").find({}, {"_id": 1}).to_list()
+        loaded = {str(doc["_id"]) for doc in docs}
+        self._local -= loaded
+        self._revoked = loaded | self._local
+        self.synced_at = time.monotonic()
+
+    async def run(self, interval: float = REVOCATION_SYNC_INTERVAL):
+        """Loop de sincronización periódica (se lanza al arrancar la app)"""
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Could not sync token revocations: {e}")
+            await asyncio.sleep(interval)
+
+
+revocations = RevocationList()
+
+
+async def issue_refresh_token(
+    id_user, session_id: ObjectId | None = None, expires_at: datetime | None = None
+) -> tuple[str, ObjectId]:
+    """
+    Crea un refresh token; devuelve (token, session_id). Sin session_id abre
+    una sesión nueva que vence en REFRESH_TOKEN_TTL_DAYS; al rotar se pasa el
+    expires_at de la sesión para no extenderla.
+    """
+    token = secrets.token_urlsafe(48)
+    session_id = session_id or ObjectId()
+    now = datetime.utcnow()
+    await _collection("refresh_tokens").insert_one({
+        "token_hash": hash_token(token),
+        "family": session_id,
+        "id_user": id_user,
+        "created_at": now,
+        "expires_at": expires_at or now + timedelta(days=REFRESH_TOKEN_TTL_DAYS),
+        "used_at": None
+    })
+    return token, session_id
+
+
+async def revoke_session(session_id: ObjectId):
+    """Revoca todos los refresh tokens y access tokens de una sesión"""
+    revocations.add(session_id)
+    await _collection("token_revocations").update_one(
+        {"_id": session_id},
+        {"$set": {"expires_at": datetime.utcnow() + timedelta(days=REFRESH_TOKEN_TTL_DAYS)}},
+        upsert=True
+    )
+    await _collection("refresh_tokens").delete_many({"family": session_id})
+
+
+async def rotate_refresh_token(token: str) -> tuple[dict, str, ObjectId]:
+    """
+    Canjea un refresh token: lo marca como usado, relee el usuario y emite el
+    siguiente token de la misma sesión. Devuelve (usuario, token nuevo, session_id).
+    """
+    now = datetime.utcnow()
+    token_hash = hash_token(token)
+    refresh_tokens = _collection("refresh_tokens")
+
+    # Escritura condicional: de dos canjes concurrentes del mismo token gana uno
+    doc = await refresh_tokens.find_one_and_update(
+        {"token_hash": token_hash, "used_at": None, "expires_at": {"$gt": now}},
+        {"$set": {"used_at": now}}
+    )
+    if doc is None:
+        reused = await refresh_tokens.find_one({"token_hash": token_hash, "used_at": {"$ne": None}}, {"family": 1})
+        if reused:
+            logger.warning(f"Refresh token reuse detected, revoking session {reused['family']}")
+            await revoke_session(reused["family"])
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+
+    if doc["family"] in revocations:
+        raise HTTPException(status_code=401, detail="Revoked token")
+
+    user = await _collection("users").find_one({"_id": doc["id_user"]}, USER_PROJECTION)
+    if not user or not user.get("active"):
+        await revoke_session(doc["family"])
+        raise HTTPException(status_code=401, detail="Inactive user")
+
+    new_token, session_id = await issue_refresh_token(doc["id_user"], doc["family"], doc["expires_at"])
+    return user, new_token, session_id
+
+
+async def revoke_refresh_token(token: str) -> bool:
+    """Cierra la sesión del refresh token (logout); False si el token no existe"""
+    doc = await _collection("refresh_tokens").find_one({"token_hash": hash_token(token)}, {"family": 1})
+    if not doc:
+        return False
+    await revoke_session(doc["family"])
+    return True